@@ -0,0 +1,146 @@
+# benchmarks/bench_amazon_deals.py
+"""
+Crawling the detail pages of an Amazon deals page the previous way (every
+link the three card selectors match, one fresh page per deal visited in
+turn, a random pause after each load and one round trip per field) versus
+WebScraper._scrape_amazon_deals (links reduced to one per ASIN, a pool of
+reused pages, per-domain pacing and one in-page evaluation per deal).
+
+Pages are a stand-in for Playwright's: a navigation takes LOAD_SECONDS and
+every other call one ROUND_TRIP_SECONDS, so the numbers show the crawl's
+scheduling, not Amazon's servers. Pacing uses the scraper's own delays.
+
+Usage:
+    python benchmarks/bench_amazon_deals.py [num_deals] [links_per_deal] [pool_pages]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper
+from scraper import WebScraper, SCRAPE_DELAY_MIN_SECONDS, SCRAPE_DELAY_MAX_SECONDS
+from canonical_urls import canonical_url, product_key
+
+LOAD_SECONDS = 2.5 # domcontentloaded of a deal page
+ROUND_TRIP_SECONDS = 0.02 # One call from Python into the browser and back
+
+
+class Handle:
+    async def text_content(self):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        return "text"
+
+
+class Locator:
+    @property
+    def first(self):
+        return self
+
+    async def element_handle(self):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        return Handle()
+
+
+class Page:
+    def __init__(self, stats):
+        self.stats = stats
+        self.closed = False
+        stats["pages"] += 1
+
+    async def goto(self, url, **kwargs):
+        self.stats["loads"] += 1
+        await asyncio.sleep(LOAD_SECONDS)
+
+    async def wait_for_selector(self, selector, timeout):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+
+    def locator(self, selector):
+        return Locator()
+
+    async def evaluate(self, script):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        return {"title": "Deal", "price": "1,299", "description": "About this item", "brand": "Visit the Foo Store"}
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class Context:
+    def __init__(self, stats):
+        self.stats = stats
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        return Page(self.stats)
+
+    async def close(self):
+        pass
+
+
+class Browser:
+    def __init__(self):
+        self.stats = {"pages": 0, "loads": 0}
+
+    async def new_context(self):
+        return Context(self.stats)
+
+
+async def crawl_before(browser, hrefs):
+    """The previous loop: every matched link, one new page each, a pause after each load."""
+    context = await browser.new_context()
+    found = set()
+    for link in hrefs:
+        page = await context.new_page()
+        await page.goto(link)
+        await asyncio.sleep(random.uniform(SCRAPE_DELAY_MIN_SECONDS / 2, SCRAPE_DELAY_MAX_SECONDS / 2))
+        await page.wait_for_selector("#productTitle", timeout=30000)
+        for _ in range(4): # title, price, description, brand
+            await (await page.locator("...").first.element_handle()).text_content()
+        found.add(product_key(link)) # Offers for a product seen before were duplicates
+        await page.close()
+    return len(found)
+
+
+async def crawl_after(browser, hrefs, pages):
+    keys = [product_key(href) for href in hrefs]
+    deal_links = list(dict.fromkeys(key for key in keys if key))
+    deal_links += list(dict.fromkeys(canonical_url(href) for href, key in zip(hrefs, keys) if href and not key))
+    offers = []
+    await WebScraper([])._scrape_amazon_deals(browser, deal_links, offers, pages=pages)
+    return len(offers)
+
+
+def run(label, crawl):
+    browser = Browser()
+    start = time.perf_counter()
+    offers = asyncio.run(crawl(browser))
+    seconds = time.perf_counter() - start
+    print(f"{label:<22} {seconds:>8.1f} {browser.stats['loads']:>6} {browser.stats['pages']:>6} {offers:>9} {offers / seconds * 60:>13.1f}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    num_deals = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    links_per_deal = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    pool_pages = int(sys.argv[3]) if len(sys.argv) > 3 else scraper.AMAZON_DETAIL_PAGES
+    scraper.MAX_OFFERS_PER_SITE = 0
+    # Each deal card links to its product several times, with different ref tails
+    hrefs = [f"https://www.amazon.in/dp/B{deal:09d}?ref=dlx_deals_dg_{i}" for deal in range(num_deals) for i in range(links_per_deal)]
+
+    print(f"{num_deals} deals, {len(hrefs)} matched links, {LOAD_SECONDS}s page loads, "
+          f"pacing {SCRAPE_DELAY_MIN_SECONDS / 2}-{SCRAPE_DELAY_MAX_SECONDS / 2}s per navigation")
+    print(f"{'mode':<22} {'seconds':>8} {'loads':>6} {'pages':>6} {'products':>9} {'products/min':>13}")
+    run("before", lambda browser: crawl_before(browser, hrefs))
+    run("after, 1 page", lambda browser: crawl_after(browser, hrefs, 1))
+    run(f"after, {pool_pages} pages", lambda browser: crawl_after(browser, hrefs, pool_pages))
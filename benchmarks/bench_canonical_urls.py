@@ -0,0 +1,65 @@
+# benchmarks/bench_canonical_urls.py
+"""
+Offer links as the scrapers write them versus their canonical form
+(canonical_urls.py), over the offers in scraped_offers.json.
+
+Reports, per site, the characters of link text, the estimated tokens the
+links add to a query's LLM context (the first QUERY_K offers of the site,
+about 4 characters a token; the previous prompt code also dropped Flipkart's
+param/hpid/ctx), how many offers repeat another offer's product page (which
+dedupe now merges), and the time to canonicalize each link.
+
+Usage:
+    python benchmarks/bench_canonical_urls.py [scraped_offers.json]
+"""
+import os
+import sys
+import json
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from canonical_urls import canonical_url, product_key, _canonicalize
+
+CHARS_PER_TOKEN = 4
+QUERY_K = 20 # Offers RAGQueryProcessor.process_query puts in a prompt
+
+
+def site_of(url):
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "scraped_offers.json")
+    with open(path, encoding="utf-8") as f:
+        links = [offer["offer_link"] for offer in json.load(f) if offer.get("offer_link")]
+
+    start = time.perf_counter()
+    for link in links:
+        _canonicalize.__wrapped__(link)
+    us_per_link = (time.perf_counter() - start) / len(links) * 1e6
+
+    sites = {}
+    for link in links:
+        sites.setdefault(site_of(link), []).append(link)
+
+    print(f"{len(links)} offer links from {os.path.basename(path)}, {us_per_link:.1f} us per link uncached")
+    print(f"{'site':<16} {'offers':>7} {'chars before':>13} {'chars after':>12} {'ctx tokens before':>18} {'ctx tokens after':>17} {'same product':>13}")
+    totals = [0, 0, 0, 0, 0, 0]
+    for site, site_links in sorted(sites.items()):
+        canonical = [canonical_url(link) for link in site_links]
+        before, after = sum(map(len, site_links)), sum(map(len, canonical))
+        context = site_links[:QUERY_K]
+        tokens_before = sum(len(link) for link in context) // CHARS_PER_TOKEN
+        tokens_after = sum(len(canonical_url(link)) for link in context) // CHARS_PER_TOKEN
+        keys = [product_key(link) for link in site_links]
+        keyed = [key for key in keys if key]
+        repeats = len(keyed) - len(set(keyed))
+        row = (len(site_links), before, after, tokens_before, tokens_after, repeats)
+        totals = [t + v for t, v in zip(totals, row)]
+        print(f"{site:<16} {row[0]:>7} {row[1]:>13} {row[2]:>12} {row[3]:>18} {row[4]:>17} {row[5]:>13}")
+    print(f"{'total':<16} {totals[0]:>7} {totals[1]:>13} {totals[2]:>12} {totals[3]:>18} {totals[4]:>17} {totals[5]:>13}")
+    print(f"Link text {1 - totals[2] / totals[1]:.1%} shorter; {len(set(map(canonical_url, links)))} distinct links after vs {len(set(links))} before.")
@@ -0,0 +1,77 @@
+# benchmarks/bench_embedding_rate_limits.py
+"""
+Embedding a catalogue against a rate-limited API: the previous ingest loop
+(one request per offer through the SDK, whose two default retries honour
+retry-after, then the offer is dropped) versus EmbeddingClient (batches on
+several threads, token-bucket pacing, AIMD concurrency, jittered retries).
+
+The mock server from mock_openai.py runs in-process with requests- and
+tokens-per-minute limits and rejects a share of requests at random. The
+client is configured with the same limits, as it would be with the
+account's real ones.
+
+Usage:
+    python benchmarks/bench_embedding_rate_limits.py [num_offers] [rpm] [tpm] [429_rate]
+"""
+import os
+import sys
+import time
+import logging
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai import serve, set_embedding_limits, MockOpenAIHandler
+from run_benchmarks import synthetic_catalogue
+
+LATENCY_MS = 30
+
+
+def embed_one_by_one(texts):
+    from clients import get_openai_client
+    import openai
+    client = get_openai_client()
+    embedded = 0
+    for text in texts:
+        try:
+            client.embeddings.create(input=[text], model="text-embedding-3-small")
+            embedded += 1
+        except openai.OpenAIError:
+            pass
+    return embedded, None
+
+
+def embed_with_client(texts, rpm, tpm):
+    from embedding_client import EmbeddingClient
+    client = EmbeddingClient(requests_per_minute=rpm, tokens_per_minute=tpm)
+    vectors, errors = client.embed(texts)
+    return len(texts) - len(errors), client.concurrency.limit
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rpm = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    tpm = int(sys.argv[3]) if len(sys.argv) > 3 else 400000
+    error_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+
+    server = serve(embedding_latency_ms=LATENCY_MS, embedding_rpm=rpm, embedding_tpm=tpm, embedding_429_rate=error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    from ingest_to_vector_db import offer_embedding_text
+    texts = [offer_embedding_text(offer) for offer in synthetic_catalogue(num_offers)]
+
+    print(f"{num_offers} offers, limits {rpm} RPM / {tpm} TPM, {error_rate:.0%} random 429s, {LATENCY_MS} ms per request")
+    print(f"{'mode':<16} {'seconds':>8} {'offers/s':>9} {'requests':>9} {'429s':>6} {'embedded':>9} {'lost':>6} {'concurrency':>12}")
+    for label, run in (("one by one", lambda: embed_one_by_one(texts)), ("EmbeddingClient", lambda: embed_with_client(texts, rpm, tpm))):
+        set_embedding_limits(rpm, tpm, error_rate)
+        start = time.perf_counter()
+        embedded, concurrency = run()
+        seconds = time.perf_counter() - start
+        stats = MockOpenAIHandler.stats
+        print(f"{label:<16} {seconds:>8.1f} {embedded / seconds:>9.1f} {stats['embedding_requests']:>9} {stats['embedding_429s']:>6} "
+              f"{embedded:>9} {num_offers - embedded:>6} {concurrency if concurrency is not None else '-':>12}")
@@ -0,0 +1,99 @@
+# benchmarks/bench_generic_extractor.py
+"""
+Compares the old DOTALL-regex generic scrape with the visible-text
+Aho-Corasick extractor in html_parsers.py.
+
+Usage:
+    python benchmarks/bench_generic_extractor.py [saved_page.html ...]
+
+With no arguments, every *.html under benchmarks/fixtures/ is used, and if
+there are none a synthetic multi-megabyte page is generated.
+"""
+import glob
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_parsers import scan_generic_offers
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_parse_expiry_date(date_string):
+    if not date_string:
+        return None
+    formats = ["%B %d, %Y", "%d/%m/%Y", "%Y-%m-%d", "%d %B %Y", "%b %d, %Y", "%d %b %Y"]
+    for fmt in formats:
+        try:
+            match = re.search(r'(?:ends|expires|valid till|till)\s*(\w+\s+\d{1,2},\s+\d{4}|\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{1,2}-\d{1,2}|\d{1,2}\s+\w+\s+\d{4})', date_string, re.IGNORECASE)
+            if match:
+                return datetime.strptime(match.group(1).strip(), fmt).isoformat()
+        except ValueError:
+            continue
+    current_date = datetime.now()
+    if "today" in date_string.lower():
+        return current_date.isoformat()
+    if "tomorrow" in date_string.lower():
+        return (current_date + timedelta(days=1)).isoformat()
+    if "next week" in date_string.lower():
+        return (current_date + timedelta(weeks=1)).isoformat()
+    if "next month" in date_string.lower():
+        return (current_date + timedelta(days=30)).isoformat()
+    return None
+
+
+def legacy_scan(content):
+    """The generic scrape as it was before the visible-text extractor."""
+    rows = []
+    for match in re.finditer(r"(?:[0-9]{1,3}% off|flat \d+%|cashback|sale|discount|deal|promo)\b.*?(?:\.|\n|$)", content, re.IGNORECASE | re.DOTALL):
+        text = match.group(0).strip()
+        if len(text) < 15 or re.match(r"^[a-z0-9_-]+$", text):
+            continue
+        rows.append((text.split("\n")[0].strip(), text, legacy_parse_expiry_date(text)))
+    return rows
+
+
+def synthetic_page(repeat=4000):
+    block = (
+        '<div class="product-card sale-price"><script>window.__STATE__={"deal":"promo","discount":40,'
+        '"text":"flat 40% off cashback sale"};</script><style>.sale-offers{color:red}</style>'
+        '<p class="title">Running Shoes - Flat 40% off. Ends May 23, 2025.</p>'
+        '<span>Extra 10% off with bank cashback, valid till 23/05/2025</span>'
+        '<a href="/deal/123?promo=summer-sale">Deal of the day</a></div>\n'
+    )
+    return "<html><head><title>Offers</title></head><body>" + block * repeat + "</body></html>"
+
+
+def load_pages(paths):
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, "**", "*.html"), recursive=True))
+    if not paths:
+        return [("synthetic", synthetic_page())]
+    pages = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            pages.append((os.path.relpath(path), f.read()))
+    return pages
+
+
+def best_of(fn, arg, runs=3):
+    best = None
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    print(f"{'page':<45} {'size':>9} {'legacy s':>9} {'legacy n':>9} {'new s':>9} {'new n':>7}")
+    for name, html in load_pages(sys.argv[1:]):
+        legacy_time, legacy_rows = best_of(legacy_scan, html)
+        new_time, new_rows = best_of(scan_generic_offers, html.encode("utf-8"))
+        print(f"{name[-45:]:<45} {len(html):>9} {legacy_time:>9.3f} {len(legacy_rows):>9} {new_time:>9.3f} {len(new_rows):>7}")
@@ -0,0 +1,64 @@
+# benchmarks/bench_import_time.py
+"""
+Import-time profile of the bot and CLI entry points, from `python -X importtime`.
+
+For each module it prints the total import time, the heaviest imports, and
+whether the scraper/browser stack or the OpenAI SDK was pulled in. Pass
+--max-ms to exit non-zero when any module takes longer, so startup
+regressions can be caught in CI. slackbot is only profiled by default when
+SLACK_BOT_TOKEN is set, because building the Slack App verifies the token
+over the network at import time.
+
+Usage:
+    python benchmarks/bench_import_time.py [--max-ms N] [--top N] [module ...]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["ingest_to_vector_db", "rag_query", "scraper"] + (["slackbot"] if os.getenv("SLACK_BOT_TOKEN") else [])
+# Imports that a query-only process should not pay for at startup
+WATCHED = ["playwright", "bs4", "openai", "scraper"]
+
+
+def profile_import(module):
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-benchmark"))
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import {module}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=ROOT, env=env)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            rows.append((parts[2].rstrip(), int(parts[1])))
+        except ValueError:
+            continue # Header line
+    if result.returncode != 0:
+        print(f"import {module} failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if any module imports slower than this")
+    parser.add_argument("--top", type=int, default=8, help="number of heaviest imports to list")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        rows = profile_import(module)
+        total_ms = next((us for name, us in rows if name.strip() == module), 0) / 1000
+        loaded = {name.strip().split(".")[0] for name, _ in rows}
+        watched = ", ".join(f"{name}={'yes' if name in loaded else 'no'}" for name in WATCHED)
+        print(f"\n{module}: {total_ms:.0f} ms ({watched})")
+        top_level = [(name.strip(), us) for name, us in rows if name.strip() != module]
+        for name, us in sorted(top_level, key=lambda r: r[1], reverse=True)[:args.top]:
+            print(f"  {us / 1000:>8.1f} ms  {name}")
+        if args.max_ms is not None and total_ms > args.max_ms:
+            print(f"  FAIL: {module} import took {total_ms:.0f} ms (limit {args.max_ms:.0f} ms)")
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,94 @@
+# benchmarks/bench_offer_memory.py
+"""
+Memory per offer of the metadata store with Offer records versus the dicts
+they replace, plus pickled size and load time of the metadata file.
+
+Records are built from scraped_offers.json, cycling through it with a
+numbered title so no two are identical. Every text value is a fresh string
+object, as it is when a scraper reads it off a page. The dict form is the
+pre-Offer metadata record: the scraped fields, an ISO last_seen and the
+three parsed deal numbers.
+
+Usage:
+    python benchmarks/bench_offer_memory.py [num_offers]
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from offers import Offer, parse_prices
+
+FIELDS = ("title", "description", "expiry_date", "brand_name", "offer_link", "category", "campaign_info", "channels")
+
+
+def _fresh(value):
+    return value.encode("utf-8").decode("utf-8") if isinstance(value, str) else value
+
+
+def scraped_rows(base, n):
+    for i in range(n):
+        row = {field: _fresh(base[i % len(base)].get(field)) for field in FIELDS}
+        row["title"] = f"{row['title']} #{i}"
+        yield row
+
+
+def build_dicts(base, n):
+    last_seen = datetime.now().isoformat()
+    offers = []
+    for row in scraped_rows(base, n):
+        price, mrp, discount_percent = parse_prices(row["title"], row["description"], row["campaign_info"])
+        offers.append(dict(row, last_seen=last_seen, discount_percent=discount_percent, original_price=mrp, offer_price=price))
+    return offers
+
+
+def build_offers(base, n):
+    last_seen = datetime.now()
+    offers = []
+    for row in scraped_rows(base, n):
+        offer = Offer(**row)
+        offer.last_seen = last_seen
+        offers.append(offer)
+    return offers
+
+
+def measure(build, base, n):
+    tracemalloc.start()
+    start = time.perf_counter()
+    offers = build(base, n)
+    build_seconds = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    data = pickle.dumps(offers, protocol=pickle.HIGHEST_PROTOCOL)
+    del offers
+    start = time.perf_counter()
+    pickle.loads(data)
+    load_seconds = time.perf_counter() - start
+    return {
+        "bytes_per_offer": retained / n,
+        "pickle_bytes_per_offer": len(data) / n,
+        "build_seconds": build_seconds,
+        "load_seconds": load_seconds,
+    }
+
+
+if __name__ == "__main__":
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with open(os.path.join(ROOT, "scraped_offers.json"), encoding="utf-8") as f:
+        base = json.load(f)
+
+    print(f"{num_offers} offers")
+    results = {}
+    for label, build in (("dict", build_dicts), ("Offer", build_offers)):
+        r = results[label] = measure(build, base, num_offers)
+        print(f"  {label:<6} {r['bytes_per_offer']:7.0f} B/offer in memory  {r['pickle_bytes_per_offer']:6.0f} B/offer pickled  "
+              f"built in {r['build_seconds']:.1f} s  unpickled in {r['load_seconds']:.1f} s")
+    saved = 1 - results["Offer"]["bytes_per_offer"] / results["dict"]["bytes_per_offer"]
+    print(f"  Offer uses {saved:.0%} less memory per offer ({(results['dict']['bytes_per_offer'] - results['Offer']['bytes_per_offer']) * num_offers / 2**20:.0f} MB at {num_offers} offers)")
@@ -0,0 +1,125 @@
+# benchmarks/bench_pagination.py
+"""
+Paginated Nykaa bestseller / Flipkart search results scraped the previous
+way (one page navigated, settled, read and parsed before the next starts)
+versus WebScraper._load_pages, which keeps the next pages loading in
+sibling pages while the current one is parsed and stops at the first page
+without products.
+
+Pages are a stand-in for Playwright's: a navigation takes LOAD_SECONDS,
+wait_for_timeout really waits, and content() returns the recorded fixture
+(an empty results page past `pages_with_products`). Parsing is the real
+parser in the parse pool. Pacing uses the scraper's own delays.
+
+Usage:
+    python benchmarks/bench_pagination.py [nykaa|flipkart] [max_pages] [pages_with_products] [prefetch]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper
+from scraper import WebScraper
+from html_parsers import parse_in_pool, shutdown_parse_pool, parse_nykaa_bestsellers, parse_flipkart_search
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LOAD_SECONDS = 3.0 # networkidle of a results page
+EMPTY_PAGE = "<html><body><p>No results</p></body></html>"
+SITES = {
+    # name: (fixture, base url, parse(html, url, page_no), prefetch)
+    "nykaa": ("nykaa_bestsellers.html", "https://www.nykaa.com/sp/bestsellers/?",
+              lambda html, url, page_no: parse_in_pool(parse_nykaa_bestsellers, html, url, page_no), scraper.NYKAA_PREFETCH_PAGES),
+    "flipkart": ("flipkart_search.html", "https://www.flipkart.com/search?q=beauty&",
+                 lambda html, url, page_no: parse_in_pool(parse_flipkart_search, html, page_no), scraper.FLIPKART_PREFETCH_PAGES),
+}
+
+
+class Page:
+    def __init__(self, site, stats):
+        self.site = site
+        self.stats = stats
+        self.url = None
+        stats["pages"] += 1
+
+    async def goto(self, url, **kwargs):
+        self.stats["loads"] += 1
+        await asyncio.sleep(LOAD_SECONDS)
+        self.url = url
+
+    async def wait_for_timeout(self, ms):
+        await asyncio.sleep(ms / 1000)
+
+    async def content(self):
+        page_no = int(self.url.rsplit("=", 1)[1])
+        return self.site["html"] if page_no <= self.site["pages_with_products"] else EMPTY_PAGE
+
+    async def close(self):
+        pass
+
+
+class Context:
+    def __init__(self, site):
+        self.site = site
+        self.stats = {"pages": 0, "loads": 0}
+
+    async def new_page(self):
+        return Page(self.site, self.stats)
+
+
+async def paginate_before(context, page_urls, parse, prefetch):
+    """The previous loop: navigate, settle, read and parse each page in turn, all of them."""
+    page = await context.new_page()
+    rows = 0
+    for page_no, url in enumerate(page_urls, 1):
+        await page.goto(url, wait_until="networkidle", timeout=60000)
+        await page.wait_for_timeout(2000)
+        rows += len(await parse(await page.content(), url, page_no))
+    return rows
+
+
+async def paginate_after(context, page_urls, parse, prefetch):
+    loaded = WebScraper([])._load_pages(context, page_urls, prefetch)
+    rows = 0
+    try:
+        async for page_no, url, html in loaded:
+            page_rows = await parse(html, url, page_no)
+            if not page_rows:
+                break
+            rows += len(page_rows)
+    finally:
+        await loaded.aclose()
+    return rows
+
+
+def run(label, paginate, site, page_urls, parse, prefetch):
+    context = Context(site)
+    start = time.perf_counter()
+    rows = asyncio.run(paginate(context, page_urls, parse, prefetch))
+    seconds = time.perf_counter() - start
+    print(f"{label:<18} {seconds:>8.1f} {context.stats['loads']:>6} {context.stats['pages']:>6} {rows:>6}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    name = sys.argv[1] if len(sys.argv) > 1 else "nykaa"
+    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    pages_with_products = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    fixture, base_url, parse, prefetch = SITES[name]
+    prefetch = int(sys.argv[4]) if len(sys.argv) > 4 else prefetch
+    with open(os.path.join(FIXTURES_DIR, fixture), encoding="utf-8") as f:
+        site = {"html": f.read(), "pages_with_products": pages_with_products}
+    page_urls = [f"{base_url}page={page_no}" for page_no in range(1, max_pages + 1)]
+
+    print(f"{name}: {max_pages} pages requested, {pages_with_products} with products, {LOAD_SECONDS}s loads + 2s settle")
+    print(f"{'mode':<18} {'seconds':>8} {'loads':>6} {'pages':>6} {'rows':>6}")
+    try:
+        asyncio.run(parse(site["html"], page_urls[0], 1)) # Starts the parse pool outside the timings
+        run("before", paginate_before, site, page_urls, parse, prefetch)
+        run("prefetch 1", paginate_after, site, page_urls, parse, 1)
+        run(f"prefetch {prefetch}", paginate_after, site, page_urls, parse, prefetch)
+    finally:
+        shutdown_parse_pool()
@@ -0,0 +1,90 @@
+# benchmarks/bench_scrape_log.py
+"""
+Writing and reading a scrape's output: the previous scraped_offers.json (one
+json.dump of the whole list at the end of the scrape, json.load of all of it
+before ingesting) versus the JSON Lines scrape log (offer_log.py, one
+flushed line per offer, plain or gzip) read back in ingest-sized batches.
+
+Reports the time to write and read, the file size, and the peak memory
+(tracemalloc) the reading side holds on to. Offers are scaled up from
+scraped_offers.json; embedding and indexing are left out.
+
+Usage:
+    python benchmarks/bench_scrape_log.py [num_offers] [batch_size]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offers import Offer
+from offer_log import OfferLogWriter, read_log
+from run_benchmarks import synthetic_catalogue
+
+
+def write_json(offers, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([offer.to_dict() for offer in offers], f, ensure_ascii=False, indent=4)
+
+
+def read_json(path, batch_size):
+    with open(path, "r", encoding="utf-8") as f:
+        offers = [Offer.from_dict(offer) for offer in json.load(f)]
+    return len(offers)
+
+
+def write_log(offers, path):
+    with OfferLogWriter(path) as log:
+        for offer in offers:
+            log.write(offer)
+
+
+def read_log_batches(path, batch_size):
+    batch, total = [], 0
+    for record, _ in read_log(path):
+        if isinstance(record, Offer):
+            batch.append(record)
+            total += 1
+        if len(batch) >= batch_size:
+            batch.clear() # Handed to ingest_data here
+    return total
+
+
+def measure(read, path, batch_size):
+    start = time.perf_counter()
+    count = read(path, batch_size)
+    seconds = time.perf_counter() - start
+    # Timed and traced separately: tracemalloc slows down allocation-heavy code unevenly
+    tracemalloc.start()
+    read(path, batch_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, seconds, peak
+
+
+if __name__ == "__main__":
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    offers = synthetic_catalogue(num_offers)
+    tmp_dir = tempfile.mkdtemp()
+
+    print(f"{num_offers} offers, log read in batches of {batch_size}")
+    print(f"{'format':<18} {'write s':>8} {'read s':>8} {'size MB':>8} {'read peak MB':>13}")
+    for label, name, write, read in (
+        ("json (before)", "offers.json", write_json, read_json),
+        ("jsonl", "offers.jsonl", write_log, read_log_batches),
+        ("jsonl.gz", "offers.jsonl.gz", write_log, read_log_batches),
+    ):
+        path = os.path.join(tmp_dir, name)
+        start = time.perf_counter()
+        write(offers, path)
+        write_seconds = time.perf_counter() - start
+        count, read_seconds, peak = measure(read, path, batch_size)
+        assert count == num_offers, (label, count)
+        print(f"{label:<18} {write_seconds:>8.2f} {read_seconds:>8.2f} {os.path.getsize(path) / 1e6:>8.1f} {peak / 1e6:>13.1f}")
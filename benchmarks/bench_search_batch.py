@@ -0,0 +1,73 @@
+# benchmarks/bench_search_batch.py
+"""
+Throughput of search_offers (one query at a time) versus search_offers_batch
+at batch sizes 1, 16 and 256 over a synthetic flat index in one shard.
+
+Embeddings are replaced with deterministic random vectors so the numbers
+measure the FAISS search and metadata join, not the network.
+
+Usage:
+    python benchmarks/bench_search_batch.py [num_offers] [dimension]
+"""
+import os
+import sys
+import tempfile
+import time
+import logging
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest_to_vector_db import VectorDBManager, GENERIC_SHARD
+from offers import Offer
+
+BATCH_SIZES = (1, 16, 256)
+K = 20
+
+
+class RandomEmbeddingDBManager(VectorDBManager):
+    def __init__(self, dimension, **kwargs):
+        self.dimension = dimension
+        self.rng = np.random.default_rng(7)
+        super().__init__(**kwargs)
+
+    def _get_embedding(self, text):
+        return self.rng.standard_normal(self.dimension).astype('float32').tolist()
+
+    def _get_embeddings(self, texts):
+        return self.rng.standard_normal((len(texts), self.dimension)).astype('float32')
+
+
+def build_manager(num_offers, dimension):
+    manager = RandomEmbeddingDBManager(dimension, db_path=os.path.join(tempfile.mkdtemp(), "bench_index"))
+    manager.shards[GENERIC_SHARD].add(
+        np.random.default_rng(1).standard_normal((num_offers, dimension)).astype('float32'),
+        [Offer(f"Offer {i}", brand_name="Bench") for i in range(num_offers)],
+        np.full(num_offers, np.inf),
+    )
+    return manager
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    manager = build_manager(num_offers, dimension)
+    print(f"{num_offers} offers, dimension {dimension}, k={K}")
+    print(f"{'batch':>6} {'loop q/s':>10} {'batch q/s':>10} {'speedup':>8}")
+
+    for batch_size in BATCH_SIZES:
+        queries = [f"query {i}" for i in range(batch_size)]
+
+        start = time.perf_counter()
+        for query in queries:
+            manager.search_offers(query, k=K)
+        loop_rate = batch_size / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        manager.search_offers_batch(queries, k=K)
+        batch_rate = batch_size / (time.perf_counter() - start)
+
+        print(f"{batch_size:>6} {loop_rate:>10.1f} {batch_rate:>10.1f} {batch_rate / loop_rate:>7.1f}x")
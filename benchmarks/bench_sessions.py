@@ -0,0 +1,92 @@
+# benchmarks/bench_sessions.py
+"""
+Follow-up questions in a Slack thread answered the previous way (each one
+a new query_llm: embedding, k=20 search and 20 offers in the prompt) versus
+through the thread's session (sessions.py), which narrows the offers kept
+from the thread's question without a new search where it can.
+
+Each thread asks one of run_benchmarks.QUERY_TEMPLATES and then three
+follow-ups: a price cap, the brand of an offer in the first answer, and a
+minimum discount. Reports, for the follow-ups only, p50/p99 latency, the
+searches run and the prompt tokens sent. OpenAI calls go to the mock server
+(benchmarks/mock_openai.py); the catalogue is scaled up from
+scraped_offers.json.
+
+Usage:
+    python benchmarks/bench_sessions.py [num_offers] [threads] [embedding_latency_ms]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from run_benchmarks import QUERY_TEMPLATES, start_mock_server, synthetic_catalogue, write_catalogue_index, percentiles
+
+DIMENSIONS = 256
+
+
+def follow_ups(first_answer_offers):
+    brand = next((offer.brand_name for offer in first_answer_offers if offer.brand_name), "Samsung")
+    return ["which of those are under ₹15,000?", f"only {brand}", "any with at least 20% off?"]
+
+
+def run(label, processor, db_manager, threads, use_sessions):
+    rng = random.Random(1)
+    searches = 0
+    search_offers = db_manager.search_offers
+
+    def counting_search(*args, **kwargs):
+        nonlocal searches
+        searches += 1
+        return search_offers(*args, **kwargs)
+
+    latencies = []
+    prompt_tokens = 0
+    for thread in range(threads):
+        key = ("C0", f"{thread}.0") if use_sessions else None
+        question = rng.choice(QUERY_TEMPLATES)
+        processor.query_llm(question, key)
+        texts = follow_ups(db_manager.search_offers(question, k=20))
+        db_manager.search_offers = counting_search
+        tokens_before = processor.prompt_tokens_total
+        for text in texts:
+            start = time.perf_counter()
+            processor.query_llm(text, key)
+            latencies.append((time.perf_counter() - start) * 1000)
+        prompt_tokens += processor.prompt_tokens_total - tokens_before
+        db_manager.search_offers = search_offers
+    p = percentiles(latencies)
+    print(f"{label:<8} {len(latencies):>10} {p['p50_ms']:>8.1f} {p['p99_ms']:>8.1f} {searches:>9} {prompt_tokens / len(latencies):>15.0f}")
+
+
+if __name__ == "__main__":
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    embedding_latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    mock_process, base_url = start_mock_server(embedding_latency_ms, 0)
+    # Set before the repo's modules create their OpenAI client
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-benchmark"
+    logging.disable(logging.WARNING)
+    try:
+        from ingest_to_vector_db import VectorDBManager
+        from rag_query import RAGQueryProcessor
+
+        db_path = os.path.join(tempfile.mkdtemp(prefix="promo_bench_"), "faiss_index")
+        write_catalogue_index(db_path, synthetic_catalogue(num_offers), DIMENSIONS)
+        db_manager = VectorDBManager(db_path=db_path)
+        db_manager.embedding_dimensions = DIMENSIONS
+
+        print(f"{num_offers} offers, {threads} threads x 3 follow-ups, {embedding_latency_ms:.0f} ms embeddings")
+        print(f"{'mode':<8} {'follow-ups':>10} {'p50 ms':>8} {'p99 ms':>8} {'searches':>9} {'prompt tok/q':>15}")
+        run("before", RAGQueryProcessor(db_manager=db_manager), db_manager, threads, use_sessions=False)
+        run("after", RAGQueryProcessor(db_manager=db_manager), db_manager, threads, use_sessions=True)
+    finally:
+        mock_process.kill()
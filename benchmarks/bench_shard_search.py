@@ -0,0 +1,81 @@
+# benchmarks/bench_shard_search.py
+"""
+Search latency of the per-retailer shards against one flat index holding
+the same vectors: shards searched one after another, shards fanned out over
+the search threads (SHARD_SEARCH_THREADS), and a search scoped to a single
+retailer's shard.
+
+Offers are spread over the shards in the proportions given by SHARE, with
+random vectors, so the numbers measure FAISS search and the merge only.
+
+Usage:
+    python benchmarks/bench_shard_search.py [num_offers] [dimension] [num_queries]
+"""
+import os
+import sys
+import time
+import tempfile
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+from ingest_to_vector_db import VectorDBManager, SHARD_NAMES
+from config import SHARD_SEARCH_THREADS
+
+K = 20
+# Share of the catalogue in each shard, in SHARD_NAMES order
+SHARE = (0.35, 0.3, 0.15, 0.05, 0.15)
+
+
+def build_manager(num_offers, dimension):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((num_offers, dimension)).astype('float32')
+    manager = VectorDBManager(db_path=os.path.join(tempfile.mkdtemp(), "bench_index"), vector_storage="float32", mmap_index=False)
+    bounds = np.cumsum([0] + [int(share * num_offers) for share in SHARE[:-1]] + [num_offers])
+    bounds[-1] = num_offers
+    for name, start, end in zip(SHARD_NAMES, bounds[:-1], bounds[1:]):
+        manager.shards[name].add(vectors[start:end], [None] * (end - start), np.full(end - start, np.inf))
+    flat = faiss.IndexFlatL2(dimension)
+    flat.add(vectors)
+    return manager, flat
+
+
+def per_query_ms(search, queries):
+    start = time.perf_counter()
+    for query in queries:
+        search(query[None, :])
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    faiss.omp_set_num_threads(1) # One query searches on one core either way; compare the fan-out only
+    manager, flat = build_manager(num_offers, dimension)
+    queries = np.random.default_rng(2).standard_normal((num_queries, dimension)).astype('float32')
+
+    parallel_pool = manager._get_search_pool()
+    manager._search_pool = ThreadPoolExecutor(max_workers=1)
+    sequential_ms = per_query_ms(lambda q: manager._search_shards(q, K), queries)
+    manager._search_pool = parallel_pool
+    parallel_ms = per_query_ms(lambda q: manager._search_shards(q, K), queries)
+    flat_ms = per_query_ms(lambda q: flat.search(q, K), queries)
+    scoped_ms = per_query_ms(lambda q: manager._search_shards(q, K, [SHARD_NAMES[1]]), queries)
+
+    _, flat_ids = flat.search(queries, K)
+    _, shard_ids, _ = manager._search_shards(queries, K)
+    agreement = np.mean([len(set(a) & set(b)) / K for a, b in zip(flat_ids, shard_ids)])
+
+    print(f"{num_offers} offers in {len(SHARD_NAMES)} shards, dimension {dimension}, k={K}, {num_queries} queries")
+    print(f"  {'one flat index':<24} {flat_ms:8.2f} ms/query")
+    print(f"  {'shards, one at a time':<24} {sequential_ms:8.2f} ms/query")
+    print(f"  {f'shards, {SHARD_SEARCH_THREADS} threads':<24} {parallel_ms:8.2f} ms/query ({sequential_ms / parallel_ms:.1f}x)")
+    print(f"  {f'{SHARD_NAMES[1]} shard only':<24} {scoped_ms:8.2f} ms/query")
+    print(f"  merged top {K} matches the flat index for {agreement:.1%} of hits")
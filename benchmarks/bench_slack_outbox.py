@@ -0,0 +1,161 @@
+# benchmarks/bench_slack_outbox.py
+"""
+A burst of requests from many channels answered the previous way (each
+handler posts a placeholder and then the whole answer with chat.postMessage
+itself) versus through SlackOutbox (handlers queue the placeholder and the
+answer, which is split at offer boundaries and replaces the placeholder).
+
+A local stand-in for Slack's Web API serves chat.postMessage and chat.update
+with Slack's per-channel limit of about one message a second (small bursts
+allowed) and answers 429 with Retry-After beyond it. Handlers run on a pool
+the size of Bolt's listener pool; each answer is a 20-offer Markdown list.
+
+Usage:
+    python benchmarks/bench_slack_outbox.py [channels] [requests_per_channel] [offers_per_answer]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_outbox import SlackOutbox
+
+HANDLER_THREADS = 10 # slack_bolt's default listener pool
+LATENCY_SECONDS = 0.05
+# Slack shows at most about 4,000 characters of a message before truncating or collapsing it
+READABLE_CHARS = 4000
+
+
+class MockSlackHandler(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    buckets = {} # channel -> [tokens, updated]
+    stats = {}
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.buckets = {}
+            cls.stats = {"posted": 0, "updated": 0, "rate_limited": 0, "too_long": 0}
+
+    def _allow(self, channel):
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(channel, (3.0, now))
+            tokens = min(3.0, tokens + (now - updated))
+            allowed = tokens >= 1
+            self.buckets[channel] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        method = self.path.rsplit("/", 1)[-1]
+        time.sleep(LATENCY_SECONDS)
+        if not self._allow(body["channel"]):
+            with self.lock:
+                self.stats["rate_limited"] += 1
+            self._send({"ok": False, "error": "ratelimited"}, 429, {"Retry-After": "1"})
+            return
+        with self.lock:
+            self.stats["updated" if method == "chat.update" else "posted"] += 1
+            self.stats["too_long"] += len(body.get("text", "")) > READABLE_CHARS
+        self._send({"ok": True, "channel": body["channel"], "ts": body.get("ts") or f"{time.time():.6f}"})
+
+    def _send(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def answer(num_offers):
+    link = "https://www.nykaa.com/bestsellers/c/15752?&eq=desktop&discount_range_filter=30-*&transaction_id=75487feecda2f77390de0a7057cb09b1&page_no=1"
+    lines = ["Here are the relevant offers I found:", ""]
+    for i in range(num_offers):
+        lines.append(f"{i + 1}. **Nykaa Cosmetics Matte Lipstick, shade {i}**  ")
+        lines.append(f"   Original Price: MRP:₹{329 + i}, Offer Price: ₹{230 + i}  ")
+        lines.append(f"   [View Offer]({link})")
+    return "\n".join(lines)
+
+
+def direct_handler(client, channel, text, lost):
+    """The previous handler: placeholder, then the answer, posted inline; a failed post loses the answer."""
+    try:
+        client.chat_postMessage(channel=channel, text="Searching for deals...")
+        client.chat_postMessage(channel=channel, text=text)
+    except SlackApiError:
+        try:
+            client.chat_postMessage(channel=channel, text="Something went wrong while processing your command.")
+        except SlackApiError:
+            pass
+        with MockSlackHandler.lock:
+            lost[0] += 1
+
+
+def outbox_handler(outbox, channel, text):
+    reply = outbox.reply(channel)
+    reply.placeholder("Searching for deals...")
+    reply.finish(text, "search")
+
+
+def run(label, handle, requests):
+    MockSlackHandler.reset()
+    handler_seconds = []
+
+    def timed(channel):
+        start = time.perf_counter()
+        handle(channel)
+        handler_seconds.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=HANDLER_THREADS) as pool:
+        list(pool.map(timed, requests))
+    return start, sorted(handler_seconds)
+
+
+def report(label, start, handler_seconds, lost, extra=""):
+    seconds = time.perf_counter() - start
+    stats = MockSlackHandler.stats
+    p95 = handler_seconds[int(0.95 * (len(handler_seconds) - 1))]
+    print(f"{label:<10} {seconds:>8.1f} {p95 * 1000:>12.0f} {stats['posted']:>7} {stats['updated']:>8} "
+          f"{stats['rate_limited']:>6} {stats['too_long']:>9} {lost:>6}  {extra}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    per_channel = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    num_offers = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockSlackHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = WebClient(token="xoxb-benchmark", base_url=f"http://127.0.0.1:{server.server_address[1]}/api/")
+    text = answer(num_offers)
+    requests = [f"C{c:03d}" for _ in range(per_channel) for c in range(channels)]
+
+    print(f"{channels} channels x {per_channel} requests, {num_offers}-offer answers of {len(text)} chars, {HANDLER_THREADS} handler threads")
+    print(f"{'mode':<10} {'seconds':>8} {'p95 handler':>12} {'posted':>7} {'updated':>8} {'429s':>6} {'>4k chars':>9} {'lost':>6}")
+
+    lost = [0]
+    start, handler_seconds = run("direct", lambda channel: direct_handler(client, channel, text, lost), requests)
+    report("direct", start, handler_seconds, lost[0])
+
+    outbox = SlackOutbox(client)
+    start, handler_seconds = run("outbox", lambda channel: outbox_handler(outbox, channel, text), requests)
+    outbox.wait_until_idle()
+    stats = outbox.stats
+    report("outbox", start, handler_seconds, stats["dropped"], f"(coalesced {stats['coalesced']}, retried {stats['retried']})")
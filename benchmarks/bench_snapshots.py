@@ -0,0 +1,157 @@
+# benchmarks/bench_snapshots.py
+"""
+Publishing the index as checksummed snapshots (snapshots.py) versus the
+previous save, which renamed a shard's index and metadata files over the old
+ones one after the other.
+
+Part one times, for one shard of `num_offers` offers: writing and sealing
+its files, publishing the manifest, loading it with and without checksum
+verification, and a reader hot-swapping to the new generation.
+
+Part two runs a writer process that keeps saving a shard whose every row is
+tagged with its generation, while this process keeps reading it back. A read
+is torn when its index and metadata come from different saves. Before, the
+reader opened the shard files directly; after, it follows the manifest
+with VectorDBManager.reload, so its reads include polls that found nothing
+new.
+
+Usage:
+    python benchmarks/bench_snapshots.py [num_offers] [dimension] [race_seconds]
+"""
+import os
+import sys
+import time
+import pickle
+import logging
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+from offers import Offer
+from ingest_to_vector_db import VectorDBManager, VectorShard, GENERIC_SHARD, shard_path
+from snapshots import publish, read_manifest
+
+
+def generation_shard(db_path, generation, rows, dimension):
+    """A shard whose vectors and offer titles all carry `generation`; its size varies with it too."""
+    shard = VectorShard(GENERIC_SHARD, shard_path(db_path, GENERIC_SHARD), vector_storage="float32", mmap_index=False)
+    count = rows + generation % 7
+    offers = [Offer(f"{generation}", brand_name="Bench") for _ in range(count)]
+    shard.add(np.full((count, dimension), generation, dtype='float32'), offers, np.full(count, np.inf))
+    return shard
+
+
+def is_torn(index, offers):
+    if index is None:
+        return False
+    return index.ntotal != len(offers) or int(index.reconstruct(0)[0]) != int(offers[0].title)
+
+
+def write_before(db_path, rows, dimension, stop):
+    prefix = shard_path(db_path, GENERIC_SHARD)
+    generation = 0
+    while not stop.is_set():
+        generation += 1
+        shard = generation_shard(db_path, generation, rows, dimension)
+        faiss.write_index(shard.index, prefix + ".bin.tmp")
+        with open(prefix + "_metadata.pkl.tmp", "wb") as f:
+            pickle.dump(shard.metadata_store, f)
+        os.replace(prefix + ".bin.tmp", prefix + ".bin")
+        os.replace(prefix + "_metadata.pkl.tmp", prefix + "_metadata.pkl")
+
+
+def write_after(db_path, rows, dimension, stop):
+    logging.disable(logging.WARNING)
+    generation = 0
+    while not stop.is_set():
+        generation += 1
+        shard = generation_shard(db_path, generation, rows, dimension)
+        publish(db_path, {GENERIC_SHARD: shard.save()})
+
+
+def read_before(db_path):
+    prefix = shard_path(db_path, GENERIC_SHARD)
+    index = faiss.read_index(prefix + ".bin")
+    with open(prefix + "_metadata.pkl", "rb") as f:
+        return index, pickle.load(f)
+
+
+def race(label, writer, db_path, rows, dimension, seconds):
+    stop = multiprocessing.Event()
+    process = multiprocessing.Process(target=writer, args=(db_path, rows, dimension, stop))
+    process.start()
+    manager = None
+    reads = torn = failed = 0
+    deadline = time.time() + seconds
+    try:
+        while time.time() < deadline:
+            try:
+                if writer is write_before:
+                    index, offers = read_before(db_path)
+                else:
+                    manager = manager or VectorDBManager(db_path=db_path, vector_storage="float32", mmap_index=False)
+                    manager.reload()
+                    shard = manager.shards[GENERIC_SHARD]
+                    index, offers = shard.index, shard.metadata_store
+            except Exception:
+                failed += 1 # A file vanished or was half-read
+                continue
+            reads += 1
+            torn += is_torn(index, offers)
+    finally:
+        stop.set()
+        process.join()
+    generations = read_manifest(db_path)["generation"] if writer is write_after else "-"
+    print(f"{label:<8} {reads:>7} {torn:>7} {failed:>7} {generations:>12}")
+
+
+def timings(num_offers, dimension):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_index")
+    rng = np.random.default_rng(1)
+    shard = VectorShard(GENERIC_SHARD, shard_path(db_path, GENERIC_SHARD))
+    offers = [Offer(f"Offer {i}", brand_name="Bench") for i in range(num_offers)]
+    shard.add(rng.standard_normal((num_offers, dimension)).astype('float32'), offers, np.full(num_offers, np.inf))
+    reader = VectorDBManager(db_path=db_path)
+
+    start = time.perf_counter()
+    entry = shard.save()
+    save_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    publish(db_path, {GENERIC_SHARD: entry})
+    publish_ms = (time.perf_counter() - start) * 1000
+    size_mb = sum(os.path.getsize(os.path.join(os.path.dirname(db_path), file)) for file in entry["files"].values()) / 2**20
+
+    load_ms = {}
+    for verify in (True, False):
+        start = time.perf_counter()
+        VectorShard(GENERIC_SHARD, shard.path, verify_checksums=verify).load(entry)
+        load_ms[verify] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    reader.reload()
+    swap_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    reader.reload()
+    poll_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{num_offers} offers, dimension {dimension}, {size_mb:.1f} MB of shard files")
+    print(f"{'save + seal ms':>15} {'publish ms':>11} {'load ms':>8} {'load, verify ms':>16} {'hot-swap ms':>12} {'idle poll ms':>13}")
+    print(f"{save_ms:>15.1f} {publish_ms:>11.1f} {load_ms[False]:>8.1f} {load_ms[True]:>16.1f} {swap_ms:>12.1f} {poll_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    race_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    timings(num_offers, dimension)
+    print()
+    print(f"Concurrent writer and reader, {race_seconds}s each")
+    print(f"{'mode':<8} {'reads':>7} {'torn':>7} {'failed':>7} {'generations':>12}")
+    for label, writer in (("before", write_before), ("after", write_after)):
+        race(label, writer, os.path.join(tempfile.mkdtemp(), "bench_index"), 200, 64, race_seconds)
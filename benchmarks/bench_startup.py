@@ -0,0 +1,90 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start time to the first answer for a query-serving process, with the
+FAISS index loaded normally versus memory-mapped (INDEX_MMAP).
+
+A synthetic index is written to a temporary directory, then each mode runs
+in a fresh Python process that imports the RAG stack, builds a
+VectorDBManager and answers one search. Query embeddings are random vectors
+so the timing covers only local startup work. Max RSS includes mapped
+index pages the search touched; with mmap those are shared page cache, not
+private memory of each process.
+
+Usage:
+    python benchmarks/bench_startup.py [num_offers] [dimension] [runs]
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(db_path, mmap_index):
+    import time
+    start = time.perf_counter()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.INFO)
+    import resource
+    import numpy as np
+    from ingest_to_vector_db import VectorDBManager
+    imported = time.perf_counter()
+
+    manager = VectorDBManager(db_path=db_path, mmap_index=mmap_index)
+    loaded = time.perf_counter()
+
+    dimension = manager.index_dimension
+    manager._get_embedding = lambda text: np.random.default_rng(0).standard_normal(dimension).astype('float32').tolist()
+    manager.search_offers("first query", k=20)
+    answered = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "load_ms": (loaded - imported) * 1000,
+        "first_search_ms": (answered - loaded) * 1000,
+        "total_ms": (answered - start) * 1000,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def build_index(num_offers, dimension):
+    import numpy as np
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.INFO)
+    from offers import Offer
+    from ingest_to_vector_db import VectorShard, GENERIC_SHARD, shard_path
+    from snapshots import publish
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_index")
+    shard = VectorShard(GENERIC_SHARD, shard_path(db_path, GENERIC_SHARD), vector_storage="float32", mmap_index=False)
+    rng = np.random.default_rng(1)
+    for start in range(0, num_offers, 10000):
+        count = min(10000, num_offers - start)
+        offers = [Offer(f"Offer {i}", brand_name="Bench") for i in range(start, start + count)]
+        shard.add(rng.standard_normal((count, dimension)).astype('float32'), offers, np.full(count, np.inf))
+    publish(db_path, {GENERIC_SHARD: shard.save()})
+    return db_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3] == "1")
+        sys.exit(0)
+
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    db_path = build_index(num_offers, dimension)
+
+    print(f"{num_offers} offers, dimension {dimension}, best of {runs} runs (page cache warm)")
+    print(f"{'mode':<10} {'import ms':>10} {'load ms':>9} {'1st search ms':>14} {'total ms':>9} {'max RSS MB':>11}")
+    for label, flag in (("read", "0"), ("mmap", "1")):
+        results = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, __file__, "--child", db_path, flag], capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(results, key=lambda r: r["total_ms"])
+        print(f"{label:<10} {best['import_ms']:>10.0f} {best['load_ms']:>9.0f} {best['first_search_ms']:>14.0f} {best['total_ms']:>9.0f} {best['max_rss_mb']:>11.0f}")
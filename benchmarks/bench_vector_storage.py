@@ -0,0 +1,108 @@
+# benchmarks/bench_vector_storage.py
+"""
+Memory, load time and recall@10 of the VECTOR_STORAGE modes against the
+current float32 flat index.
+
+Vectors are drawn around the embeddings in the data/faiss_index_*.bin
+shards when they exist (so they look like real text-embedding-3 output), otherwise around
+random centres. Shortened embeddings are simulated by truncating and
+re-normalising, which is how the text-embedding-3 `dimensions` option works.
+The isotropic noise added here is spread evenly over all dimensions, so
+recall for the shortened modes is pessimistic; confirm it on real queries.
+
+Usage:
+    python benchmarks/bench_vector_storage.py [num_offers] [num_queries]
+"""
+import os
+import sys
+import glob
+import tempfile
+import time
+import logging
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import faiss
+from ingest_to_vector_db import VectorShard
+
+K = 10
+# (label, vector_storage, dimensions, exact rerank)
+MODES = [
+    ("float32 flat", "float32", None, False),
+    ("float16", "float16", None, False),
+    ("float16 + rerank", "float16", None, True),
+    ("int8", "int8", None, False),
+    ("int8 + rerank", "int8", None, True),
+    ("float16 @512d + rerank", "float16", 512, True),
+    ("int8 @256d + rerank", "int8", 256, True),
+]
+
+
+def synthetic_vectors(num_offers, num_queries):
+    rng = np.random.default_rng(3)
+    existing = [faiss.read_index(path) for path in glob.glob(os.path.join(ROOT, "data", "faiss_index_*.bin"))]
+    existing = [index for index in existing if index.ntotal]
+    if existing:
+        centres = np.concatenate([index.reconstruct_n(0, index.ntotal) for index in existing])
+    else:
+        centres = rng.standard_normal((128, 1536)).astype('float32')
+        centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    dimension = centres.shape[1]
+
+    def sample(n):
+        picks = centres[rng.integers(0, len(centres), n)]
+        vectors = picks + rng.standard_normal((n, dimension)).astype('float32') * (0.5 / np.sqrt(dimension))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype('float32')
+
+    return sample(num_offers), sample(num_queries)
+
+
+def shorten(vectors, dimensions):
+    if not dimensions:
+        return vectors
+    short = np.ascontiguousarray(vectors[:, :dimensions])
+    return short / np.linalg.norm(short, axis=1, keepdims=True)
+
+
+def build(storage, vectors):
+    shard = VectorShard("bench", os.path.join(tempfile.mkdtemp(), "bench_index"), vector_storage=storage)
+    shard.add(vectors, [None] * len(vectors), np.full(len(vectors), np.inf))
+    shard.save()
+    return shard
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    num_offers = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    base, queries = synthetic_vectors(num_offers, num_queries)
+
+    truth = faiss.IndexFlatL2(base.shape[1])
+    truth.add(base)
+    _, truth_ids = truth.search(queries, K)
+
+    print(f"{num_offers} offers, {num_queries} queries, recall@{K} against float32 flat")
+    print(f"{'mode':<24} {'index MB':>9} {'rerank MB':>10} {'load ms':>8} {'search ms/q':>12} {'recall':>7}")
+    for label, storage, dimensions, rerank in MODES:
+        vectors, query_vectors = shorten(base, dimensions), shorten(queries, dimensions)
+        shard = build(storage, vectors)
+        if not rerank:
+            shard.full_vectors = None
+
+        index_file = shard._file("index")
+        start = time.perf_counter()
+        faiss.read_index(index_file)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        _, ids = shard._search_live(query_vectors, K)
+        search_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+        recall = np.mean([len(set(found) & set(expected)) / K for found, expected in zip(ids, truth_ids)])
+        index_mb = os.path.getsize(index_file) / 2**20
+        rerank_mb = os.path.getsize(shard._file("vectors")) / 2**20 if rerank else 0.0
+        print(f"{label:<24} {index_mb:>9.1f} {rerank_mb:>10.1f} {load_ms:>8.1f} {search_ms:>12.3f} {recall:>7.3f}")
@@ -0,0 +1,245 @@
+# benchmarks/mock_openai.py
+"""
+Local stand-in for the OpenAI embeddings and chat completions endpoints, so
+the pipeline can be benchmarked without an API key or network access.
+
+Embeddings are deterministic: each word maps to a fixed random vector and a
+text embeds to the normalised sum of its words, so texts sharing words land
+near each other and searches return sensible neighbours. Completions return a
+canned answer with a usage block. Like the real API, the usage block reports
+cached prompt tokens: prompts of 1024+ tokens are cached in 128-token steps
+and a later prompt that repeats a cached prefix is billed as a cache hit.
+Both endpoints can add a fixed latency.
+
+The embeddings endpoint can also enforce requests- and tokens-per-minute
+limits (each paced per second, the way the API enforces them over short
+windows) and reject a random share of requests. Rejections are 429s with
+the API's error body and retry-after / retry-after-ms headers; counts of
+served and rejected requests are kept in MockOpenAIHandler.stats.
+
+Point the repo at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python benchmarks/mock_openai.py [--port 8099] [--embedding-latency-ms 0] [--completion-latency-ms 0]
+        [--embedding-rpm 0] [--embedding-tpm 0] [--embedding-429-rate 0]
+"""
+import re
+import sys
+import json
+import math
+import time
+import zlib
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+DEFAULT_DIMENSIONS = 1536 # text-embedding-3-small
+_WORD = re.compile(r"\w+")
+CHARS_PER_TOKEN = 4
+MIN_CACHED_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+_word_vectors = {}
+
+
+def _word_vector(word, dimensions):
+    key = (word, dimensions)
+    vector = _word_vectors.get(key)
+    if vector is None:
+        vector = _word_vectors[key] = np.random.default_rng(zlib.crc32(word.encode("utf-8"))).standard_normal(dimensions).astype('float32')
+    return vector
+
+
+def fake_embedding(text, dimensions=DEFAULT_DIMENSIONS):
+    words = _WORD.findall(text.lower()) or ["<empty>"]
+    vector = np.sum([_word_vector(word, dimensions) for word in words], axis=0)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def fake_embeddings(texts, dimensions=DEFAULT_DIMENSIONS):
+    """float32 matrix of fake_embedding for each text; what the server returns for a batch."""
+    return np.array([fake_embedding(text, dimensions) for text in texts], dtype='float32')
+
+
+def _approx_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class PromptCache:
+    """Prefix cache in the shape of the API's automatic prompt caching."""
+    def __init__(self):
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, text):
+        """Tokens of the longest cached prefix of `text`; caches all of its prefixes for later prompts."""
+        lengths = range(MIN_CACHED_TOKENS * CHARS_PER_TOKEN, len(text) + 1, CACHE_STEP_TOKENS * CHARS_PER_TOKEN)
+        digests = [(length, hashlib.sha1(text[:length].encode("utf-8")).digest()) for length in lengths]
+        cached = 0
+        with self._lock:
+            for length, digest in digests:
+                if digest not in self._prefixes:
+                    break
+                cached = length // CHARS_PER_TOKEN
+            self._prefixes.update(digest for _, digest in digests)
+        return cached
+
+
+class RateLimit:
+    """Per-minute budget enforced per second, like the API: refills at per_minute / 60 a second, holds one second's worth."""
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate, 1.0)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def shortfall(self, amount):
+        """Seconds until `amount` is available, 0 if it is now."""
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (min(amount, self.capacity) - self.available) / self.rate)
+
+    def take(self, amount):
+        self.available -= amount # A request bigger than the bucket leaves it in debt
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    embedding_latency = 0.0
+    completion_latency = 0.0
+    embedding_limits = {} # "requests"/"tokens" -> RateLimit
+    embedding_429_rate = 0.0
+    limits_lock = threading.Lock()
+    stats = {"embedding_requests": 0, "embedding_429s": 0}
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real API through the SDK's connection pool
+    disable_nagle_algorithm = True # Headers and body are separate writes; Nagle would add ~40 ms per response
+    prompt_cache = PromptCache()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/embeddings"):
+            rejection = self._embedding_rejection(request)
+            if rejection:
+                self._send(*rejection)
+                return
+            time.sleep(self.embedding_latency)
+            self._send(self._embeddings(request))
+        elif self.path.endswith("/chat/completions"):
+            time.sleep(self.completion_latency)
+            self._send(self._completion(request))
+        else:
+            self._send({"error": {"message": f"Unknown endpoint {self.path}"}}, status=404)
+
+    def _embedding_rejection(self, request):
+        """(payload, status, headers) of a 429 if the request is over a limit or randomly rejected, else None."""
+        texts = request.get("input", [])
+        tokens = sum(_approx_tokens(text) for text in ([texts] if isinstance(texts, str) else texts))
+        with self.limits_lock:
+            self.stats["embedding_requests"] += 1
+            amounts = {"requests": 1, "tokens": tokens}
+            # Check every limit before taking from any, so a rejected request uses up nothing
+            over = {name: limit.shortfall(amounts[name]) for name, limit in self.embedding_limits.items()}
+            over = {name: seconds for name, seconds in over.items() if seconds > 0}
+            if over:
+                kind = max(over, key=over.get)
+                wait = over[kind]
+            elif random.random() < self.embedding_429_rate:
+                kind, wait = "requests", random.uniform(0.05, 0.5)
+            else:
+                for name, limit in self.embedding_limits.items():
+                    limit.take(amounts[name])
+                return None
+            self.stats["embedding_429s"] += 1
+        error = {"error": {
+            "message": f"Rate limit reached for {request.get('model')} on {kind} per min. Please try again in {wait * 1000:.0f}ms.",
+            "type": kind, "param": None, "code": "rate_limit_exceeded",
+        }}
+        return error, 429, {"retry-after-ms": f"{wait * 1000:.0f}", "retry-after": str(math.ceil(wait))}
+
+    def _embeddings(self, request):
+        texts = request.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = fake_embeddings(texts, request.get("dimensions") or DEFAULT_DIMENSIONS)
+        as_base64 = request.get("encoding_format") == "base64" # The SDK asks for base64 by default
+        data = [{
+            "object": "embedding",
+            "index": i,
+            "embedding": base64.b64encode(vector.astype('<f4').tobytes()).decode("ascii") if as_base64 else vector.tolist(),
+        } for i, vector in enumerate(vectors)]
+        tokens = sum(_approx_tokens(text) for text in texts)
+        return {"object": "list", "data": data, "model": request.get("model"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _completion(self, request):
+        prompt = "".join(f"{message.get('role')}:{message.get('content') or ''}\n" for message in request.get("messages", []))
+        prompt_tokens = _approx_tokens(prompt)
+        cached_tokens = self.prompt_cache.cached_tokens(prompt)
+        content = "Here are the best matching offers from the catalogue. [View Offer](https://example.com/offer)"
+        completion_tokens = _approx_tokens(content)
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+    def _send(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def set_embedding_limits(rpm=0, tpm=0, error_rate=0.0):
+    """Sets the embeddings endpoint's limits (0 is unlimited) and random 429 share, with full budgets and zeroed stats."""
+    with MockOpenAIHandler.limits_lock:
+        MockOpenAIHandler.embedding_limits = {name: RateLimit(per_minute) for name, per_minute in (("requests", rpm), ("tokens", tpm)) if per_minute}
+        MockOpenAIHandler.embedding_429_rate = error_rate
+        MockOpenAIHandler.stats.update(embedding_requests=0, embedding_429s=0)
+
+
+def serve(port=0, embedding_latency_ms=0.0, completion_latency_ms=0.0, embedding_rpm=0, embedding_tpm=0, embedding_429_rate=0.0):
+    MockOpenAIHandler.embedding_latency = embedding_latency_ms / 1000
+    MockOpenAIHandler.completion_latency = completion_latency_ms / 1000
+    set_embedding_limits(embedding_rpm, embedding_tpm, embedding_429_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOpenAIHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099, help="0 picks a free port")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--completion-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-rpm", type=int, default=0, help="embedding requests per minute before 429s; 0 is unlimited")
+    parser.add_argument("--embedding-tpm", type=int, default=0, help="embedding tokens per minute before 429s; 0 is unlimited")
+    parser.add_argument("--embedding-429-rate", type=float, default=0.0, help="share of embedding requests rejected at random")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.embedding_latency_ms, args.completion_latency_ms, args.embedding_rpm, args.embedding_tpm, args.embedding_429_rate)
+    # The first line tells a parent process which port was picked
+    print(f"http://127.0.0.1:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
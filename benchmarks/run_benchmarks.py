@@ -0,0 +1,346 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark suite for the scrape -> ingest -> search -> answer pipeline.
+Needs no API key and no network: OpenAI calls go to benchmarks/mock_openai.py,
+started as a subprocess, and pages come from benchmarks/fixtures/.
+
+Stages:
+    parse   site parsers and the generic extractor over the HTML fixtures
+    scrape  WebScraper._scrape_page for every site branch, with Playwright
+            serving the fixtures through request interception (skipped when
+            Chromium is not installed; includes the scraper's fixed waits)
+    ingest  VectorDBManager.ingest_data (dedupe, embeddings, FAISS add, save)
+            of --ingest-sample offers on top of each catalogue
+    search  p50/p99 of the FAISS search fanned out over the retailer shards
+            alone and of search_offers with its embedding call, over each
+            full-size catalogue
+    query   RAGQueryProcessor.query_llm end to end, with the share of prompt
+            tokens the mock server's prompt cache reports as cached
+
+Catalogues are scaled up from scraped_offers.json (1k, 100k and 1m offers
+are the named sizes; any integer works). fixtures/manifest.json maps URL
+prefixes to fixture files. 1m needs several GB of memory at 256 dimensions.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales 1k,100k] [--stages parse,scrape,ingest,search,query]
+        [--dimensions 256] [--queries 200] [--ingest-sample 1000]
+        [--embedding-latency-ms 0] [--completion-latency-ms 0] [--json results.json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+SCRAPED_OFFERS = os.path.join(ROOT, "scraped_offers.json")
+sys.path.insert(0, ROOT)
+
+from mock_openai import fake_embeddings
+from offers import Offer
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+STAGES = ("parse", "scrape", "ingest", "search", "query")
+# Entry URL for each site branch of WebScraper._scrape_page
+SCRAPE_ENTRY_URLS = [
+    "https://www.nykaa.com/sp/offers-native/offers",
+    "https://www.flipkart.com/offers-store",
+    "https://www.flipkart.com/search?q=beauty+and+cosmetics&page=1",
+    "https://www.adidas.co.in/offers",
+    "https://in.puma.com/in/en/puma-sale-collection",
+    "https://www.amazon.in/deals?ref_=nav_cs_gb",
+    "https://www.example-store.com/summer-sale",
+]
+QUERY_TEMPLATES = [
+    "Any flat 50% off deals today?", "best phone deals under 15000", "Nykaa shampoo offers",
+    "adidas running shoes discount", "cashback on electronics", "top beauty deals this week",
+]
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"p50_ms": None, "p99_ms": None, "n": 0}
+    return {"p50_ms": float(np.percentile(samples_ms, 50)), "p99_ms": float(np.percentile(samples_ms, 99)), "n": len(samples_ms)}
+
+
+def timed_ms(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def parse_scale(value):
+    value = value.strip().lower()
+    return SCALES[value] if value in SCALES else int(value)
+
+
+# --- Mock OpenAI server ---
+
+def start_mock_server(embedding_latency_ms, completion_latency_ms):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "mock_openai.py"), "--port", "0",
+         "--embedding-latency-ms", str(embedding_latency_ms), "--completion-latency-ms", str(completion_latency_ms)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.kill()
+        raise RuntimeError("Mock OpenAI server did not start.")
+    return process, base_url
+
+
+# --- Synthetic catalogues ---
+
+def synthetic_catalogue(n, seed=0):
+    """
+    n offers built from scraped_offers.json. Each pairs one offer's title with another's
+    description plus a few catalogue words and a variant code, so near-duplicate
+    collapse keeps them apart the way it would distinct products. Links keep the base
+    offer's site and query but get a per-variant path, so no two share a product page.
+    """
+    with open(SCRAPED_OFFERS, encoding="utf-8") as f:
+        base = json.load(f)
+    vocabulary = sorted({word for offer in base for word in re.findall(r"[A-Za-z]{4,}", offer.get("title") or "")})
+    rng = random.Random(seed)
+    now = datetime.now()
+    offers = []
+    for i in range(n):
+        first, second = base[i % len(base)], base[rng.randrange(len(base))]
+        link = urlsplit(first.get("offer_link") or "https://www.example-store.com/offer")
+        offers.append(Offer(
+            title=f"{first.get('title', '')} {' '.join(rng.choice(vocabulary) for _ in range(4))} V{i:07d}",
+            description=f"{(second.get('description') or '')[:200]} | Price: Rs.{rng.randint(99, 99999)}",
+            expiry_date=now + timedelta(days=rng.randint(1, 30)) if rng.random() < 0.3 else None,
+            brand_name=first.get("brand_name"),
+            offer_link=link._replace(path=f"/bench/V{i:07d}").geturl(),
+            category=first.get("category"),
+            campaign_info=first.get("campaign_info"),
+            channels="Website",
+        ))
+    return offers
+
+
+def write_catalogue_index(db_path, offers, dimensions, batch_size=20000):
+    """Writes offers straight to their retailer shards' index + metadata files and publishes them, embedding locally like the mock server would."""
+    from ingest_to_vector_db import VectorShard, offer_embedding_text, offer_expires_at, offer_shard, shard_path
+    from snapshots import publish
+    last_seen = datetime.now()
+    by_shard, entries = {}, {}
+    for offer in offers:
+        offer.last_seen = last_seen
+        by_shard.setdefault(offer_shard(offer), []).append(offer)
+    for name, shard_offers in by_shard.items():
+        shard = VectorShard(name, shard_path(db_path, name), vector_storage="float32", mmap_index=False)
+        for start in range(0, len(shard_offers), batch_size):
+            batch = shard_offers[start:start + batch_size]
+            embeddings = fake_embeddings([offer_embedding_text(offer) for offer in batch], dimensions)
+            shard.add(embeddings, batch, np.array([offer_expires_at(offer) for offer in batch], dtype='float64'))
+        entries[name] = shard.save()
+    publish(db_path, entries)
+
+
+# --- Stages ---
+
+def bench_parse(repeat=20):
+    from html_parsers import parse_nykaa_bestsellers, parse_flipkart_search, scan_generic_offers
+    cases = [
+        ("nykaa_bestsellers.html", parse_nykaa_bestsellers, ("https://www.nykaa.com/sp/bestsellers/bestsellers?page_no=1", 1)),
+        ("flipkart_search.html", parse_flipkart_search, (1,)),
+    ] + [(name, scan_generic_offers, ()) for name in sorted(os.listdir(FIXTURES_DIR)) if name.endswith(".html")]
+    results = {}
+    for name, parser, args in cases:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            html_bytes = f.read()
+        samples = []
+        for _ in range(repeat):
+            ms, rows = timed_ms(parser, html_bytes, *args)
+            samples.append(ms)
+        results[f"{parser.__name__}:{name}"] = dict(percentiles(samples), rows=len(rows), kb=len(html_bytes) // 1024)
+    return results
+
+
+def _fixture_for(url, manifest):
+    for prefix, name in manifest.items():
+        if url.startswith(prefix):
+            return name
+    return None
+
+
+async def _scrape_fixtures(urls):
+    from playwright.async_api import async_playwright
+    from scraper import WebScraper
+    from html_parsers import shutdown_parse_pool
+
+    with open(os.path.join(FIXTURES_DIR, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    async def serve_fixture(route):
+        request = route.request
+        name = _fixture_for(request.url, manifest)
+        if name:
+            with open(os.path.join(FIXTURES_DIR, name), "rb") as fixture:
+                await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=fixture.read())
+        elif request.resource_type == "document":
+            await route.fulfill(status=404, content_type="text/html", body="<html><body>Not recorded</body></html>")
+        else:
+            await route.abort()
+
+    scraper = WebScraper(urls)
+    results = {}
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            # The scraper opens extra contexts for Flipkart categories and Amazon deal pages;
+            # every context has to be served from the fixtures too.
+            new_context = browser.new_context
+
+            async def new_context_with_fixtures(**kwargs):
+                context = await new_context(**kwargs)
+                await context.route("**/*", serve_fixture)
+                return context
+
+            browser.new_context = new_context_with_fixtures
+            for url in urls:
+                context = await browser.new_context()
+                page = await context.new_page()
+                start = time.perf_counter()
+                offers = await scraper._scrape_page(page, url)
+                results[url] = {"seconds": time.perf_counter() - start, "offers": len(offers)}
+                await context.close()
+            await browser.close()
+    finally:
+        shutdown_parse_pool()
+    return results
+
+
+def bench_scrape():
+    try:
+        return asyncio.run(_scrape_fixtures(SCRAPE_ENTRY_URLS))
+    except Exception as e:
+        message = str(e).splitlines()[0]
+        print(f"  scrape stage skipped: {message} (install a browser with `playwright install chromium`)")
+        return {"skipped": message}
+
+
+def bench_catalogue(n, args, stages):
+    """Ingest, search and query stages for one catalogue size."""
+    from ingest_to_vector_db import VectorDBManager
+    from rag_query import RAGQueryProcessor
+
+    results = {}
+    offers = synthetic_catalogue(n)
+    sample_size = min(args.ingest_sample, n)
+    base, sample = offers[:n - sample_size], offers[n - sample_size:]
+    db_path = os.path.join(tempfile.mkdtemp(prefix="promo_bench_"), "faiss_index")
+
+    start = time.perf_counter()
+    if base:
+        write_catalogue_index(db_path, base, args.dimensions)
+    results["build_seconds"] = time.perf_counter() - start
+
+    manager = VectorDBManager(db_path=db_path)
+    manager.embedding_dimensions = args.dimensions
+    if "ingest" in stages or not base:
+        ms, _ = timed_ms(manager.ingest_data, sample)
+        results["ingest"] = {
+            "offers": len(sample),
+            "indexed_after_dedupe": manager.ntotal - len(base),
+            "seconds": ms / 1000,
+            "offers_per_second": len(sample) / (ms / 1000),
+        }
+    if manager.is_empty():
+        return results
+
+    rng = random.Random(1)
+    queries = [rng.choice(QUERY_TEMPLATES) if i % 2 else " ".join(rng.choice(offers).title.split()[:5]) for i in range(args.queries)]
+    if "search" in stages:
+        query_vectors = fake_embeddings(queries, args.dimensions)
+        faiss_ms = []
+        for vector in query_vectors:
+            ms, _ = timed_ms(manager._search_shards, vector[None, :], 20)
+            faiss_ms.append(ms)
+        search_ms = [timed_ms(manager.search_offers, query, 20)[0] for query in queries]
+        results["search"] = {"faiss": percentiles(faiss_ms), "search_offers": percentiles(search_ms)}
+    if "query" in stages:
+        processor = RAGQueryProcessor(db_manager=manager)
+        query_ms = [timed_ms(processor.query_llm, query)[0] for query in queries[:args.llm_queries]]
+        results["query"] = dict(percentiles(query_ms), cached_token_ratio=processor.cached_token_ratio())
+    return results
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1k,100k", help="catalogue sizes: 1k, 10k, 100k, 1m or integers")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--dimensions", type=int, default=256, help="embedding size served by the mock server")
+    parser.add_argument("--queries", type=int, default=200, help="searches per catalogue")
+    parser.add_argument("--llm-queries", type=int, default=50, help="end-to-end query_llm calls per catalogue")
+    parser.add_argument("--ingest-sample", type=int, default=1000, help="offers ingested through ingest_data per catalogue")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--completion-latency-ms", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+
+    mock_process, base_url = start_mock_server(args.embedding_latency_ms, args.completion_latency_ms)
+    # Set before the repo's modules create their OpenAI client
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-benchmark"
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.disable(logging.INFO)
+
+    results = {"settings": vars(args), "mock_server": base_url}
+    try:
+        if "parse" in stages:
+            print("== parse (fixtures, ms per page) ==")
+            results["parse"] = bench_parse()
+            for name, r in results["parse"].items():
+                print(f"  {name:<55} {r['kb']:>5} KB {r['rows']:>4} rows  p50 {_fmt(r['p50_ms'])}  p99 {_fmt(r['p99_ms'])}")
+
+        if "scrape" in stages:
+            print("== scrape (Playwright on fixtures) ==")
+            results["scrape"] = bench_scrape()
+            for url, r in results["scrape"].items():
+                if isinstance(r, dict):
+                    print(f"  {url:<65} {r['offers']:>4} offers  {r['seconds']:.1f} s")
+
+        catalogue_stages = [stage for stage in stages if stage in ("ingest", "search", "query")]
+        if catalogue_stages:
+            results["catalogues"] = {}
+            for scale in args.scales.split(","):
+                n = parse_scale(scale)
+                print(f"== catalogue of {n} offers, {args.dimensions} dimensions ==")
+                r = results["catalogues"][scale.strip()] = bench_catalogue(n, args, catalogue_stages)
+                print(f"  built in {r['build_seconds']:.1f} s")
+                if "ingest" in r:
+                    i = r["ingest"]
+                    print(f"  ingest   {i['offers']} offers ({i['indexed_after_dedupe']} after dedupe) in {i['seconds']:.2f} s = {i['offers_per_second']:.0f} offers/s")
+                if "search" in r:
+                    for label, p in r["search"].items():
+                        print(f"  search   {label:<14} p50 {_fmt(p['p50_ms'])} ms  p99 {_fmt(p['p99_ms'])} ms  (n={p['n']})")
+                if "query" in r:
+                    p = r["query"]
+                    print(f"  query    {'query_llm':<14} p50 {_fmt(p['p50_ms'])} ms  p99 {_fmt(p['p99_ms'])} ms  (n={p['n']})  cached tokens {p['cached_token_ratio']:.0%}")
+    finally:
+        mock_process.terminate()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,110 @@
+# canonical_urls.py
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit, unquote
+
+# Parameters that only track a visit, dropped from links on hosts without a rule of their own
+_TRACKING_PARAM = re.compile(r"(?:utm_\w+|gclid|fbclid|mc_[ce]id|ref_?|tag|affid|affExtParam\d*)$", re.IGNORECASE)
+# Host prefixes that serve the same pages as www.
+_HOST_PREFIX = re.compile(r"^(?:www|m|dl)\.")
+
+_AMAZON_ASIN = re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?=[/?]|$)", re.IGNORECASE)
+_AMAZON_REF_SEGMENT = re.compile(r"/ref=[^/]*$")
+_AMAZON_KEEP = frozenset(("k", "i", "node", "rh", "s", "page"))
+
+# /<slug>/p/itm<id>?pid=<variant>: the pid picks the colour/size variant
+_FLIPKART_PRODUCT = re.compile(r"^(?:/[^/]+)?/p/itm[0-9a-z]+$", re.IGNORECASE)
+_FLIPKART_PRODUCT_KEEP = frozenset(("pid",))
+_FLIPKART_LISTING_KEEP = frozenset(("sid", "p[]", "q", "sort", "collection-tab-name", "page"))
+
+_NYKAA_PRODUCT = re.compile(r"/p/\d+$")
+_NYKAA_PRODUCT_KEEP = frozenset(("skuId",))
+_NYKAA_LISTING_KEEP = frozenset(("page_no", "sort", "q"))
+_NYKAA_FILTER = re.compile(r"\w+_filter$")
+
+# /<slug>/<article number>.html
+_ADIDAS_PRODUCT = re.compile(r"/[A-Z0-9]{6}\.html$", re.IGNORECASE)
+_ADIDAS_LISTING_KEEP = frozenset(("start", "sort", "q"))
+
+
+def _params(query):
+    """(decoded name, raw "name=value") pairs; values are kept exactly as they were encoded."""
+    return [(unquote(part.split("=", 1)[0]), part) for part in query.split("&") if part]
+
+
+def _keep(params, names, pattern=None):
+    return [raw for name, raw in params if name in names or (pattern is not None and pattern.match(name))]
+
+
+def _amazon(path, params):
+    match = _AMAZON_ASIN.search(path)
+    if match:
+        return f"/dp/{match.group(1).upper()}", [], True
+    return _AMAZON_REF_SEGMENT.sub("", path) or "/", _keep(params, _AMAZON_KEEP), False
+
+
+def _flipkart(path, params):
+    if _FLIPKART_PRODUCT.match(path):
+        return path, _keep(params, _FLIPKART_PRODUCT_KEEP), True
+    return path, _keep(params, _FLIPKART_LISTING_KEEP), False
+
+
+def _nykaa(path, params):
+    if _NYKAA_PRODUCT.search(path):
+        return path, _keep(params, _NYKAA_PRODUCT_KEEP), True
+    return path, _keep(params, _NYKAA_LISTING_KEEP, _NYKAA_FILTER), False
+
+
+def _adidas(path, params):
+    if _ADIDAS_PRODUCT.search(path):
+        return path, [], True
+    return path, _keep(params, _ADIDAS_LISTING_KEEP), False
+
+
+# Registrable domain -> rule returning (path, kept raw params, whether the URL names one product)
+_RULES = {
+    "amazon.in": _amazon,
+    "amazon.com": _amazon,
+    "flipkart.com": _flipkart,
+    "nykaa.com": _nykaa,
+    "adidas.co.in": _adidas,
+}
+
+
+@lru_cache(maxsize=4096)
+def _canonicalize(url):
+    parts = urlsplit(url.strip())
+    if not parts.netloc:
+        return url, False
+    host = parts.hostname or ""
+    domain = _HOST_PREFIX.sub("", host)
+    rule = _RULES.get(domain)
+    params = _params(parts.query)
+    if rule is None:
+        netloc = host + (f":{parts.port}" if parts.port else "")
+        path, kept, is_product = parts.path, [raw for name, raw in params if not _TRACKING_PARAM.match(name)], False
+        scheme = parts.scheme.lower()
+    else:
+        netloc, scheme = "www." + domain, "https"
+        path, kept, is_product = rule(parts.path, params)
+    return f"{scheme}://{netloc}{path}" + (f"?{'&'.join(kept)}" if kept else ""), is_product
+
+
+def canonical_url(url):
+    """
+    The canonical form of an offer link: https and www. for the retailers, no fragment,
+    and only the query parameters that change what the page shows. Amazon product links
+    become /dp/<ASIN>; Flipkart, Nykaa and Adidas links lose their tracking parameters.
+    Links to other hosts only lose utm_*/gclid-style trackers. None stays None.
+    """
+    if not url:
+        return url
+    return _canonicalize(url)[0]
+
+
+def product_key(url):
+    """The canonical URL if `url` is a single product's page (two offers with it are the same offer), else None."""
+    if not url:
+        return None
+    canonical, is_product = _canonicalize(url)
+    return canonical if is_product else None
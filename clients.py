@@ -0,0 +1,22 @@
+# clients.py
+import threading
+
+from config import OPENAI_API_KEY
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """
+    Returns the process-wide OpenAI client, creating it on first use.
+    The OpenAI SDK is only imported here, so processes that never call the
+    API (or have not yet) do not pay for importing it.
+    """
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
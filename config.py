@@ -7,11 +7,21 @@ load_dotenv(override=True)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-print(f"DEBUG: OPENAI_API_KEY loaded: '{OPENAI_API_KEY}'")
-
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
 
+# The bot's replies go through an outbound queue (slack_outbox.py). Each channel gets
+# SLACK_POSTS_PER_SECOND messages a second, in bursts of up to SLACK_POST_BURST (Slack
+# allows about one chat.postMessage a second per channel). Answers longer than
+# SLACK_MESSAGE_MAX_CHARS are split at offer boundaries into several messages. A post that
+# is rate limited or fails transiently is retried up to SLACK_POST_MAX_RETRIES times, then
+# dropped. SLACK_POST_THREADS channels are posted to at once.
+SLACK_POSTS_PER_SECOND = 1.0
+SLACK_POST_BURST = 3
+SLACK_MESSAGE_MAX_CHARS = 3500
+SLACK_POST_MAX_RETRIES = 4
+SLACK_POST_THREADS = 4
+
 FAISS_DB_PATH = "data/faiss_index" 
 
 
@@ -23,21 +33,159 @@ SCRAPE_URLS = [
     #"https://www.amazon.in/deals?ref_=nav_cs_gb",
 ]
 
-#For Flipkart, you can replace "beauty+and+cosmetics" with any product name, and it will work as is. Eg- Mobile
+# Scrapes are appended to a JSON Lines log, one offer per line, flushed as each offer is
+# found, so a crashed scrape keeps what it had. SCRAPE_LOG_COMPRESS gzips it. Ingestion
+# streams the log in batches of INGEST_BATCH_SIZE offers and saves the offset it reached
+# to "<log>.checkpoint" after each, so a rerun only ingests what was appended since. The
+# refresh worker writes one log per job to REFRESH_SCRAPE_LOG_DIR and ingests it while the
+# scrape is still running, checking for new lines every SCRAPE_LOG_POLL_SECONDS.
+SCRAPE_LOG_COMPRESS = False
+SCRAPE_LOG_SUFFIX = ".jsonl.gz" if SCRAPE_LOG_COMPRESS else ".jsonl"
+SCRAPE_LOG_PATH = "scraped_offers" + SCRAPE_LOG_SUFFIX
+REFRESH_SCRAPE_LOG_DIR = "data/scrapes"
+INGEST_BATCH_SIZE = 1000
+SCRAPE_LOG_POLL_SECONDS = 0.5
 
-OFFER_DETAILS_SCHEMA = {
-    "title": None,
-    "description": None,
-    "expiry_date": None,
-    "brand_name": None,
-    "offer_link": None,
-    "category": None, # Added for vector DB metadata
-    "campaign_info": None, # Additional output
-    "channels": None # Additional output
-}
+#For Flipkart, you can replace "beauty+and+cosmetics" with any product name, and it will work as is. Eg- Mobile
 
 # LLM Model
 LLM_MODEL = "gpt-4o-mini"
 
 # Embedding Model
 EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Embedding requests are paced to stay under the account's rate limits for EMBEDDING_MODEL
+# (requests and tokens per minute; tokens are counted with tiktoken). Up to
+# EMBEDDING_MAX_CONCURRENCY batches of at most EMBEDDING_BATCH_SIZE texts and
+# EMBEDDING_BATCH_MAX_TOKENS tokens are in flight; the limit halves on a 429 and grows back
+# after a run of successes. Failed requests are retried up to EMBEDDING_MAX_RETRIES times
+# (EMBEDDING_QUERY_MAX_RETRIES for user queries) with jittered exponential backoff, or after
+# the retry-after the API sends. Offers that still fail are kept in a dead-letter file next
+# to the index and retried by the next ingest.
+EMBEDDING_REQUESTS_PER_MINUTE = 3000
+EMBEDDING_TOKENS_PER_MINUTE = 1000000
+EMBEDDING_MAX_CONCURRENCY = 8
+EMBEDDING_BATCH_SIZE = 256
+EMBEDDING_BATCH_MAX_TOKENS = 100000
+EMBEDDING_MAX_RETRIES = 6
+EMBEDDING_QUERY_MAX_RETRIES = 2
+EMBEDDING_RETRY_BASE_SECONDS = 0.5
+EMBEDDING_RETRY_MAX_SECONDS = 30
+
+# Offers whose title + description overlap at least this much (estimated Jaccard
+# similarity) are collapsed into one before embedding.
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Offers without an expiry_date are served for this many hours after the last
+# scrape that saw them. Set to 0 to never expire them.
+OFFER_TTL_HOURS = 72
+# How often the background sweep compacts expired offers out of the FAISS index. It runs
+# in the refresh worker; a sweep whose publish loses to a refresh is redone on the
+# refreshed shards, up to COMPACT_PUBLISH_ATTEMPTS times in all.
+EXPIRY_SWEEP_INTERVAL_SECONDS = 3600
+COMPACT_PUBLISH_ATTEMPTS = 3
+
+# Top-deals digest behind `summary`: offers are ranked by a weighted mix of their discount
+# percentage, absolute price drop (log-scaled, full marks at a 100,000 drop) and how close
+# a dated offer is to expiring (full marks when it expires now, none at DIGEST_URGENCY_DAYS
+# or later). The best DIGEST_TOP_PER_CATEGORY offers of each category are kept.
+DIGEST_SCORE_WEIGHTS = {"discount": 0.6, "price_drop": 0.25, "expiry": 0.15}
+DIGEST_URGENCY_DAYS = 7
+DIGEST_TOP_PER_CATEGORY = 5
+
+# Conversation threads: the offers retrieved for a question in a Slack thread and the
+# filters applied since are kept for SESSION_TTL_SECONDS after the thread's last question,
+# for at most SESSION_MAX_THREADS threads (the least recently asked are dropped first).
+# A follow-up that only narrows them ("which of those are under ₹15,000?", "only Samsung")
+# is answered without a new search. When none of the kept offers pass, up to
+# SESSION_REFILL_K offers are retrieved for the thread's question and filtered instead.
+SESSION_TTL_SECONDS = 1800
+SESSION_MAX_THREADS = 1000
+SESSION_REFILL_K = 100
+
+# How embeddings are stored in the FAISS index: "float32" (exact, 6 KB per offer at
+# 1536 dims), "float16" (half the memory) or "int8" (a quarter). Compressed modes keep
+# a memory-mapped float32 copy on disk to rerank the top candidates exactly.
+VECTOR_STORAGE = "float32"
+# Shortened text-embedding-3 output size (e.g. 512), or None for the model default.
+# Changing either setting requires rebuilding the index.
+EMBEDDING_DIMENSIONS = None
+# Compressed indexes fetch this many times k candidates before the exact rerank
+RERANK_CANDIDATES_FACTOR = 4
+# int8 learns its per-dimension ranges from the vectors it is trained on; a shard is
+# retrained on all its full-precision vectors once it holds this many times as many rows.
+INT8_RETRAIN_GROWTH = 2
+
+# The vector store keeps one FAISS index per retailer (data/faiss_index_<shard>.bin plus its
+# metadata), chosen by the host of the page an offer was scraped from, so refreshing a site
+# rewrites only its own shard. Offers from any other host go to GENERIC_SHARD. Searches run
+# on up to SHARD_SEARCH_THREADS shards at once and merge the hits by distance.
+RETAILER_SHARDS = {
+    "amazon": "amazon.in",
+    "flipkart": "flipkart.com",
+    "nykaa": "nykaa.com",
+    "adidas": "adidas.co.in",
+}
+GENERIC_SHARD = "generic"
+SHARD_SEARCH_THREADS = 5
+
+# Load the FAISS index memory-mapped and read-only, so bot processes on one host
+# share the page cache and start without copying the index into memory.
+INDEX_MMAP = True
+
+# Every save writes a new, never-modified set of shard files and publishes it as a new
+# generation by replacing data/faiss_index_manifest.json, which records each shard's files
+# and their sha256. Readers load only what a manifest lists, checking the checksums when
+# SNAPSHOT_VERIFY_CHECKSUMS is on (this reads each file once), and bots poll the manifest
+# to hot-swap to new generations. Only the refresh worker publishes; a publish of a shard
+# another writer changed since it was loaded is rejected. Files a newer generation replaced are deleted after
+# SNAPSHOT_GC_GRACE_SECONDS. A publish lock older than SNAPSHOT_LOCK_STALE_SECONDS is
+# assumed to be left by a crashed writer.
+SNAPSHOT_VERIFY_CHECKSUMS = True
+SNAPSHOT_GC_GRACE_SECONDS = 900
+SNAPSHOT_LOCK_STALE_SECONDS = 60
+
+# Query-only processes (e.g. extra bot replicas) never scrape on startup, even with
+# an empty index; the scraper and browser stack are then only loaded by a refresh.
+QUERY_ONLY = os.getenv("PROMO_SENSEI_QUERY_ONLY", "").lower() in ("1", "true", "yes")
+
+# Refresh jobs are queued in this SQLite file and run by `python refresh_worker.py`,
+# outside the bot processes. Bots poll it for progress and new index generations.
+REFRESH_QUEUE_PATH = "data/refresh_jobs.sqlite3"
+REFRESH_POLL_INTERVAL_SECONDS = 5
+# A running job that has not reported progress for this long is handed to another worker
+REFRESH_JOB_TIMEOUT_SECONDS = 3600
+
+# Scheduled refresh: the refresh worker re-scrapes each site on its own cadence (minutes,
+# keyed by host), least recently refreshed first. Each run is jittered by up to
+# REFRESH_JITTER_FRACTION of the interval, and a scrape that finds no offers is retried
+# after SCRAPE_RETRY_MINUTES. Set SCHEDULED_REFRESH to False to refresh only on request.
+SCHEDULED_REFRESH = True
+SITE_REFRESH_INTERVAL_MINUTES = {
+    "www.amazon.in": 60,
+    "www.flipkart.com": 180,
+    "www.nykaa.com": 360,
+    "www.adidas.co.in": 7 * 24 * 60,
+}
+DEFAULT_REFRESH_INTERVAL_MINUTES = 360
+REFRESH_JITTER_FRACTION = 0.1
+SCRAPE_RETRY_MINUTES = 15
+# Browser pages scraping at the same time, and so sites per scheduled refresh round
+MAX_CONCURRENT_SCRAPES = 2
+
+# Latency histograms for scraping, embeddings, search, prompts, LLM calls and Slack posts,
+# and counters of retried and dropped Slack posts.
+# When enabled, each process serves them at http://127.0.0.1:<port>/metrics (Prometheus
+# text format) and /metrics.json, and writes a JSON dump on exit. Disabled by default.
+METRICS_ENABLED = os.getenv("PROMO_SENSEI_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("PROMO_SENSEI_METRICS_PORT", "9108"))
+# The refresh worker runs next to the bot, so it listens on the following port
+REFRESH_WORKER_METRICS_PORT = METRICS_PORT + 1
+METRICS_JSON_PATH = "data/metrics_{process}.json"
+
+# Profiling: add `--profile` to a command (or set PROMO_SENSEI_PROFILE=1 for every
+# request and refresh) to sample the call stack while it runs. Each profile is saved
+# to PROFILE_OUTPUT_DIR as folded stacks for flamegraph tools plus a per-stage JSON.
+PROFILE_ALL_REQUESTS = os.getenv("PROMO_SENSEI_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_OUTPUT_DIR = "data/profiles"
+PROFILE_SAMPLE_INTERVAL_MS = 5
@@ -0,0 +1,138 @@
+# dedupe.py
+import re
+import zlib
+import random
+import logging
+from urllib.parse import urlparse
+
+from config import NEAR_DUPLICATE_THRESHOLD
+from canonical_urls import product_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 64 MinHash permutations split into 16 LSH bands of 4 rows. With these settings
+# a pair at Jaccard 0.8 becomes a candidate with probability > 0.99, while pairs
+# below 0.3 almost never do; candidates are then checked against the threshold.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+_NON_WORD = re.compile(r"[^\w%₹]+")
+
+
+def _normalize(offer):
+    text = f"{offer.title or ''} {offer.description or ''}".lower()
+    return _NON_WORD.sub(" ", text).split()
+
+
+def _shingles(words):
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(words):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in _shingles(words)]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _estimated_jaccard(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def _site_of(offer):
+    netloc = urlparse(offer.offer_link or "").netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    return netloc or (offer.brand_name or "unknown")
+
+
+def _merge(group):
+    """Keeps the first offer of a duplicate group and records where the others came from."""
+    merged = group[0].copy()
+    categories = []
+    links = []
+    for offer in group:
+        if offer.category and offer.category not in categories:
+            categories.append(offer.category)
+        if offer.offer_link and offer.offer_link not in links:
+            links.append(offer.offer_link)
+    merged.categories = categories
+    merged.offer_links = links
+    merged.duplicate_count = len(group)
+    return merged
+
+
+def collapse_near_duplicates(offers, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Collapses offers linking to the same product page (canonical_urls.product_key) and
+    near-duplicate offers (MinHash/LSH over normalized title + description) so each
+    product is embedded once. Only offers scraped from the same source_url are merged,
+    so a kept offer never moves to another retailer's shard. Returns (unique_offers, report) where report maps
+    each site to {"total", "unique", "duplicate_rate"}.
+    """
+    if not offers:
+        return [], {}
+
+    signatures = [minhash_signature(_normalize(offer)) for offer in offers]
+    rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+
+    # Union-find over offers of one source for the same product page or whose signatures
+    # collide in at least one band.
+    parent = list(range(len(offers)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first_with_key = {}
+    for i, offer in enumerate(offers):
+        key = product_key(offer.offer_link)
+        if key is None:
+            continue
+        first = first_with_key.setdefault((offer.source_url, key), i)
+        if first != i:
+            parent[find(i)] = find(first)
+
+    for band in range(LSH_BANDS):
+        buckets = {}
+        lo = band * rows_per_band
+        for i, sig in enumerate(signatures):
+            buckets.setdefault((offers[i].source_url, sig[lo:lo + rows_per_band]), []).append(i)
+        for members in buckets.values():
+            # Every pair, since a bucket's first member need not be near either of two others that are
+            for n, a in enumerate(members):
+                for b in members[n + 1:]:
+                    root_a, root_b = find(a), find(b)
+                    if root_a != root_b and _estimated_jaccard(signatures[a], signatures[b]) >= threshold:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups = {}
+    for i in range(len(offers)):
+        groups.setdefault(find(i), []).append(offers[i])
+
+    unique_offers = [_merge(group) if len(group) > 1 else group[0] for _, group in sorted(groups.items())]
+
+    report = {}
+    for offer in offers:
+        report.setdefault(_site_of(offer), {"total": 0, "unique": 0})["total"] += 1
+    for offer in unique_offers:
+        report[_site_of(offer)]["unique"] += 1
+    for stats in report.values():
+        stats["duplicate_rate"] = round(1 - stats["unique"] / stats["total"], 4)
+
+    for site, stats in sorted(report.items()):
+        logging.info(f"Near-duplicate collapse for {site}: {stats['total']} offers -> {stats['unique']} unique ({stats['duplicate_rate']:.1%} duplicates).")
+    return unique_offers, report
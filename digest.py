@@ -0,0 +1,88 @@
+# digest.py
+import math
+import time
+import heapq
+import logging
+import threading
+from itertools import chain
+
+from config import DIGEST_SCORE_WEIGHTS, DIGEST_URGENCY_DAYS, DIGEST_TOP_PER_CATEGORY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def deal_score(offer, expires_at=None, now=None):
+    """Ranking score of an offer; see DIGEST_SCORE_WEIGHTS. `expires_at` only counts for dated offers."""
+    score = 0.0
+    if offer.discount_percent:
+        score += DIGEST_SCORE_WEIGHTS["discount"] * min(offer.discount_percent, 100) / 100
+    if offer.mrp and offer.price is not None and offer.price < offer.mrp:
+        score += DIGEST_SCORE_WEIGHTS["price_drop"] * min(math.log10(1 + offer.mrp - offer.price) / 5, 1.0)
+    if expires_at is not None and offer.expiry_date is not None:
+        days_left = (expires_at - (now or time.time())) / 86400
+        score += DIGEST_SCORE_WEIGHTS["expiry"] * min(max(1 - days_left / DIGEST_URGENCY_DAYS, 0.0), 1.0)
+    return score
+
+
+class TopDealsDigest:
+    """
+    The best live offers of `db_manager`, ranked by deal_score into one bounded min-heap per
+    category. Rebuilt on first use after the manager's index generation changes; summaries
+    generated from it are cached for the same generation, so repeated `summary` requests
+    cost no LLM call.
+    """
+    def __init__(self, db_manager, per_category=DIGEST_TOP_PER_CATEGORY):
+        self.db_manager = db_manager
+        self.per_category = per_category
+        self._generation = None
+        self._heaps = {} # category -> min-heap of (score, row, offer)
+        self._summaries = {} # k -> summary text for the current generation
+        self._lock = threading.RLock()
+
+    def _rebuild_if_stale(self):
+        generation = self.db_manager.generation
+        if generation == self._generation:
+            return
+        now = time.time()
+        heaps = {}
+        for row, (offer, expires_at) in enumerate(self.db_manager.live_offers_with_expiry()):
+            # Later rows were ingested more recently and win ties
+            entry = (deal_score(offer, expires_at, now), row, offer)
+            heap = heaps.setdefault(offer.category or "Other", [])
+            if len(heap) < self.per_category:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        self._heaps = heaps
+        self._summaries = {}
+        self._generation = generation
+        logging.info(f"Built top-deals digest for index generation {generation}: {len(heaps)} categories.")
+
+    def by_category(self):
+        """{category: offers, best first}, at most per_category offers each."""
+        with self._lock:
+            self._rebuild_if_stale()
+            return {category: [offer for _, _, offer in sorted(heap, reverse=True)] for category, heap in self._heaps.items()}
+
+    def top_deals(self, k):
+        """The k best live offers across all categories, best first."""
+        with self._lock:
+            if k > self.per_category:
+                # Each category must keep k offers for the overall top k to be among them
+                self.per_category = k
+                self._generation = None
+            self._rebuild_if_stale()
+            return [offer for _, _, offer in heapq.nlargest(k, chain.from_iterable(self._heaps.values()))]
+
+    def summary(self, k, generate):
+        """
+        Cached summary of the top k deals. On a miss, calls `generate(offers)` once, with
+        concurrent callers waiting for its result. Returns None when there are no live offers.
+        """
+        with self._lock:
+            offers = self.top_deals(k)
+            if k not in self._summaries:
+                if not offers:
+                    return None
+                self._summaries[k] = generate(offers)
+            return self._summaries[k]
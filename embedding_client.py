@@ -0,0 +1,277 @@
+# embedding_client.py
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import (
+    EMBEDDING_MODEL, EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE, EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_TOKENS, EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BASE_SECONDS, EMBEDDING_RETRY_MAX_SECONDS,
+)
+from clients import get_openai_client
+from metrics import span
+from profiling import profiled_in_thread
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Longest input the embedding models accept
+MAX_INPUT_TOKENS = 8191
+# Used to estimate token counts when the tiktoken encoding cannot be loaded (it is downloaded on first use)
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """
+    Paces a per-minute budget: refills at `per_minute / 60` units a second and holds at most
+    one second's worth, so a burst never runs far ahead of the rate the API enforces. A
+    request bigger than that waits for a full bucket and leaves it in debt.
+    """
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate, 1.0)
+        self.available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount):
+        """Blocks until `amount` units (at most a full bucket) are available, then takes `amount`."""
+        needed = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.available >= needed:
+                    self.available -= amount
+                    return
+                wait = (needed - self.available) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on requests in flight: halved when a request sent under the current limit is
+    rate limited, and raised by one after `limit` successes in a row, up to `maximum`.
+    """
+    def __init__(self, maximum, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = maximum
+        self.in_flight = 0
+        self._successes = 0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Waits for a free slot. Returns the send time to pass to on_rate_limited."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_rate_limited(self, sent_at):
+        with self._condition:
+            self._successes = 0
+            # Requests already in flight when the limit was last cut count towards that cut
+            if sent_at >= self._decreased_at and self.limit > self.minimum:
+                self.limit = max(self.minimum, self.limit // 2)
+                self._decreased_at = time.monotonic()
+                logging.warning(f"Embedding requests rate limited; concurrency lowered to {self.limit}.")
+
+
+def _retry_after_seconds(error):
+    """The wait a rate-limit response asks for (retry-after-ms or retry-after headers), or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class EmbeddingClient:
+    """
+    Embeds texts in batches on several threads without tripping the API's rate limits:
+    requests and tokens are paced by token buckets (tokens counted with tiktoken), the
+    number of requests in flight adapts to 429 responses, and failed requests are retried
+    with jittered exponential backoff, honouring retry-after. Texts that still fail are
+    reported back instead of raising, so callers can keep them for a later retry.
+    """
+    def __init__(self, model=EMBEDDING_MODEL, dimensions=None, requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE, max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+                 batch_size=EMBEDDING_BATCH_SIZE, batch_max_tokens=EMBEDDING_BATCH_MAX_TOKENS, max_retries=EMBEDDING_MAX_RETRIES):
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.batch_max_tokens = batch_max_tokens
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+        self._paused_until = 0.0 # Set from retry-after; every sender waits until then
+        self._pause_lock = threading.Lock()
+        self._encoding = None
+        self._encoding_lock = threading.Lock()
+        self._client = None
+
+    @property
+    def client(self):
+        # The SDK's own retries would hide 429s from the concurrency limit
+        if self._client is None:
+            self._client = get_openai_client().with_options(max_retries=0)
+        return self._client
+
+    def _get_encoding(self):
+        with self._encoding_lock:
+            if self._encoding is None:
+                try:
+                    import tiktoken
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model)
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logging.warning(f"Could not load the tiktoken encoding ({e}). Estimating token counts from text length.")
+                    self._encoding = False
+            return self._encoding
+
+    def prepare(self, text):
+        """(text, token count) for one input, cut to MAX_INPUT_TOKENS so the API accepts it."""
+        text = text.replace("\n", " ")
+        encoding = self._get_encoding()
+        if not encoding:
+            tokens = max(1, len(text) // CHARS_PER_TOKEN)
+            if tokens > MAX_INPUT_TOKENS:
+                text, tokens = text[:MAX_INPUT_TOKENS * CHARS_PER_TOKEN], MAX_INPUT_TOKENS
+            return text, tokens
+        token_ids = encoding.encode(text, disallowed_special=())
+        if len(token_ids) > MAX_INPUT_TOKENS:
+            logging.warning(f"Embedding input of {len(token_ids)} tokens cut to {MAX_INPUT_TOKENS}.")
+            token_ids = token_ids[:MAX_INPUT_TOKENS]
+            text = encoding.decode(token_ids)
+        return text, max(1, len(token_ids))
+
+    def _batches(self, prepared):
+        batch, batch_tokens = [], 0
+        for i, (_, tokens) in enumerate(prepared):
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.batch_max_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def embed(self, texts, max_retries=None):
+        """
+        Embeds `texts`. Returns (vectors, errors): vectors[i] is a float32 array, or None if
+        text i failed, in which case errors[i] says why.
+        """
+        prepared = [self.prepare(text) for text in texts]
+        vectors = [None] * len(texts)
+        errors = {}
+        retries = self.max_retries if max_retries is None else max_retries
+        batches = list(self._batches(prepared))
+        if len(batches) == 1:
+            self._embed_batch(batches[0], prepared, vectors, errors, retries)
+        else:
+            # A profiled ingest samples the pool threads too, where its embedding time is spent
+            embed_batch = profiled_in_thread(self._embed_batch)
+            for future in [self._pool.submit(embed_batch, batch, prepared, vectors, errors, retries) for batch in batches]:
+                future.result()
+        return vectors, errors
+
+    def _wait_for_pause(self):
+        while True:
+            with self._pause_lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def _pause(self, seconds):
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _backoff_seconds(self, attempt):
+        # Full jitter: spreads out retries of requests that failed together
+        return random.uniform(0, min(EMBEDDING_RETRY_MAX_SECONDS, EMBEDDING_RETRY_BASE_SECONDS * 2 ** attempt))
+
+    def _embed_batch(self, batch, prepared, vectors, errors, retries):
+        import openai
+        inputs = [prepared[i][0] for i in batch]
+        tokens = sum(prepared[i][1] for i in batch)
+        # Paced once: a rejected request used up nothing, and retries wait out retry-after or a backoff
+        self.request_bucket.acquire(1)
+        self.token_bucket.acquire(tokens)
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            sent_at = self.concurrency.acquire()
+            try:
+                with span("embedding", call="batch" if len(batch) > 1 else "single"):
+                    kwargs = {"model": self.model}
+                    if self.dimensions:
+                        kwargs["dimensions"] = self.dimensions # Shortened text-embedding-3 output
+                    response = self.client.embeddings.create(input=inputs, **kwargs)
+                for i, item in zip(batch, response.data):
+                    vectors[i] = np.asarray(item.embedding, dtype='float32')
+                self.concurrency.on_success()
+                return
+            except openai.RateLimitError as e:
+                self.concurrency.on_rate_limited(sent_at)
+                retry_after = _retry_after_seconds(e)
+                if retry_after is not None:
+                    self._pause(retry_after)
+                error, retryable, wait = e, True, retry_after
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                error, retryable, wait = e, True, None # APITimeoutError is an APIConnectionError
+            except openai.BadRequestError as e:
+                if len(batch) > 1:
+                    # Find the input the API rejects instead of failing the whole batch
+                    middle = len(batch) // 2
+                    self.concurrency.release()
+                    sent_at = None
+                    self._embed_batch(batch[:middle], prepared, vectors, errors, retries)
+                    self._embed_batch(batch[middle:], prepared, vectors, errors, retries)
+                    return
+                error, retryable, wait = e, False, None
+            except Exception as e:
+                error, retryable, wait = e, False, None
+            finally:
+                if sent_at is not None:
+                    self.concurrency.release()
+
+            if not retryable or attempt >= retries:
+                logging.error(f"Giving up on embedding {len(batch)} text(s) after {attempt + 1} attempt(s): {error}")
+                for i in batch:
+                    errors[i] = f"{type(error).__name__}: {error}"
+                return
+            if wait is None:
+                wait = self._backoff_seconds(attempt)
+            else:
+                wait += random.uniform(0, EMBEDDING_RETRY_BASE_SECONDS)
+            attempt += 1
+            logging.warning(f"Embedding request failed ({type(error).__name__}); retry {attempt}/{retries} in {wait:.1f} s.")
+            time.sleep(wait)
@@ -0,0 +1,457 @@
+# html_parsers.py
+import os
+import re
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from html.parser import HTMLParser
+
+from metrics import span
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Number of worker processes for CPU-heavy HTML parsing, set to 0 to use one per core
+PARSE_POOL_WORKERS = 0
+
+_parse_pool = None
+
+
+def get_parse_pool():
+    """
+    Returns the shared process pool used for HTML parsing, creating it on first use.
+    The pool is sized to the number of cores unless PARSE_POOL_WORKERS is set.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        workers = PARSE_POOL_WORKERS if PARSE_POOL_WORKERS > 0 else (os.cpu_count() or 1)
+        _parse_pool = ProcessPoolExecutor(max_workers=workers)
+        logging.info(f"Started HTML parse pool with {workers} worker processes.")
+    return _parse_pool
+
+
+def shutdown_parse_pool():
+    """Stops the parse pool workers. A new pool is created on the next parse."""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=True)
+        _parse_pool = None
+        logging.info("HTML parse pool shut down.")
+
+
+async def parse_in_pool(parser, html_content, *args):
+    """
+    Runs `parser` in the parse pool without blocking the event loop.
+    Only the raw HTML bytes (plus small arguments) cross the process boundary,
+    and parsers return lists of plain tuples so results pickle cheaply.
+    """
+    if isinstance(html_content, str):
+        html_content = html_content.encode("utf-8")
+    loop = asyncio.get_running_loop()
+    with span("page_parse", parser=parser.__name__):
+        return await loop.run_in_executor(get_parse_pool(), parser, html_content, *args)
+
+
+def _decode(html_bytes):
+    if isinstance(html_bytes, bytes):
+        return html_bytes.decode("utf-8", errors="replace")
+    return html_bytes
+
+
+# --- Nykaa bestsellers ---
+# Rows: (title, description, offer_link, campaign_info)
+
+def parse_nykaa_bestsellers(html_bytes, paginated_url, page_no):
+    from bs4 import BeautifulSoup
+    doc = BeautifulSoup(_decode(html_bytes), "html.parser")
+    rows = []
+
+    product_containers = doc.find_all('div', class_='css-1rd7vky')
+
+    if not product_containers:
+        logging.warning(f"No product containers found on Nykaa bestsellers page {page_no}.")
+        nametags = doc.find_all('div', {'class': 'css-xrzmfa'})
+        if not nametags:
+            logging.warning(f"No nametags found on Nykaa bestsellers page {page_no} (fallback failed).")
+            return rows
+
+        logging.info(f"Found {len(nametags)} product name elements (fallback). Attempting to scrape details.")
+        originalprice_elements = doc.find_all('span', {'class': 'css-17x46n5'})
+        offerprice_elements = doc.find_all('span', {'class': 'css-111z9ua'})
+        discount_elements = doc.find_all('span', {'class': 'css-r2b2eh'})
+        offer_elements = doc.find_all('p', {'class': 'css-i6xqbh'})
+        reviews_elements = doc.find_all('span', {'class': 'css-1j33oxj'})
+
+        max_len = max(len(nametags), len(originalprice_elements), len(offerprice_elements),
+                      len(discount_elements), len(offer_elements), len(reviews_elements))
+
+        def pad_list(lst, length):
+            return lst + [None] * (length - len(lst))
+
+        padded_nametags = pad_list(nametags, max_len)
+        padded_originalprice = pad_list(originalprice_elements, max_len)
+        padded_offerprice = pad_list(offerprice_elements, max_len)
+        padded_discount = pad_list(discount_elements, max_len)
+        padded_offer = pad_list(offer_elements, max_len)
+        padded_reviews = pad_list(reviews_elements, max_len)
+
+        for i in range(max_len):
+            try:
+                name = padded_nametags[i].text.strip() if padded_nametags[i] else "N/A"
+                op_text = "N/A"
+                if padded_originalprice[i]:
+                    if padded_originalprice[i].name == 'span' and 'css-17x46n5' in padded_originalprice[i].get('class', []):
+                        op_text = padded_originalprice[i].text.strip()
+                    else:
+                        mrp_span = padded_originalprice[i].find('span', class_='css-17x46n5')
+                        if mrp_span:
+                            op_text = mrp_span.text.strip()
+
+                    if op_text == 'MRP:':
+                        op_text = "N/A"
+
+                offerp_text = padded_offerprice[i].text.strip() if padded_offerprice[i] else "N/A"
+                dis_text = padded_discount[i].text.strip() if padded_discount[i] else "N/A"
+                o_text = padded_offer[i].text.strip() if padded_offer[i] else "N/A"
+
+                rows.append((
+                    name,
+                    f"Original Price: {op_text}, Offer Price: {offerp_text}, Discount: {dis_text}, Extra Offer: {o_text}",
+                    paginated_url,
+                    o_text if o_text != "N/A" else None,
+                ))
+            except Exception as e:
+                logging.warning(f"Could not extract details for product {i} on Nykaa page {page_no} (fallback): {e}")
+        return rows
+
+    for container in product_containers:
+        try:
+            title_element = container.find('div', {'class': 'css-xrzmfa'})
+            title = title_element.text.strip() if title_element else "N/A"
+
+            original_price_element = container.find('span', class_='css-17x46n5')
+            original_price = original_price_element.text.strip() if original_price_element and original_price_element.text.strip() != 'MRP:' else "N/A"
+
+            offer_price_element = container.find('span', class_='css-111z9ua')
+            offer_price = offer_price_element.text.strip() if offer_price_element else "N/A"
+
+            discount_element = container.find('span', class_='css-r2b2eh')
+            discount = discount_element.text.strip() if discount_element else "N/A"
+
+            free_gift_element = container.find('p', class_='css-i6xqbh')
+            free_gift = free_gift_element.text.strip() if free_gift_element else "N/A"
+
+            review_element = container.find('span', class_='css-1j33oxj')
+            reviews = review_element.text.strip() if review_element else "N/A"
+
+            product_link_element = container.find('a', href=True)
+            product_link = "https://www.nykaa.com" + product_link_element['href'] if product_link_element and product_link_element['href'].startswith('/') else (product_link_element['href'] if product_link_element else paginated_url)
+
+            rows.append((
+                title,
+                f"Original Price: {original_price}, Offer Price: {offer_price}, Discount: {discount}, Free Gift/Offer: {free_gift}, Reviews: {reviews}",
+                product_link,
+                free_gift if free_gift != "N/A" else None,
+            ))
+        except Exception as e:
+            logging.warning(f"Could not extract all details for a product from container on Nykaa page {page_no}: {e}")
+    return rows
+
+
+# --- Flipkart search results ---
+# Rows: (title, description, offer_link, campaign_info, rating, num_reviews)
+
+def parse_flipkart_search(html_bytes, page_no):
+    from bs4 import BeautifulSoup
+    doc = BeautifulSoup(_decode(html_bytes), "html.parser")
+    rows = []
+
+    product_cards = doc.find_all('div', class_='slAVV4')
+    if not product_cards:
+        logging.warning(f"No specific product cards ('slAVV4') found on Flipkart search results page {page_no}. Skipping this page for specific offer extraction.")
+        return rows
+
+    logging.info(f"Found {len(product_cards)} product cards on Flipkart search results page {page_no}")
+    for card in product_cards:
+        try:
+            title_element = card.find('a', class_='wjcEIp')
+            title = title_element.get('title', '').strip() if title_element else "N/A"
+            if title == "N/A" and title_element:
+                title = title_element.text.strip()
+
+            product_link_element = card.find('a', class_='VJA3rP')
+            if not product_link_element:
+                product_link_element = card.find('a', class_='wjcEIp')
+
+            product_link = "https://www.flipkart.com" + product_link_element['href'] if product_link_element and product_link_element['href'].startswith('/') else (product_link_element['href'] if product_link_element else "N/A")
+
+            offer_price_element = card.find('div', class_='Nx9bqj')
+            offer_price = offer_price_element.text.strip() if offer_price_element else "N/A"
+
+            original_price_element = card.find('div', class_='yRaY8j')
+            original_price = original_price_element.text.strip() if original_price_element else "N/A"
+
+            discount_element = card.find('div', class_='UkUFwK')
+            discount = discount_element.text.strip() if discount_element else "N/A"
+
+            description_parts = []
+            pack_info_element = card.find('div', class_='NqpwHC')
+            if pack_info_element and pack_info_element.text.strip() != "":
+                description_parts.append(pack_info_element.text.strip())
+
+            description_parts.append(f"Original Price: {original_price}, Offer Price: {offer_price}, Discount: {discount}")
+
+            hot_deal_element = card.find('div', class_='M4DNwV div.yiggsN.O5Fpg8')
+            if hot_deal_element and hot_deal_element.text.strip() != "":
+                description_parts.append(hot_deal_element.text.strip())
+
+            description = " | ".join(description_parts) if description_parts else "N/A"
+
+            rating_element = card.find('div', class_='XQDdHH')
+            rating = rating_element.text.strip() if rating_element else "N/A"
+
+            num_reviews_element = card.find('span', class_='Wphh3N')
+            num_reviews = num_reviews_element.text.strip() if num_reviews_element else "N/A"
+
+            rows.append((
+                title,
+                description,
+                product_link,
+                discount if discount != "N/A" else None,
+                rating,
+                num_reviews,
+            ))
+        except Exception as e:
+            logging.warning(f"Could not extract details for a product card on Flipkart search results page {page_no}: {e}")
+    return rows
+
+
+# --- Generic fallback ---
+# Rows: (title, description, expiry_date)
+
+# Offer phrases matched in a single pass over each text node.
+GENERIC_OFFER_PHRASES = ("% off", "flat", "cashback", "sale", "discount", "deal", "promo")
+# Text inside these tags is never shown to the user, so it is skipped.
+_INVISIBLE_TAGS = frozenset(("script", "style", "noscript", "template", "svg", "head"))
+# Candidates longer than this are trimmed; keeps JSON-ish blobs out of the index.
+GENERIC_MAX_CANDIDATE_LENGTH = 300
+
+_SENTENCE_END = re.compile(r"[.!\n]")
+_WHITESPACE = re.compile(r"\s+")
+_CLASS_NAME_LIKE = re.compile(r"^[a-z0-9_-]+$")
+_SALE_CLASS_LIKE = re.compile(r"sale-price|sale-offers", re.IGNORECASE)
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of every phrase in one
+    left-to-right pass over the text, independent of the number of phrases.
+    """
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for phrase in phrases:
+            state = 0
+            for ch in phrase:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(phrase)
+
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def finditer(self, text):
+        """Yields (start, end, phrase) for every match in `text`."""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for phrase in output[state]:
+                yield i + 1 - len(phrase), i + 1, phrase
+
+
+_offer_matcher = AhoCorasick(GENERIC_OFFER_PHRASES)
+
+
+class _VisibleTextParser(HTMLParser):
+    """Collects the text nodes a user would actually see on the page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text_nodes = []
+        self._hidden_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _INVISIBLE_TAGS:
+            self._hidden_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _INVISIBLE_TAGS and self._hidden_depth:
+            self._hidden_depth -= 1
+
+    def handle_data(self, data):
+        if not self._hidden_depth and not data.isspace():
+            self.text_nodes.append(data)
+
+
+def extract_visible_text(html_bytes):
+    parser = _VisibleTextParser()
+    parser.feed(_decode(html_bytes))
+    parser.close()
+    return parser.text_nodes
+
+
+def _is_word_char(text, i):
+    return 0 <= i < len(text) and text[i].isalnum()
+
+
+def _phrase_match_span(lowered, start, end, phrase):
+    """
+    Applies the per-phrase rules the old regex expressed and returns the span of
+    the offer phrase, or None if this occurrence is not an offer phrase.
+    """
+    if phrase == "% off":
+        digits = start
+        while digits > 0 and lowered[digits - 1].isdigit() and start - digits < 3:
+            digits -= 1
+        if digits == start or _is_word_char(lowered, end):
+            return None
+        return digits, end
+    if _is_word_char(lowered, start - 1) or _is_word_char(lowered, end):
+        return None
+    if phrase == "flat":
+        rest = lowered[end:end + 6].lstrip()
+        if not rest[:1].isdigit():
+            return None
+    return start, end
+
+
+def _sentence_bounds(text, start, end):
+    sentence_start = 0
+    for m in _SENTENCE_END.finditer(text, 0, start):
+        sentence_start = m.end()
+    m = _SENTENCE_END.search(text, end)
+    sentence_end = m.end() if m else len(text)
+    return sentence_start, sentence_end
+
+
+def scan_generic_offers(html_bytes):
+    """
+    Generic fallback extractor used when site-specific selectors find nothing.
+    Only visible text nodes are scanned, offer phrases are found with a single
+    Aho-Corasick pass per node, and candidates are deduplicated before returning.
+    """
+    rows = []
+    seen = set()
+    for node in extract_visible_text(html_bytes):
+        lowered = node.lower()
+        last_sentence_end = -1
+        node_expiry = None # Parsed lazily; expiry phrases often sit in a sentence of their own
+        for start, end, phrase in _offer_matcher.finditer(lowered):
+            if start < last_sentence_end:
+                continue # Already emitted the sentence containing this phrase
+            span = _phrase_match_span(lowered, start, end, phrase)
+            if span is None:
+                continue
+
+            sentence_start, last_sentence_end = _sentence_bounds(node, span[0], span[1])
+            text = _WHITESPACE.sub(" ", node[sentence_start:last_sentence_end]).strip()
+            if len(text) < 15 or _CLASS_NAME_LIKE.match(text): # Basic filter for class names
+                continue
+            if len(text) > GENERIC_MAX_CANDIDATE_LENGTH:
+                text = text[:GENERIC_MAX_CANDIDATE_LENGTH].rsplit(" ", 1)[0]
+
+            key = text.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+
+            title = text
+            description = text
+            if _SALE_CLASS_LIKE.match(text):
+                title = "Generic Sale/Offer"
+                description = "Generic Sale/Offer details available on the page."
+            if node_expiry is None:
+                node_expiry = parse_expiry_date(node) or ""
+            rows.append((title, description, node_expiry or None))
+    return rows
+
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate((
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ), start=1)
+    for name in names
+}
+
+# One grammar for every supported explicit expiry date, e.g. "Ends May 23, 2025",
+# "Valid till 23/05/2025", "Expires 2025-05-23", "till 23 May 2025".
+_EXPIRY_DATE_GRAMMAR = re.compile(
+    r"(?:ends|expires|valid\s+till|till)\s*"
+    r"(?:(?P<mdy_month>[a-z]+)\s+(?P<mdy_day>\d{1,2}),\s+(?P<mdy_year>\d{4})"
+    r"|(?P<dmy_day>\d{1,2})/(?P<dmy_month>\d{1,2})/(?P<dmy_year>\d{4})"
+    r"|(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})"
+    r"|(?P<dmony_day>\d{1,2})\s+(?P<dmony_month>[a-z]+)\s+(?P<dmony_year>\d{4}))",
+    re.IGNORECASE,
+)
+# Relative expiries only count after the same prefixes ("ends tomorrow"), so a stray
+# "Shop today!" is not read as one; an explicit date anywhere in the text wins.
+_RELATIVE_EXPIRY_GRAMMAR = re.compile(
+    r"\b(?:ends|expires|valid\s+till|till)\s+(?P<relative>today|tomorrow|next\s+week|next\s+month)\b",
+    re.IGNORECASE,
+)
+_RELATIVE_EXPIRY = {
+    "today": timedelta(days=0),
+    "tomorrow": timedelta(days=1),
+    "next week": timedelta(weeks=1),
+    "next month": timedelta(days=30),
+}
+
+
+def parse_expiry_date(date_string):
+    """
+    Parses an expiry date out of free text with precompiled grammars, returned as the
+    ISO timestamp of the day's midnight ("ends today" gives today's date, not the time now).
+    Example: "Ends May 23, 2025", "Valid till 23/05/2025", "Expires 2025-05-23", "ends tomorrow"
+    """
+    if not date_string:
+        return None
+    for match in _EXPIRY_DATE_GRAMMAR.finditer(date_string):
+        groups = match.groupdict()
+        try:
+            if groups["mdy_year"]:
+                year, month, day = groups["mdy_year"], _MONTHS.get(groups["mdy_month"].lower()), groups["mdy_day"]
+            elif groups["dmy_year"]:
+                year, month, day = groups["dmy_year"], groups["dmy_month"], groups["dmy_day"]
+            elif groups["iso_year"]:
+                year, month, day = groups["iso_year"], groups["iso_month"], groups["iso_day"]
+            else:
+                year, month, day = groups["dmony_year"], _MONTHS.get(groups["dmony_month"].lower()), groups["dmony_day"]
+            if month is None:
+                continue
+            return datetime(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            continue
+    match = _RELATIVE_EXPIRY_GRAMMAR.search(date_string)
+    if match:
+        expires = date.today() + _RELATIVE_EXPIRY[_WHITESPACE.sub(" ", match.group("relative").lower())]
+        return datetime(expires.year, expires.month, expires.day).isoformat()
+    return None
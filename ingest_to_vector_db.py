@@ -1,105 +1,838 @@
 # ingest_to_vector_db.py
-import openai
-from openai import OpenAI
 import faiss
 import numpy as np
 import pickle
 import os
+import re
 import logging
 import json 
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
-from config import OPENAI_API_KEY, FAISS_DB_PATH, EMBEDDING_MODEL
+from config import (
+    FAISS_DB_PATH, EMBEDDING_MODEL, OFFER_TTL_HOURS, EXPIRY_SWEEP_INTERVAL_SECONDS,
+    VECTOR_STORAGE, EMBEDDING_DIMENSIONS, RERANK_CANDIDATES_FACTOR, INDEX_MMAP,
+    RETAILER_SHARDS, GENERIC_SHARD, SHARD_SEARCH_THREADS, EMBEDDING_QUERY_MAX_RETRIES,
+    INGEST_BATCH_SIZE, SNAPSHOT_VERIFY_CHECKSUMS, COMPACT_PUBLISH_ATTEMPTS, INT8_RETRAIN_GROWTH,
+)
+from dedupe import collapse_near_duplicates
+from offers import Offer
+from offer_log import RUN_KEY, read_log, first_run_id, load_checkpoint, save_checkpoint
+from embedding_client import EmbeddingClient
+from metrics import span
+from snapshots import SnapshotError, SnapshotConflict, new_token, seal, verify, publish, read_manifest, manifest_stamp
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# FAISS scalar quantizer used for each compressed VECTOR_STORAGE mode
+_SCALAR_QUANTIZERS = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# Maps flat index codes straight from the file instead of copying them into memory.
+# Older FAISS releases only know IO_FLAG_MMAP, which reads flat indexes normally.
+_MMAP_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+SHARD_NAMES = tuple(RETAILER_SHARDS) + (GENERIC_SHARD,)
+
+def offer_expires_at(offer, default_last_seen=None):
+    """
+    Returns when an offer stops being served, as a Unix timestamp.
+    Offers with an expiry_date expire at the end of that day, whatever time of day it
+    carries, so a "sale ends today" offer scraped this afternoon is served until midnight;
+    offers without one live for OFFER_TTL_HOURS after they were last seen by a scrape.
+    """
+    expires = offer.expiry_date
+    if expires is not None:
+        return (expires.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)).timestamp()
+
+    if OFFER_TTL_HOURS <= 0:
+        return float("inf")
+    last_seen = offer.last_seen.timestamp() if offer.last_seen is not None else default_last_seen
+    if last_seen is None:
+        last_seen = time.time()
+    return last_seen + OFFER_TTL_HOURS * 3600
+
+def offer_embedding_text(offer):
+    """The text that is embedded for an offer."""
+    return (
+        f"Title: {offer.title or ''}. "
+        f"Description: {offer.description or ''}. "
+        f"Brand: {offer.brand_name or ''}. "
+        f"Category: {offer.category or ''}. " 
+        f"Expiry: {offer.expiry_date.isoformat() if offer.expiry_date else 'N/A'}."
+    )
+
+def shard_path(db_path, name):
+    """
+    File prefix of one shard. Each saved generation of it is <prefix>.<token>.bin, .<token>_metadata.pkl
+    and, when compressed, .<token>_vectors.f32; the manifest (snapshots.py) says which are current.
+    """
+    return f"{db_path}_{name}"
+
+def retailer_shard(url):
+    """The shard that offers scraped from `url` are stored in, see RETAILER_SHARDS."""
+    host = urlparse(url or "").netloc.lower()
+    for name, domain in RETAILER_SHARDS.items():
+        if host == domain or host.endswith("." + domain):
+            return name
+    return GENERIC_SHARD
+
+def offer_shard(offer):
+    """The shard an offer belongs to: that of the page it was scraped from, else of its link."""
+    return retailer_shard(offer.source_url or offer.offer_link)
+
+def shards_named_in(text):
+    """Retailer shards mentioned by name in `text`, e.g. ["amazon"] for "best phone deals on Amazon"."""
+    words = set(re.findall(r"[a-z]+", (text or "").lower()))
+    return [name for name in RETAILER_SHARDS if name in words]
+
+def _unpickle_offers(data):
+    offers = pickle.loads(data)
+    # Metadata saved before the Offer type stored plain dicts
+    return [Offer.from_dict(offer) if isinstance(offer, dict) else offer for offer in offers]
+
+def _read_offers(metadata_file):
+    """Unpickles a metadata file. Returns (offers, modification time of the file)."""
+    with open(metadata_file, "rb") as f:
+        offers = _unpickle_offers(f.read())
+    return offers, os.path.getmtime(metadata_file)
+
+class VectorShard:
+    """
+    One retailer's part of the vector store: a FAISS index plus the offers and expiry times
+    aligned with its rows, saved to its own files. Shards are loaded, written and searched
+    independently, each under its own lock. Files are written once per save and never
+    changed afterwards; `entry` is the manifest entry of the ones loaded or last saved.
+    """
+    def __init__(self, name, path, vector_storage=VECTOR_STORAGE, mmap_index=INDEX_MMAP, verify_checksums=SNAPSHOT_VERIFY_CHECKSUMS):
+        self.name = name
+        self.path = path
+        self.vector_storage = vector_storage
+        self.mmap_index = mmap_index
+        self.verify_checksums = verify_checksums
+        self.entry = None
+        self.index = None
+        self._index_is_mapped = False
+        self.full_vectors = None # Memory-mapped float32 copies for exact rerank of compressed indexes
+        self.trained_rows = 0 # Rows an int8 index learned its ranges from
+        self._metadata_store = [] # Loaded from disk on first use, see the metadata_store property
+        self._expires_at = np.empty(0, dtype='float64') # Per-row expiry, aligned with metadata_store
+        self._metadata_array = None # Object array view of metadata_store for vectorized joins
+        self._metadata_file = None # Opened by load() and read on first use, so it outlives garbage collection
+        self.lock = threading.RLock()
+
+    @property
+    def metadata_store(self):
+        if self._metadata_store is None:
+            self._load_metadata()
+        return self._metadata_store
+
+    @metadata_store.setter
+    def metadata_store(self, offers):
+        self._metadata_store = offers
+
+    @property
+    def expires_at(self):
+        if self._expires_at is None:
+            self._load_metadata()
+        return self._expires_at
+
+    @expires_at.setter
+    def expires_at(self, expires_at):
+        self._expires_at = expires_at
+
+    def is_empty(self):
+        """True when there is nothing to search. Does not load the metadata."""
+        return self.index is None or self.index.ntotal == 0
+
+    def _file(self, kind):
+        """Path of the "index", "metadata" or "vectors" file of `entry`, None if it has none."""
+        file = self.entry["files"].get(kind) if self.entry else None
+        return os.path.join(os.path.dirname(self.path), file) if file else None
+
+    def load(self, entry):
+        """
+        Loads the generation a manifest entry describes; None loads an empty shard. With
+        verify_checksums every file is checked against the entry first. Raises SnapshotError
+        if a file is missing or does not match.
+        """
+        with self.lock:
+            self.entry = entry
+            self._metadata_array = None
+            self._close_metadata_file()
+            if entry is None:
+                self.index = None
+                self._index_is_mapped = False
+                self.full_vectors = None
+                self.trained_rows = 0
+                self.metadata_store = []
+                self.expires_at = np.empty(0, dtype='float64')
+                return
+            if self.verify_checksums:
+                for kind, checksum in entry["sha256"].items():
+                    verify(self._file(kind), checksum)
+            try:
+                self._metadata_file = open(self._file("metadata"), "rb")
+            except FileNotFoundError:
+                raise SnapshotError(f"{self._file('metadata')} is missing.")
+            self._read_index()
+            self._open_full_vectors()
+            self.trained_rows = entry.get("trained_rows", entry["rows"])
+            # Metadata is unpickled on first access, so startup only maps the index
+            self._metadata_store = None
+            self._expires_at = None
+            logging.info(f"Loaded {self.name} shard with {self.index.ntotal} vectors{' (memory-mapped)' if self._index_is_mapped else ''}.")
+
+    def _load_metadata(self):
+        with self.lock:
+            if self._metadata_store is not None and self._expires_at is not None:
+                return
+            offers = []
+            saved_at = None
+            if self._metadata_file is not None:
+                # Records written before last_seen was tracked count as seen when the file was saved
+                saved_at = os.fstat(self._metadata_file.fileno()).st_mtime
+                offers = _unpickle_offers(self._metadata_file.read())
+                self._close_metadata_file()
+            self._expires_at = np.array([offer_expires_at(offer, saved_at) for offer in offers], dtype='float64')
+            self._metadata_store = offers
+            logging.info(f"Loaded {len(offers)} existing records into the {self.name} shard.")
+
+    def _close_metadata_file(self):
+        if self._metadata_file is not None:
+            self._metadata_file.close()
+            self._metadata_file = None
+
+    def _read_index(self):
+        index_file = self._file("index")
+        if self.mmap_index:
+            self.index = faiss.read_index(index_file, _MMAP_IO_FLAGS)
+        else:
+            self.index = faiss.read_index(index_file)
+        self._index_is_mapped = self.mmap_index
+
+    def _ensure_writable_index(self):
+        """A memory-mapped index is read-only; load a private copy before adding or removing rows."""
+        if self._index_is_mapped:
+            self.index = faiss.read_index(self._file("index"))
+            self._index_is_mapped = False
+
+    def _is_compressed(self):
+        return isinstance(self.index, faiss.IndexScalarQuantizer)
+
+    def _open_full_vectors(self):
+        """Memory-maps the full-precision vectors kept next to a compressed index."""
+        self.full_vectors = None
+        vectors_file = self._file("vectors")
+        if not self._is_compressed() or vectors_file is None:
+            return
+        rows = os.path.getsize(vectors_file) // (4 * self.index.d)
+        if rows != self.index.ntotal:
+            logging.warning(f"{vectors_file} has {rows} rows but the index has {self.index.ntotal}. Skipping exact rerank.")
+            return
+        if rows:
+            self.full_vectors = np.memmap(vectors_file, dtype='float32', mode='r', shape=(rows, self.index.d))
+
+    def _new_index(self, embeddings_np):
+        dimension = embeddings_np.shape[1]
+        if self.vector_storage == "float32":
+            index = faiss.IndexFlatL2(dimension)
+        else:
+            index = faiss.IndexScalarQuantizer(dimension, _SCALAR_QUANTIZERS[self.vector_storage], faiss.METRIC_L2)
+            # int8 learns per-dimension ranges from these vectors; float16 needs no training
+            index.train(embeddings_np)
+        logging.info(f"FAISS index for the {self.name} shard initialized with dimension: {dimension} ({self.vector_storage} storage)")
+        return index
+
+    def _outgrew_training(self, rows):
+        """True if an int8 index holding `rows` rows should learn its ranges again from all of them."""
+        return (
+            self._is_compressed() and self.index.sq.qtype == faiss.ScalarQuantizer.QT_8bit
+            and self.full_vectors is not None and rows >= self.trained_rows * INT8_RETRAIN_GROWTH
+        )
+
+    def add(self, embeddings_np, offers, expires_at):
+        """
+        Appends rows, creating the index on first use. An int8 index is retrained on all its
+        vectors once it outgrows the ones it was trained on. Callers hold the lock and save.
+        """
+        if self.index is None:
+            self.index = self._new_index(embeddings_np)
+            self.trained_rows = len(embeddings_np)
+        self._ensure_writable_index()
+        existing_rows = self.index.ntotal
+        if existing_rows and self._outgrew_training(existing_rows + len(embeddings_np)):
+            vectors = np.concatenate([self.full_vectors, embeddings_np])
+            logging.info(f"Retraining the {self.name} shard's int8 ranges on {len(vectors)} vectors (trained on {self.trained_rows}).")
+            self.index = self._new_index(vectors)
+            self.index.add(vectors)
+            self.full_vectors = vectors
+            self.trained_rows = len(vectors)
+        else:
+            self.index.add(embeddings_np)
+            if self._is_compressed():
+                # Held in memory until save() writes them to the next generation's vectors file
+                if not existing_rows:
+                    self.full_vectors = np.array(embeddings_np, dtype='float32')
+                elif self.full_vectors is not None:
+                    self.full_vectors = np.concatenate([self.full_vectors, embeddings_np])
+        self.metadata_store.extend(offers)
+        self.expires_at = np.concatenate([self.expires_at, expires_at])
+        self._metadata_array = None
+
+    def remove_rows(self, row_ids):
+        """Drops rows from the index and every array aligned with it. Callers hold the lock and save."""
+        self._ensure_writable_index()
+        # IndexFlat.remove_ids shifts the remaining rows down in order,
+        # so the metadata and expiry arrays are filtered the same way.
+        self.index.remove_ids(faiss.IDSelectorBatch(row_ids.astype('int64')))
+        keep = np.ones(len(self.metadata_store), dtype=bool)
+        keep[row_ids] = False
+        if self.full_vectors is not None:
+            self.full_vectors = np.array(self.full_vectors[keep])
+        self.metadata_store = [offer for offer, kept in zip(self.metadata_store, keep) if kept]
+        self.expires_at = self.expires_at[keep]
+        self._metadata_array = None
+
+    def save(self):
+        """
+        Writes the shard to new files named by a fresh token, flushed to disk, and returns
+        their manifest entry. Readers only see them once snapshots.publish is given the entry;
+        files of earlier generations are left alone, so processes mapping them are unaffected.
+        """
+        prefix = f"{self.path}.{new_token()}"
+        files = {"index": prefix + ".bin", "metadata": prefix + "_metadata.pkl"}
+        logging.info(f"Saving the {self.name} shard to {files['index']}")
+        faiss.write_index(self.index, files["index"])
+        with open(files["metadata"], "wb") as f:
+            pickle.dump(self.metadata_store, f)
+        if self._is_compressed() and self.full_vectors is not None:
+            files["vectors"] = prefix + "_vectors.f32"
+            with open(files["vectors"], "wb") as f:
+                f.write(np.ascontiguousarray(self.full_vectors, dtype='float32').tobytes())
+        self.entry = {
+            "token": prefix[len(self.path) + 1:],
+            "rows": int(self.index.ntotal),
+            "files": {kind: os.path.basename(path) for kind, path in files.items()},
+            "sha256": {kind: seal(path) for kind, path in files.items()},
+            "trained_rows": self.trained_rows,
+        }
+        if self.mmap_index:
+            self._read_index() # Drop the private copy and share the page cache again
+        self._open_full_vectors()
+        return self.entry
+
+    def compact_expired(self, now):
+        """Removes rows that expired by `now`. Returns how many; the caller saves and publishes the shard."""
+        with self.lock:
+            if self.index is None:
+                return 0
+            expired_ids = np.flatnonzero(self.expires_at <= now)
+            if len(expired_ids):
+                self.remove_rows(expired_ids)
+            return len(expired_ids)
+
+    def search(self, query_embeddings_np, k):
+        """(D, I, offers) of the k nearest live rows per query; see _search_live. Missing hits have offer None."""
+        with self.lock:
+            D, I = self._search_live(query_embeddings_np, k)
+            return D, I, self._get_metadata_array()[I] # I == -1 picks the trailing None sentinel
+
+    def _search_live(self, query_embeddings_np, k):
+        """
+        Runs one FAISS search for a matrix of query vectors and drops expired rows.
+        Expired rows stay in the index until the next sweep, so the search over-fetches
+        by the number of tombstones and the live hits are shifted left, keeping their order.
+        Compressed indexes fetch RERANK_CANDIDATES_FACTOR * k candidates and rerank them
+        exactly against the memory-mapped full-precision vectors.
+        """
+        rerank = self.full_vectors is not None
+        candidates = k * RERANK_CANDIDATES_FACTOR if rerank else k
+        live = self.expires_at > time.time()
+        search_k = max(min(candidates + int(len(live) - np.count_nonzero(live)), self.index.ntotal), 1)
+
+        D, I = self.index.search(query_embeddings_np, search_k) # D are distances, I are indices
+
+        valid = (I >= 0) & (I < len(self.metadata_store))
+        valid[valid] = live[I[valid]]
+        order = np.argsort(~valid, axis=1, kind='stable')[:, :candidates]
+        D = np.take_along_axis(D, order, axis=1)
+        I = np.take_along_axis(I, order, axis=1)
+        keep = np.take_along_axis(valid, order, axis=1)
+        D[~keep] = np.inf
+        I[~keep] = -1
+
+        if rerank:
+            exact = self.full_vectors[np.where(keep, I, 0)] # (queries, candidates, dimension)
+            D = ((exact - query_embeddings_np[:, None, :]) ** 2).sum(axis=2, dtype='float32')
+            D[~keep] = np.inf
+            order = np.argsort(D, axis=1, kind='stable')[:, :k]
+            D = np.take_along_axis(D, order, axis=1)
+            I = np.take_along_axis(I, order, axis=1)
+
+        if I.shape[1] < k:
+            pad = k - I.shape[1]
+            D = np.pad(D, ((0, 0), (0, pad)), constant_values=np.inf)
+            I = np.pad(I, ((0, 0), (0, pad)), constant_values=-1)
+        return D, I
+
+    def _get_metadata_array(self):
+        if self._metadata_array is None:
+            self._metadata_array = np.empty(len(self.metadata_store) + 1, dtype=object)
+            self._metadata_array[:-1] = self.metadata_store
+            self._metadata_array[-1] = None
+        return self._metadata_array
+
+    def live_offers_with_expiry(self, now):
+        with self.lock:
+            return [(offer, expires_at) for offer, expires_at in zip(self.metadata_store, self.expires_at.tolist()) if expires_at > now]
+
 class VectorDBManager:
-    def __init__(self, db_path=FAISS_DB_PATH, embedding_model=EMBEDDING_MODEL):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    """
+    The offer vector store, partitioned into one VectorShard per retailer (SHARD_NAMES). Offers
+    are routed to their retailer's shard, a refresh rewrites only the shards it changes, and
+    searches fan out over the shards in parallel and merge the hits by distance.
+    """
+    def __init__(self, db_path=FAISS_DB_PATH, embedding_model=EMBEDDING_MODEL, vector_storage=VECTOR_STORAGE, mmap_index=INDEX_MMAP, migrate=True):
+        if vector_storage not in ("float32",) + tuple(_SCALAR_QUANTIZERS):
+            raise ValueError(f"Unsupported vector_storage '{vector_storage}'. Use float32, float16 or int8.")
         self.embedding_model = embedding_model
+        self.embedder = EmbeddingClient(embedding_model, EMBEDDING_DIMENSIONS)
+        self.vector_storage = vector_storage
         self.db_path = db_path
-        self.index = None
-        self.metadata_store = [] 
-        self._load_or_initialize_db()
+        self.mmap_index = mmap_index
+        self.shards = {} # Shard name -> VectorShard, in SHARD_NAMES order
+        self.last_duplicate_report = {}
+        self.generation = 0 # Bumped whenever the stored offers change, see OfferSnippets
+        self.snapshot_generation = 0 # Generation of the published manifest last loaded or written
+        self._manifest_stamp = None # See reload
+        self._lock = threading.RLock() # Guards self.shards; each shard has its own lock for its rows
+        self._publish_lock = threading.Lock() # One save + publish at a time in this process
+        self._search_pool = None
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+        self._load_or_initialize_db(migrate)
 
-    def _load_or_initialize_db(self):
-        index_file = self.db_path + ".bin"
-        metadata_file = self.db_path + "_metadata.pkl"
+    @property
+    def embedding_dimensions(self):
+        return self.embedder.dimensions
 
-        if os.path.exists(index_file) and os.path.exists(metadata_file):
-            logging.info(f"Loading existing FAISS index from {index_file}")
-            self.index = faiss.read_index(index_file)
-            with open(metadata_file, "rb") as f:
-                self.metadata_store = pickle.load(f)
-            logging.info(f"Loaded {len(self.metadata_store)} existing records.")
+    @embedding_dimensions.setter
+    def embedding_dimensions(self, dimensions):
+        self.embedder.dimensions = dimensions
+
+    @property
+    def metadata_store(self):
+        """Every stored offer, shard by shard. Row numbers match the I of search_offers_batch."""
+        return [offer for shard in self._shard_list() for offer in shard.metadata_store]
+
+    @property
+    def ntotal(self):
+        """Vectors across all shards. Does not load the metadata."""
+        return sum(shard.index.ntotal for shard in self._shard_list() if shard.index is not None)
+
+    @property
+    def index_dimension(self):
+        return next((shard.index.d for shard in self._shard_list() if shard.index is not None), None)
+
+    def _shard_list(self):
+        with self._lock:
+            return list(self.shards.values())
+
+    def _new_shard(self, name):
+        return VectorShard(name, shard_path(self.db_path, name), self.vector_storage, self.mmap_index)
+
+    def is_empty(self):
+        """True when there is nothing to search. Does not load the metadata."""
+        return all(shard.is_empty() for shard in self._shard_list())
+
+    def _load_or_initialize_db(self, migrate):
+        """
+        Loads the published shards. With `migrate`, index files saved by earlier releases are
+        first published as snapshots; bots pass False and leave that to the refresh worker,
+        so only it publishes, and pick the result up through reload().
+        """
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+            logging.info(f"Created directory: {db_dir}")
+        with self._lock:
+            if migrate:
+                try:
+                    self._split_legacy_index()
+                    self._adopt_unversioned_shards()
+                except SnapshotConflict as e:
+                    logging.warning(f"{e} Another writer migrated the index first; loading its version.")
+            self._manifest_stamp = manifest_stamp(self.db_path)
+            manifest = read_manifest(self.db_path)
+            shards = {}
+            for name in SHARD_NAMES:
+                # A shard whose files are damaged starts empty rather than keeping the bot down
+                shards[name] = self._load_shard(name, manifest["shards"].get(name)) or self._load_shard(name, None)
+            self.shards = shards
+            self.snapshot_generation = manifest["generation"]
+            self.generation += 1
+        if self.is_empty():
+            logging.info("Initialized empty vector store.")
         else:
-            logging.info("Initializing new FAISS index.")
-            db_dir = os.path.dirname(self.db_path)
-            if db_dir and not os.path.exists(db_dir):
-                os.makedirs(db_dir)
-                logging.info(f"Created directory: {db_dir}")
-            self.index = None 
-            self.metadata_store = []
+            logging.info(f"Loaded vector store with {self.ntotal} vectors in {sum(not shard.is_empty() for shard in shards.values())} shard(s).")
 
-    def _get_embedding(self, text):
+    def _load_shard(self, name, entry):
+        """A new shard loaded from a manifest entry, or None if its files are missing or damaged."""
+        shard = self._new_shard(name)
         try:
-            text = text.replace("\n", " ")
-            response = self.client.embeddings.create(input=[text], model=self.embedding_model)
-            return response.data[0].embedding
-        except openai.OpenAIError as e:
-            logging.error(f"Error getting embedding: {e}")
+            shard.load(entry)
+        except (SnapshotError, OSError, RuntimeError) as e:
+            logging.error(f"Could not load generation {entry['token']} of the {name} shard: {e}")
             return None
-        except Exception as e:
-            logging.error(f"An unexpected error occurred while getting embedding: {e}")
+        self._check_dimensions(shard)
+        return shard
+
+    def _publish(self, shards):
+        """
+        Saves each of `shards` to new files and publishes them together as the next generation.
+        If another process published one of them since it was loaded, the unpublished changes
+        are dropped, the shards are reloaded from the manifest and SnapshotConflict is raised.
+        """
+        with self._publish_lock:
+            entries, based_on = {}, {}
+            for shard in shards:
+                with shard.lock:
+                    based_on[shard.name] = shard.entry
+                    entries[shard.name] = shard.save()
+            try:
+                manifest = publish(self.db_path, entries, based_on)
+            except SnapshotConflict:
+                with self._lock:
+                    self._manifest_stamp = None # Saved shards no longer match the manifest, so reload swaps them
+                self.reload()
+                raise
+        with self._lock:
+            self.snapshot_generation = manifest["generation"]
+            self.generation += 1
+
+    def _check_dimensions(self, shard):
+        if self.embedding_dimensions and shard.index is not None and shard.index.d != self.embedding_dimensions:
+            logging.warning(f"The {shard.name} shard has dimension {shard.index.d} but EMBEDDING_DIMENSIONS is {self.embedding_dimensions}. Rebuild the index after changing it.")
+
+    def _split_legacy_index(self):
+        """Moves a single index saved before the store was sharded into per-retailer shards, once."""
+        index_file, metadata_file = self.db_path + ".bin", self.db_path + "_metadata.pkl"
+        vectors_file = self.db_path + "_vectors.f32"
+        if not (os.path.exists(index_file) and os.path.exists(metadata_file)):
+            return
+        logging.info(f"Splitting {index_file} into per-retailer shards.")
+        index = faiss.read_index(index_file)
+        offers, saved_at = _read_offers(metadata_file)
+        if isinstance(index, faiss.IndexScalarQuantizer) and os.path.exists(vectors_file):
+            vectors = np.fromfile(vectors_file, dtype='float32').reshape(-1, index.d)
+        else:
+            vectors = index.reconstruct_n(0, index.ntotal)
+        if len(vectors) != len(offers):
+            logging.warning(f"{index_file} has {len(vectors)} vectors for {len(offers)} offers. Keeping the first {min(len(vectors), len(offers))}.")
+
+        rows = {}
+        last_seen = datetime.fromtimestamp(saved_at)
+        for row, offer in enumerate(offers[:len(vectors)]):
+            if offer.last_seen is None:
+                offer.last_seen = last_seen
+            rows.setdefault(offer_shard(offer), []).append(row)
+        shards = []
+        for name, shard_rows in rows.items():
+            shard = self._new_shard(name)
+            shard_offers = [offers[row] for row in shard_rows]
+            shard.add(vectors[shard_rows], shard_offers, np.array([offer_expires_at(offer) for offer in shard_offers], dtype='float64'))
+            shards.append(shard)
+            logging.info(f"Moved {len(shard_rows)} offers into the {name} shard.")
+        self._publish(shards)
+        for path in (index_file, metadata_file, vectors_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _adopt_unversioned_shards(self):
+        """Publishes shard files saved before snapshots (<prefix>.bin, _metadata.pkl) as the first generation, once."""
+        if manifest_stamp(self.db_path) is not None:
+            return
+        entries = {}
+        for name in SHARD_NAMES:
+            prefix = shard_path(self.db_path, name)
+            paths = {"index": prefix + ".bin", "metadata": prefix + "_metadata.pkl", "vectors": prefix + "_vectors.f32"}
+            if not (os.path.exists(paths["index"]) and os.path.exists(paths["metadata"])):
+                continue
+            if not os.path.exists(paths["vectors"]):
+                del paths["vectors"]
+            entries[name] = {
+                "token": "unversioned",
+                "rows": int(faiss.read_index(paths["index"], _MMAP_IO_FLAGS).ntotal),
+                "files": {kind: os.path.basename(path) for kind, path in paths.items()},
+                "sha256": {kind: seal(path) for kind, path in paths.items()},
+            }
+        if entries:
+            logging.info(f"Publishing the existing {', '.join(entries)} shard file(s) as the first index snapshot.")
+            publish(self.db_path, entries)
+
+    def reload(self):
+        """
+        Swaps in the shards that changed in the published manifest since they were loaded, e.g.
+        after the refresh worker published a new generation; unchanged shards are kept. A shard
+        whose new files fail their checksum keeps serving its current ones. Only stats the
+        manifest when nothing was published. Returns True if any shard was swapped.
+        """
+        stamp = manifest_stamp(self.db_path)
+        with self._lock:
+            if stamp == self._manifest_stamp:
+                return False
+            manifest = read_manifest(self.db_path)
+            reloaded = []
+            for name, shard in list(self.shards.items()):
+                entry = manifest["shards"].get(name)
+                if (entry or {}).get("token") == (shard.entry or {}).get("token"):
+                    continue
+                # Swap in a fresh shard; searches already running finish on the old one
+                fresh = self._load_shard(name, entry)
+                if fresh is not None:
+                    self.shards[name] = fresh
+                    reloaded.append(name)
+            self._manifest_stamp = stamp
+            self.snapshot_generation = manifest["generation"]
+            if reloaded:
+                self.generation += 1
+                logging.info(f"Loaded index generation {manifest['generation']}; reloaded shard(s): {', '.join(reloaded)}.")
+            return bool(reloaded)
+
+    def _get_embedding(self, text):
+        """Embedding of a user query, or None if it could not be fetched. Retried less than ingestion so the user is not kept waiting."""
+        vectors, errors = self.embedder.embed([text], max_retries=EMBEDDING_QUERY_MAX_RETRIES)
+        if errors:
+            logging.error(f"Error getting embedding: {errors[0]}")
+        return vectors[0]
+
+    def _get_embeddings(self, texts):
+        """Embeds a list of texts, batched. Returns a float32 array or None if any of them failed."""
+        vectors, errors = self.embedder.embed(texts, max_retries=EMBEDDING_QUERY_MAX_RETRIES)
+        if errors:
+            logging.error(f"Error getting embeddings for {len(errors)} of {len(texts)} texts: {next(iter(errors.values()))}")
             return None
+        return np.array(vectors, dtype='float32')
 
-    def ingest_data(self, offers_data):
-        if not offers_data:
+    def _embed_offers(self, offers):
+        """
+        Embeds offers and stamps them as seen now. Returns ({shard name: (embeddings, offers)},
+        [(offer, error)] for the offers whose embedding failed).
+        """
+        vectors, errors = self.embedder.embed([offer_embedding_text(offer) for offer in offers])
+        by_shard = {}
+        failed = []
+        last_seen = datetime.now()
+        for i, (offer, vector) in enumerate(zip(offers, vectors)):
+            if vector is None:
+                failed.append((offer, errors[i]))
+                continue
+            offer.last_seen = last_seen
+            embeddings, shard_offers = by_shard.setdefault(offer_shard(offer), ([], []))
+            embeddings.append(vector)
+            shard_offers.append(offer)
+        return {name: (np.array(embeddings, dtype='float32'), shard_offers) for name, (embeddings, shard_offers) in by_shard.items()}, failed
+
+    def _dead_letters_file(self):
+        return self.db_path + "_dead_letters.json"
+
+    def dead_letters(self):
+        """Offers whose embedding failed for good in the last ingest, as [(offer, error)]. The next ingest retries them."""
+        path = self._dead_letters_file()
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [(Offer.from_dict(record["offer"]), record["error"]) for record in json.load(f)]
+
+    def _save_dead_letters(self, failed):
+        path = self._dead_letters_file()
+        if not failed:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        failed_at = datetime.now().isoformat()
+        records = [{"offer": offer.to_dict(), "error": error, "last_failed_at": failed_at} for offer, error in failed]
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+        logging.warning(f"{len(failed)} offer(s) could not be embedded and were kept in {path} for the next ingest.")
+
+    def retry_dead_letters(self):
+        """Ingests the offers whose embedding failed last time; see dead_letters."""
+        self.ingest_data([])
+
+    def ingest_data(self, offers_data, replace_sources=None):
+        """
+        Embeds and indexes `offers_data`, a list of Offer, each in its retailer's shard. Offers
+        previously scraped from any URL in `replace_sources` (their `source_url`) are dropped in
+        the same save, so a site refresh replaces that site's offers instead of piling up
+        copies of them. Only the shards that gain or lose offers are rewritten, and they are
+        published together as one index generation. Offers whose
+        embedding fails for good are kept as dead letters and retried by the next ingest.
+        """
+        replace_sources = set(replace_sources or ())
+        # Dead letters from the last ingest are retried, unless this ingest re-scraped their site
+        retried = [offer for offer, _ in self.dead_letters() if offer.source_url not in replace_sources]
+        if not offers_data and not retried:
             logging.warning("No offers data provided for ingestion.")
             return
+        if retried:
+            logging.info(f"Retrying {len(retried)} offer(s) whose embedding failed in the last ingest.")
+
+        # Collapse near-duplicate offers so each product is only embedded once
+        offers_data, self.last_duplicate_report = collapse_near_duplicates(list(offers_data) + retried)
 
-        new_embeddings = []
-        new_metadata = []
-
-        for i, offer in enumerate(offers_data):
-            text_to_embed = (
-                f"Title: {offer.get('title', '')}. "
-                f"Description: {offer.get('description', '')}. "
-                f"Brand: {offer.get('brand_name', '')}. "
-                f"Category: {offer.get('category', '')}. " 
-                f"Expiry: {offer.get('expiry_date', 'N/A')}."
-            )
-            embedding = self._get_embedding(text_to_embed)
-            if embedding:
-                new_embeddings.append(embedding)
-                new_metadata.append(offer) 
-
-        if not new_embeddings:
+        new_data, failed = self._embed_offers(offers_data)
+        self._save_dead_letters(failed)
+        if not new_data:
             logging.info("No valid embeddings generated for ingestion.")
             return
 
-        embeddings_np = np.array(new_embeddings).astype('float32')
+        touched = set(new_data) | {retailer_shard(url) for url in replace_sources}
+        changed = [self._update_shard(name, *new_data.get(name, (None, [])), replace_sources) for name in SHARD_NAMES if name in touched]
+        if any(changed):
+            self._publish([shard for shard in changed if shard is not None])
+        logging.info("Data ingestion complete and FAISS index saved.")
 
-        if self.index is None:
-            dimension = embeddings_np.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-            logging.info(f"FAISS index initialized with dimension: {dimension}")
+    def ingest_log(self, log_path, replace_sources=None, follow=None, batch_size=INGEST_BATCH_SIZE):
+        """
+        Streams a scrape log (offer_log.py) into the index in batches of `batch_size` offers,
+        so memory does not grow with the log. After each batch the offset reached is saved to
+        "<log_path>.checkpoint", and the next call resumes there. In each scrape run of the
+        log, the first batch with offers from a URL in `replace_sources` replaces that site's
+        older offers; the checkpoint records which sites the run has replaced, so a resumed
+        ingest does not replace them again and drop what it already added. Near-duplicates are collapsed within a batch. `follow` is passed on to
+        read_log, to ingest a log that is still being written. Returns the offers ingested.
+        """
+        replace_sources = set(replace_sources or ())
+        offset, run_id, replaced = load_checkpoint(log_path) if os.path.exists(log_path) else (0, None, set())
+        log_id = first_run_id(log_path) if offset else None
+        if offset:
+            logging.info(f"Resuming ingestion of {log_path} at byte {offset} ({len(replaced)} site(s) already replaced in its scrape run).")
+        batch, total = [], 0
 
-        logging.info(f"Adding {len(embeddings_np)} new embeddings to FAISS index.")
-        self.index.add(embeddings_np)
-        self.metadata_store.extend(new_metadata)
+        def flush(end):
+            if batch:
+                sources = {offer.source_url for offer in batch} & replace_sources - replaced
+                with span("ingest_batch"):
+                    self.ingest_data(batch, replace_sources=sources)
+                replaced.update(sources)
+                batch.clear()
+            save_checkpoint(log_path, log_id, end, run_id, replaced)
 
-        self._save_db()
-        logging.info("Data ingestion complete and FAISS index saved.")
+        end = offset
+        for record, next_offset in read_log(log_path, offset, follow):
+            if isinstance(record, dict):
+                # A new scrape run replaces its sites again, after the last run's offers are in
+                flush(end)
+                log_id = log_id or record[RUN_KEY]
+                run_id = record[RUN_KEY]
+                replaced.clear()
+            else:
+                batch.append(record)
+                total += 1
+            end = next_offset
+            if len(batch) >= batch_size:
+                flush(end)
+        if end != offset:
+            flush(end)
+        logging.info(f"Ingested {total} offers from {log_path}.")
+        return total
 
-    def _save_db(self):
-        logging.info(f"Saving FAISS index to {self.db_path}.bin")
-        faiss.write_index(self.index, self.db_path + ".bin")
-        with open(self.db_path + "_metadata.pkl", "wb") as f:
-            pickle.dump(self.metadata_store, f)
-        logging.info("FAISS index and metadata saved successfully.")
+    def _update_shard(self, name, embeddings_np, offers, replace_sources):
+        """Applies one shard's part of an ingest in memory. Returns the shard if it changed, else None."""
+        with self._lock:
+            shard = self.shards[name]
+        with shard.lock:
+            changed = False
+            if replace_sources and not shard.is_empty():
+                replaced_ids = np.array([i for i, offer in enumerate(shard.metadata_store) if offer.source_url in replace_sources], dtype='int64')
+                if len(replaced_ids):
+                    logging.info(f"Replacing {len(replaced_ids)} offers previously scraped from {len(replace_sources)} site(s) in the {name} shard.")
+                    shard.remove_rows(replaced_ids)
+                    changed = True
+            if offers:
+                logging.info(f"Adding {len(offers)} new embeddings to the {name} shard.")
+                shard.add(embeddings_np, offers, np.array([offer_expires_at(offer) for offer in offers], dtype='float64'))
+                changed = True
+        return shard if changed else None
+
+    def rebuild_shard(self, name, offers_data):
+        """
+        Rebuilds one shard from `offers_data` alone: embeds them into a new index, publishes it
+        in place of the shard's current files and swaps it in. Searches use the old shard until the swap and the
+        other shards are left untouched. Offers that belong to another shard are skipped.
+        Returns the number of offers indexed.
+        """
+        if name not in SHARD_NAMES:
+            raise ValueError(f"Unknown shard '{name}'. Use one of: {', '.join(SHARD_NAMES)}.")
+        offers_data = [offer for offer in offers_data if offer_shard(offer) == name]
+        offers_data, self.last_duplicate_report = collapse_near_duplicates(offers_data)
+        new_data, failed = self._embed_offers(offers_data)
+        if failed:
+            self._save_dead_letters(self.dead_letters() + failed)
+        if name not in new_data:
+            logging.warning(f"No offers embedded for the {name} shard; keeping it as it is.")
+            return 0
+
+        embeddings_np, offers = new_data[name]
+        shard = self._new_shard(name)
+        shard.add(embeddings_np, offers, np.array([offer_expires_at(offer) for offer in offers], dtype='float64'))
+        with self._lock:
+            shard.entry = self.shards[name].entry # What the rebuild replaces, see snapshots.publish
+        self._publish([shard])
+        with self._lock:
+            self.shards[name] = shard
+            self.generation += 1
+        logging.info(f"Rebuilt the {name} shard with {len(offers)} offers.")
+        return len(offers)
+
+    def _get_search_pool(self):
+        with self._lock:
+            if self._search_pool is None:
+                self._search_pool = ThreadPoolExecutor(max_workers=SHARD_SEARCH_THREADS, thread_name_prefix="shard-search")
+            return self._search_pool
+
+    def _search_shards(self, query_embeddings_np, k, shard_names=None):
+        """
+        Searches the non-empty shards for the k nearest live offers per query and merges the hits
+        by distance. Shards are searched in parallel threads, since FAISS releases the GIL while
+        it searches. With `shard_names`, only those shards are searched, unless all of them are
+        empty. Returns (D, I, offers) of shape (queries, k); I numbers rows as metadata_store does.
+        """
+        shards = self._shard_list()
+        offsets = {}
+        row = 0
+        for shard in shards:
+            offsets[shard.name] = row
+            row += 0 if shard.index is None else shard.index.ntotal
+        searched = [shard for shard in shards if not shard.is_empty()]
+        if shard_names and any(shard.name in shard_names for shard in searched):
+            searched = [shard for shard in searched if shard.name in shard_names]
 
-    def search_offers(self, query_text, k=5):
-        if self.index is None or not self.metadata_store:
+        n = len(query_embeddings_np)
+        if not searched:
+            return np.full((n, k), np.inf, dtype='float32'), np.full((n, k), -1, dtype='int64'), np.full((n, k), None, dtype=object)
+        if len(searched) == 1:
+            results = [searched[0].search(query_embeddings_np, k)]
+        else:
+            results = list(self._get_search_pool().map(lambda shard: shard.search(query_embeddings_np, k), searched))
+
+        D = np.concatenate([d for d, _, _ in results], axis=1)
+        I = np.concatenate([np.where(i >= 0, i + offsets[shard.name], -1) for shard, (_, i, _) in zip(searched, results)], axis=1)
+        offers = np.concatenate([o for _, _, o in results], axis=1)
+        order = np.argsort(D, axis=1, kind='stable')[:, :k] # Missing hits have D == inf and sort last
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1), np.take_along_axis(offers, order, axis=1)
+
+    def search_offers(self, query_text, k=5, shards=None):
+        """The k offers nearest to `query_text`. `shards` limits the search to those shards, see _search_shards."""
+        if self.is_empty():
             logging.warning("FAISS index is not initialized or empty. Cannot perform search.")
             return []
 
@@ -109,39 +842,126 @@ class VectorDBManager:
 
         query_embedding_np = np.array([query_embedding]).astype('float32')
 
-        D, I = self.index.search(query_embedding_np, k) # D are distances, I are indices
-        logging.info(f"Found {len(I[0])} results for query.")
-
-        results = []
-        for idx in I[0]:
-            if idx < len(self.metadata_store): 
-                results.append(self.metadata_store[idx])
+        with span("faiss_search", call="single"):
+            _, _, offers = self._search_shards(query_embedding_np, k, shards)
+            results = [offer for offer in offers[0] if offer is not None]
+        logging.info(f"Found {len(results)} results for query.")
         return results
 
+    def search_offers_batch(self, query_texts, k=5, shards=None):
+        """
+        Searches many queries at once: one embeddings call and one FAISS search per shard for the whole batch.
+        Returns (D, I, offers), each of shape (len(query_texts), k). Missing results have
+        I == -1, D == inf and offers None.
+        """
+        n = len(query_texts)
+        empty = (np.full((n, k), np.inf, dtype='float32'), np.full((n, k), -1, dtype='int64'), np.full((n, k), None, dtype=object))
+        if n == 0 or self.is_empty():
+            if n:
+                logging.warning("FAISS index is not initialized or empty. Cannot perform search.")
+            return empty
+
+        query_embeddings_np = self._get_embeddings(query_texts)
+        if query_embeddings_np is None:
+            return empty
+
+        with span("faiss_search", call="batch"):
+            D, I, offers = self._search_shards(query_embeddings_np, k, shards)
+        logging.info(f"Batch search for {n} queries returned {int(np.count_nonzero(I >= 0))} results.")
+        return D, I, offers
+
+    def live_offers(self, shards=None):
+        """Returns the stored offers that have not expired yet, from all shards or those named in `shards`."""
+        return [offer for offer, _ in self.live_offers_with_expiry(shards)]
+
+    def live_offers_with_expiry(self, shards=None):
+        """Returns (offer, expires_at) for every stored offer that has not expired yet."""
+        now = time.time()
+        return [
+            entry for shard in self._shard_list() if shards is None or shard.name in shards
+            for entry in shard.live_offers_with_expiry(now)
+        ]
+
+    def compact_expired(self):
+        """
+        Removes expired offers from the shards and publishes the ones that changed. If another
+        process published one of them meanwhile, the compaction is redone on its version.
+        Returns the number of offers removed.
+        """
+        for attempt in range(COMPACT_PUBLISH_ATTEMPTS):
+            now = time.time()
+            removed_per_shard = [(shard, shard.compact_expired(now)) for shard in self._shard_list()]
+            removed = sum(count for _, count in removed_per_shard)
+            if not removed:
+                return 0
+            try:
+                self._publish([shard for shard, count in removed_per_shard if count])
+                break
+            except SnapshotConflict as e:
+                if attempt + 1 == COMPACT_PUBLISH_ATTEMPTS:
+                    raise
+                logging.warning(f"{e} Compacting their published version instead.")
+        logging.info(f"Compacted {removed} expired offers out of the FAISS index.")
+        return removed
+
+    def start_expiry_sweeper(self, interval_seconds=EXPIRY_SWEEP_INTERVAL_SECONDS):
+        """Starts a daemon thread that compacts expired offers every `interval_seconds`."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+
+        def sweep():
+            while not self._stop_sweeper.wait(interval_seconds):
+                try:
+                    self.compact_expired()
+                except Exception as e:
+                    logging.error(f"Error during expired offer sweep: {e}")
+
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=sweep, name="expiry-sweeper", daemon=True)
+        self._sweeper.start()
+        logging.info(f"Expiry sweeper started (every {interval_seconds} seconds).")
+
+    def stop_expiry_sweeper(self):
+        self._stop_sweeper.set()
+
 if __name__ == "__main__":
+    import asyncio
     from scraper import WebScraper
-    from config import SCRAPE_URLS
+    from config import SCRAPE_URLS, SCRAPE_LOG_PATH
 
-    # --- Load from scraped_offers.json first if available ---
-    json_filename = "scraped_offers.json"
-    scraped_offers = []
-    if os.path.exists(json_filename):
-        logging.info(f"Loading offers from {json_filename}...")
-        try:
-            with open(json_filename, "r", encoding="utf-8") as f:
-                scraped_offers = json.load(f)
-            logging.info(f"Loaded {len(scraped_offers)} offers from {json_filename}.")
-        except Exception as e:
-            logging.error(f"Error loading {json_filename}: {e}. Attempting live scrape.")
-            scraped_offers = [] # Reset to empty if loading fails
+    # --- Stream the scrape log if there is one; offers ingested by an earlier run are skipped ---
+    if os.path.exists(SCRAPE_LOG_PATH):
+        VectorDBManager().ingest_log(SCRAPE_LOG_PATH, replace_sources=SCRAPE_URLS)
+    else:
+        # --- Otherwise load from scraped_offers.json, written before scrapes were logged ---
+        json_filename = "scraped_offers.json"
+        scraped_offers = []
+        if os.path.exists(json_filename):
+            logging.info(f"Loading offers from {json_filename}...")
+            try:
+                with open(json_filename, "r", encoding="utf-8") as f:
+                    scraped_offers = [Offer.from_dict(offer) for offer in json.load(f)]
+                logging.info(f"Loaded {len(scraped_offers)} offers from {json_filename}.")
+            except Exception as e:
+                logging.error(f"Error loading {json_filename}: {e}. Attempting live scrape.")
+                scraped_offers = [] # Reset to empty if loading fails
     
-    if not scraped_offers:
-        logging.info("No offers loaded from JSON or JSON load failed. Attempting live scrape.")
-        try:
-            scraper = WebScraper(SCRAPE_URLS)
-            scraped_offers = asyncio.run(scraper.scrape_all())
-            if not scraped_offers:
-                logging.warning("No offers scraped from live sites. Using dummy data for demonstration.")
+        if not scraped_offers:
+            logging.info("No offers loaded from JSON or JSON load failed. Attempting live scrape.")
+            try:
+                scraper = WebScraper(SCRAPE_URLS)
+                scraped_offers = asyncio.run(scraper.scrape_all())
+                if not scraped_offers:
+                    logging.warning("No offers scraped from live sites. Using dummy data for demonstration.")
+                    # scraped_offers = [
+                    #     {"title": "Nykaa Flat 50% Off on Makeup", "description": "Get flat 50% off on selected makeup brands on Nykaa.", "expiry_date": "2025-06-30", "brand_name": "Nykaa", "offer_link": "https://www.nykaa.com/offers", "category": "Beauty & Cosmetics", "campaign_info": None, "channels": None},
+                    #     {"title": "Puma End of Season Sale", "description": "Up to 40% off on Puma footwear and apparel.", "expiry_date": "2025-05-28", "brand_name": "Puma", "offer_link": "https://in.puma.com/in/en/puma-sale-collection", "category": "Apparel & Footwear", "campaign_info": None, "channels": None},
+                    #     {"title": "Flipkart Big Billion Days Cashback", "description": "Earn 10% cashback on all electronics during Flipkart's Big Billion Days.", "expiry_date": "2025-06-15", "brand_name": "Flipkart", "offer_link": "https://www.flipkart.com/offers-store", "category": "E-commerce", "campaign_info": None, "channels": None},
+                    #     {"title": "Adidas Summer Collection Discount", "description": "New summer collection with 20% off for first-time buyers.", "expiry_date": "2025-07-31", "brand_name": "Adidas", "offer_link": "https://www.adidas.co.in/offers", "category": "Apparel & Footwear", "campaign_info": None, "channels": None},
+                    #     {"title": "Amazon Great Indian Festival Deals", "description": "Daily deals on a wide range of products.", "expiry_date": None, "brand_name": "Amazon", "offer_link": "https://www.amazon.in/deals", "category": "E-commerce", "campaign_info": None, "channels": None},
+                    # ]
+            except Exception as e:
+                logging.error(f"Error during scraping simulation: {e}. Using dummy data as fallback.")
                 # scraped_offers = [
                 #     {"title": "Nykaa Flat 50% Off on Makeup", "description": "Get flat 50% off on selected makeup brands on Nykaa.", "expiry_date": "2025-06-30", "brand_name": "Nykaa", "offer_link": "https://www.nykaa.com/offers", "category": "Beauty & Cosmetics", "campaign_info": None, "channels": None},
                 #     {"title": "Puma End of Season Sale", "description": "Up to 40% off on Puma footwear and apparel.", "expiry_date": "2025-05-28", "brand_name": "Puma", "offer_link": "https://in.puma.com/in/en/puma-sale-collection", "category": "Apparel & Footwear", "campaign_info": None, "channels": None},
@@ -149,23 +969,14 @@ if __name__ == "__main__":
                 #     {"title": "Adidas Summer Collection Discount", "description": "New summer collection with 20% off for first-time buyers.", "expiry_date": "2025-07-31", "brand_name": "Adidas", "offer_link": "https://www.adidas.co.in/offers", "category": "Apparel & Footwear", "campaign_info": None, "channels": None},
                 #     {"title": "Amazon Great Indian Festival Deals", "description": "Daily deals on a wide range of products.", "expiry_date": None, "brand_name": "Amazon", "offer_link": "https://www.amazon.in/deals", "category": "E-commerce", "campaign_info": None, "channels": None},
                 # ]
-        except Exception as e:
-            logging.error(f"Error during scraping simulation: {e}. Using dummy data as fallback.")
-            # scraped_offers = [
-            #     {"title": "Nykaa Flat 50% Off on Makeup", "description": "Get flat 50% off on selected makeup brands on Nykaa.", "expiry_date": "2025-06-30", "brand_name": "Nykaa", "offer_link": "https://www.nykaa.com/offers", "category": "Beauty & Cosmetics", "campaign_info": None, "channels": None},
-            #     {"title": "Puma End of Season Sale", "description": "Up to 40% off on Puma footwear and apparel.", "expiry_date": "2025-05-28", "brand_name": "Puma", "offer_link": "https://in.puma.com/in/en/puma-sale-collection", "category": "Apparel & Footwear", "campaign_info": None, "channels": None},
-            #     {"title": "Flipkart Big Billion Days Cashback", "description": "Earn 10% cashback on all electronics during Flipkart's Big Billion Days.", "expiry_date": "2025-06-15", "brand_name": "Flipkart", "offer_link": "https://www.flipkart.com/offers-store", "category": "E-commerce", "campaign_info": None, "channels": None},
-            #     {"title": "Adidas Summer Collection Discount", "description": "New summer collection with 20% off for first-time buyers.", "expiry_date": "2025-07-31", "brand_name": "Adidas", "offer_link": "https://www.adidas.co.in/offers", "category": "Apparel & Footwear", "campaign_info": None, "channels": None},
-            #     {"title": "Amazon Great Indian Festival Deals", "description": "Daily deals on a wide range of products.", "expiry_date": None, "brand_name": "Amazon", "offer_link": "https://www.amazon.in/deals", "category": "E-commerce", "campaign_info": None, "channels": None},
-            # ]
-
-
-    db_manager = VectorDBManager()
-    # Only ingest if there's data and the DB is empty or needs refresh
-    if scraped_offers and not db_manager.metadata_store:
-        db_manager.ingest_data(scraped_offers)
-    elif scraped_offers and db_manager.metadata_store:
-        logging.info("Database already contains data. To refresh, delete faiss_index.bin and faiss_index_metadata.pkl and rerun.")
+
+
+        db_manager = VectorDBManager()
+        # Only ingest if there's data and the DB is empty or needs refresh
+        if scraped_offers and db_manager.is_empty():
+            db_manager.ingest_data(scraped_offers)
+        elif scraped_offers and not db_manager.is_empty():
+            logging.info("Database already contains data. To refresh, delete the data/faiss_index_* files and rerun.")
 
 
    
\ No newline at end of file
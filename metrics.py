@@ -0,0 +1,306 @@
+# metrics.py
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import METRICS_ENABLED, METRICS_PORT, METRICS_JSON_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Upper bounds in seconds, from a sub-millisecond FAISS search up to a multi-minute site scrape
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+RATIO_BUCKETS = (0, 0.1, 0.25, 0.5, 0.75, 0.9, 1)
+
+# Span name -> (exported metric name, help text, buckets)
+_DEFINITIONS = {
+    "scrape_site": ("promo_sensei_scrape_site_seconds", "Time to scrape one site, all of its pages included", LATENCY_BUCKETS),
+    "page_navigation": ("promo_sensei_page_navigation_seconds", "Time for one page.goto during scraping", LATENCY_BUCKETS),
+    "page_parse": ("promo_sensei_page_parse_seconds", "Time to parse one page's HTML in the parse pool", LATENCY_BUCKETS),
+    "embedding": ("promo_sensei_embedding_seconds", "Time for one OpenAI embeddings call", LATENCY_BUCKETS),
+    "ingest_batch": ("promo_sensei_ingest_batch_seconds", "Time to embed, index and publish one batch of a scrape log", LATENCY_BUCKETS),
+    "faiss_search": ("promo_sensei_faiss_search_seconds", "Time for one FAISS search, rerank and metadata join", LATENCY_BUCKETS),
+    "retrieval": ("promo_sensei_retrieval_seconds", "Time to find the offers answering a question, embedding and search included", LATENCY_BUCKETS),
+    "prompt_assembly": ("promo_sensei_prompt_assembly_seconds", "Time to build an LLM prompt from the offers found", LATENCY_BUCKETS),
+    "prompt_tokens": ("promo_sensei_prompt_tokens", "Prompt tokens per LLM request, as reported by the API", TOKEN_BUCKETS),
+    "cached_prompt_tokens": ("promo_sensei_cached_prompt_tokens", "Prompt tokens per LLM request served from the provider's prompt cache", TOKEN_BUCKETS),
+    "prompt_cache_ratio": ("promo_sensei_prompt_cache_ratio", "Share of each LLM request's prompt tokens served from the prompt cache", RATIO_BUCKETS),
+    "llm_completion": ("promo_sensei_llm_completion_seconds", "Time for one OpenAI chat completion", LATENCY_BUCKETS),
+    "slack_post": ("promo_sensei_slack_post_seconds", "Time to post or update one Slack message", LATENCY_BUCKETS),
+}
+
+# Counter name -> (exported metric name, help text)
+_COUNTER_DEFINITIONS = {
+    "slack_post_retries": ("promo_sensei_slack_post_retries_total", "Slack posts sent again after a rate limit or a transient error"),
+    "slack_posts_dropped": ("promo_sensei_slack_posts_dropped_total", "Slack messages given up on, or cut from an answer too long to post"),
+    "slack_posts_coalesced": ("promo_sensei_slack_posts_coalesced_total", "Placeholder messages replaced by the answer before or after they were posted"),
+    "session_follow_ups": ("promo_sensei_session_follow_ups_total", "Thread follow-ups answered from the thread's kept offers (local) or by retrieving its question again"),
+}
+
+_enabled = METRICS_ENABLED
+_histograms = {}
+_counters = {}
+_registry_lock = threading.Lock()
+# Per-thread receiver of every span's duration, e.g. an active profiling session
+_local = threading.local()
+
+
+class Histogram:
+    """Cumulative histogram with one series per label set, in the Prometheus text format's shape."""
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {} # labels tuple -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        """Yields (labels, cumulative bucket counts, sum, count) for every series."""
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative, running = [], 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            yield labels, cumulative, total, count
+
+
+class Counter:
+    """Monotonic count with one series per label set."""
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {} # labels tuple -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def collect(self):
+        """Yields (labels, count) for every series."""
+        with self._lock:
+            return list(self._series.items())
+
+
+class _Span:
+    __slots__ = ("name", "histogram", "labels", "recorder", "start")
+
+    def __init__(self, name, histogram, labels, recorder):
+        self.name = name
+        self.histogram = histogram
+        self.labels = labels
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.histogram is not None:
+            self.histogram.observe(elapsed, self.labels)
+        if self.recorder is not None:
+            self.recorder.record_stage(self.name, self.labels, elapsed)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = Histogram(*_DEFINITIONS[name])
+    return histogram
+
+
+def _counter(name):
+    counter = _counters.get(name)
+    if counter is None:
+        with _registry_lock:
+            counter = _counters.get(name)
+            if counter is None:
+                counter = _counters[name] = Counter(*_COUNTER_DEFINITIONS[name])
+    return counter
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_recorder(recorder):
+    """
+    Sends the duration of every span on the calling thread to `recorder.record_stage`
+    (None to stop), whether or not metrics are enabled. Returns the previous recorder.
+    """
+    previous = getattr(_local, "recorder", None)
+    _local.recorder = recorder
+    return previous
+
+
+def get_recorder():
+    """The recorder set on the calling thread, or None."""
+    return getattr(_local, "recorder", None)
+
+
+def span(name, **labels):
+    """
+    Times the enclosed block into the `name` histogram. With metrics disabled and no
+    recorder on this thread it returns a shared no-op context manager, so
+    instrumented code pays one call.
+    """
+    recorder = getattr(_local, "recorder", None)
+    if not _enabled and recorder is None:
+        return _NOOP_SPAN
+    return _Span(name, _histogram(name) if _enabled else None, tuple(sorted(labels.items())), recorder)
+
+
+def observe(name, value, **labels):
+    if _enabled:
+        _histogram(name).observe(value, tuple(sorted(labels.items())))
+
+
+def count(name, amount=1, **labels):
+    if _enabled:
+        _counter(name).inc(amount, tuple(sorted(labels.items())))
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+def render_prometheus():
+    lines = []
+    for name in sorted(_histograms):
+        histogram = _histograms[name]
+        lines.append(f"# HELP {histogram.name} {histogram.help_text}")
+        lines.append(f"# TYPE {histogram.name} histogram")
+        for labels, cumulative, total, count in histogram.collect():
+            for bound, value in zip(list(histogram.buckets) + ["+Inf"], cumulative):
+                lines.append(f"{histogram.name}_bucket{_format_labels(labels, ('le', bound))} {value}")
+            lines.append(f"{histogram.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{histogram.name}_count{_format_labels(labels)} {count}")
+    for name in sorted(_counters):
+        counter = _counters[name]
+        lines.append(f"# HELP {counter.name} {counter.help_text}")
+        lines.append(f"# TYPE {counter.name} counter")
+        for labels, value in counter.collect():
+            lines.append(f"{counter.name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """
+    All metrics as plain data: per histogram series the count, sum, mean and cumulative
+    buckets, per counter series its value.
+    """
+    data = {}
+    for name in sorted(_histograms):
+        histogram = _histograms[name]
+        series = []
+        for labels, cumulative, total, count in histogram.collect():
+            series.append({
+                "labels": dict(labels),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else None,
+                "buckets": {str(bound): value for bound, value in zip(list(histogram.buckets) + ["+Inf"], cumulative)},
+            })
+        data[histogram.name] = {"help": histogram.help_text, "series": series}
+    for name in sorted(_counters):
+        counter = _counters[name]
+        data[counter.name] = {"help": counter.help_text, "series": [{"labels": dict(labels), "value": value} for labels, value in counter.collect()]}
+    return data
+
+
+def dump_json(path=None):
+    """Writes snapshot() to METRICS_JSON_PATH ({process} is the running script's name)."""
+    process = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+    path = path or METRICS_JSON_PATH.format(process=process)
+    metrics_dir = os.path.dirname(path)
+    if metrics_dir and not os.path.exists(metrics_dir):
+        os.makedirs(metrics_dir)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"generated_at": time.time(), "metrics": snapshot()}, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(snapshot()).encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes every few seconds would drown the application log
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus text format) and /metrics.json from a daemon thread, and
+    dumps the JSON snapshot on exit. Does nothing unless metrics are enabled.
+    """
+    if not _enabled:
+        return None
+    atexit.register(dump_json)
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.warning(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,215 @@
+# offer_log.py
+import os
+import json
+import time
+import uuid
+import zlib
+import gzip
+import logging
+import threading
+from datetime import datetime
+
+from config import SCRAPE_LOG_POLL_SECONDS
+from offers import Offer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Compressed bytes read per call when streaming a log
+READ_CHUNK_BYTES = 1 << 16
+# Key of the line a writer puts in front of each scrape run's offers
+RUN_KEY = "scrape_run"
+
+
+def is_compressed(path):
+    return path.endswith(".gz")
+
+
+class _LogStream:
+    """Reads a log's bytes as they are appended, decompressing gzip logs member by member."""
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._decompressor = zlib.decompressobj(wbits=31) if is_compressed(path) else None
+
+    def seek(self, offset):
+        """Only plain logs can seek; gzip offsets count decompressed bytes, which are skipped instead."""
+        if self._decompressor is None:
+            self._file.seek(offset)
+            return offset
+        return 0
+
+    def read(self):
+        """New data since the last call, b"" if nothing has been appended yet."""
+        data = self._file.read(READ_CHUNK_BYTES)
+        if self._decompressor is None or not data:
+            return data
+        out = []
+        while data:
+            out.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            # Each run appends a new gzip member
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(wbits=31)
+        return b"".join(out)
+
+    def close(self):
+        self._file.close()
+
+
+def read_log(path, offset=0, follow=None, poll_seconds=SCRAPE_LOG_POLL_SECONDS):
+    """
+    Streams a scrape log from `offset` (a value this generator yielded earlier, counting
+    decompressed bytes). Yields (record, offset after its line): record is an Offer, or the
+    dict starting a scrape run. A half-written last line is left for a later read. Without
+    `follow` it stops at the end of the log; with it, it waits for lines being appended
+    until follow() returns True, then reads what is left and stops.
+    """
+    finished = follow is None
+    while not os.path.exists(path):
+        if finished:
+            return
+        finished = follow()
+        time.sleep(0 if finished else poll_seconds)
+
+    stream = _LogStream(path)
+    try:
+        position = stream.seek(offset) # Offset of buffer[0]
+        buffer = b""
+        while True:
+            data = stream.read()
+            if not data:
+                if finished:
+                    return
+                # After the writer is done, one more read picks up its last lines
+                finished = follow()
+                if not finished:
+                    time.sleep(poll_seconds)
+                continue
+            buffer += data
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start)
+                if end < 0:
+                    break
+                line, start = buffer[start:end], end + 1
+                if position + start > offset and line.strip():
+                    record = json.loads(line)
+                    yield (record if RUN_KEY in record else Offer.from_dict(record)), position + start
+            position += start
+            buffer = buffer[start:]
+    finally:
+        stream.close()
+
+
+def first_run_id(path):
+    """Id of the first scrape run in the log, which identifies the log; None if it is empty."""
+    for record, _ in read_log(path):
+        return record.get(RUN_KEY) if isinstance(record, dict) else None
+    return None
+
+
+def _has_torn_tail(path):
+    """True if a gzip log ends in a member that was never closed (its writer crashed)."""
+    decompressor, started = zlib.decompressobj(wbits=31), False
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_CHUNK_BYTES)
+            if not data:
+                return started
+            while data:
+                decompressor.decompress(data)
+                started = True
+                if not decompressor.eof:
+                    break
+                data = decompressor.unused_data
+                decompressor, started = zlib.decompressobj(wbits=31), False
+
+
+def _repair(path):
+    """Rewrites a gzip log whose last member was cut off, keeping every complete line."""
+    logging.warning(f"Scrape log {path} was not closed cleanly. Recompressing its complete lines before appending.")
+    with gzip.open(path + ".tmp", "wb") as out:
+        for record, _ in read_log(path):
+            out.write(_encode(record if isinstance(record, dict) else record.to_dict()))
+    os.replace(path + ".tmp", path)
+
+
+def _encode(record):
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class OfferLogWriter:
+    """
+    Appends offers to a JSON Lines scrape log, one per line, flushing each so a crashed
+    scrape keeps everything written before it. Each writer starts a new run with a
+    {"scrape_run": id} line; the first run's id identifies the log. Paths ending in .gz
+    are gzip-compressed; a flush is a zlib sync flush, so readers can decode every line
+    written so far.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.run_id = uuid.uuid4().hex
+        self.count = 0
+        self._lock = threading.Lock()
+        log_dir = os.path.dirname(path)
+        if log_dir and not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+        if is_compressed(path):
+            if os.path.exists(path) and os.path.getsize(path) and _has_torn_tail(path):
+                _repair(path)
+            self._file = gzip.open(path, "ab")
+        else:
+            self._file = open(path, "ab")
+        self._append(_encode({RUN_KEY: self.run_id, "started_at": datetime.now().isoformat()}))
+
+    def _append(self, line):
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def write(self, offer):
+        self._append(_encode(offer.to_dict()))
+        self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def load_checkpoint(log_path):
+    """
+    Where ingestion of `log_path` stopped: (offset, id of the scrape run the offset is in,
+    sources whose offers that run already replaced). (0, None, set()) if there is no
+    checkpoint or the log was replaced since.
+    """
+    path = log_path + ".checkpoint"
+    if not os.path.exists(path):
+        return 0, None, set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return 0, None, set()
+    if checkpoint.get("log_id") != first_run_id(log_path):
+        logging.info(f"{log_path} was replaced since its checkpoint was written. Ingesting it from the start.")
+        return 0, None, set()
+    return checkpoint.get("offset", 0), checkpoint.get("run_id"), set(checkpoint.get("replaced", ()))
+
+
+def save_checkpoint(log_path, log_id, offset, run_id=None, replaced=()):
+    path = log_path + ".checkpoint"
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "log_id": log_id, "offset": offset, "run_id": run_id, "replaced": sorted(replaced),
+            "saved_at": datetime.now().isoformat(),
+        }, f)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,153 @@
+# offers.py
+import re
+import sys
+from datetime import datetime
+
+from canonical_urls import canonical_url
+
+# Amounts as the scrapers write them: "₹11,498.00", "₹1,00,000", "₹5 999.00", "Rs. 699"
+_AMOUNT = r"(?:₹|Rs\.?|INR)\s*(\d+(?:,\d{2,3}(?!\d)|[ \u00a0\u202f]\d{3}(?!\d))*(?:\.\d+)?)"
+_MRP = re.compile(r"(?:Original Price|MRP)\s*:?\s*(?:MRP\s*:?\s*)?" + _AMOUNT, re.IGNORECASE)
+_PRICE = re.compile(r"(?:Offer Price|Deal Price|Current Price|Sale Price)\s*:?\s*" + _AMOUNT, re.IGNORECASE)
+# Unlabelled "Price: From ₹699" / "Price: ₹11,498.00", used when no labelled price is present
+_PLAIN_PRICE = re.compile(r"(?<!Original )(?<!Offer )\bPrice\s*:\s*(?:Just|From|Starting at)?\s*" + _AMOUNT, re.IGNORECASE)
+_PERCENT_OFF = re.compile(r"(\d{1,2}(?:\.\d+)?)\s*%\s*(?:off|discount|cashback)", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Scrapers fill missing fields with these; the Offer stores None instead
+_PLACEHOLDERS = ("", "N/A", "None")
+# Fields every scraper sets, kept in to_dict() even when empty
+_SCRAPED_FIELDS = ("title", "description", "expiry_date", "brand_name", "offer_link", "category", "campaign_info", "channels")
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in _PLACEHOLDERS else value
+
+
+def _interned(value):
+    value = _text(value)
+    return sys.intern(value) if value is not None else None
+
+
+def _datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _amount(match):
+    return float(re.sub(r"[^\d.]", "", match.group(1))) if match else None
+
+
+def _number(value, kind):
+    if isinstance(value, (int, float)) or value is None:
+        return value
+    match = _NUMBER.search(str(value))
+    return kind(match.group(0).replace(",", "")) if match else None
+
+
+def parse_prices(*texts):
+    """
+    (price, mrp, discount_percent) parsed from an offer's text fields: the offer price,
+    the original price, and the largest "N% off" mentioned or else the one the two
+    prices imply. Missing values are None.
+    """
+    text = " | ".join(t for t in texts if t)
+    mrp = _amount(_MRP.search(text))
+    price = _amount(_PRICE.search(text) or _PLAIN_PRICE.search(text))
+    percents = [float(value) for value in _PERCENT_OFF.findall(text)]
+    if percents:
+        discount_percent = max(percents)
+    elif mrp and price is not None and price < mrp:
+        discount_percent = round(100 * (mrp - price) / mrp, 1)
+    else:
+        discount_percent = None
+    return price, mrp, discount_percent
+
+
+class Offer:
+    """
+    One scraped promotional offer. Built once by the scraper and passed through dedupe,
+    ingestion, the metadata store and prompt rendering as is: placeholder strings become
+    None, brand/category/channel strings are interned (a catalogue has a handful of them),
+    expiry_date and last_seen are datetimes, and price, mrp and discount_percent are
+    parsed from the text at creation. Pickles as a bare tuple of its fields.
+    """
+    __slots__ = (
+        "title", "description", "expiry_date", "brand_name", "offer_link", "category",
+        "campaign_info", "channels", "source_url", "last_seen",
+        "price", "mrp", "discount_percent", "rating", "num_reviews",
+        "categories", "offer_links", "duplicate_count", # Set when near-duplicates are merged
+    )
+
+    def __init__(self, title, description=None, expiry_date=None, brand_name=None, offer_link=None,
+                 category=None, campaign_info=None, channels=None, source_url=None, last_seen=None,
+                 rating=None, num_reviews=None):
+        self.title = _text(title)
+        self.description = _text(description)
+        self.expiry_date = _datetime(expiry_date)
+        self.brand_name = _interned(brand_name)
+        self.offer_link = canonical_url(_text(offer_link))
+        self.category = _interned(category)
+        self.campaign_info = _interned(campaign_info)
+        self.channels = _interned(channels)
+        self.source_url = _interned(source_url)
+        self.last_seen = _datetime(last_seen)
+        self.price, self.mrp, self.discount_percent = parse_prices(self.title, self.description, self.campaign_info)
+        self.rating = _number(_text(rating), float)
+        self.num_reviews = _number(_text(num_reviews), int)
+        self.categories = None
+        self.offer_links = None
+        self.duplicate_count = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds an Offer from the dict form (scraped_offers.json, metadata written before Offer existed)."""
+        offer = cls(
+            data.get("title"), data.get("description"), data.get("expiry_date"), data.get("brand_name"),
+            data.get("offer_link"), data.get("category"), data.get("campaign_info"), data.get("channels"),
+            data.get("source_url"), data.get("last_seen"), data.get("rating"), data.get("num_reviews"),
+        )
+        offer.categories = data.get("categories")
+        offer.offer_links = data.get("offer_links")
+        offer.duplicate_count = data.get("duplicate_count")
+        return offer
+
+    def to_dict(self):
+        """JSON-ready dict with the scraper's field names; unset optional fields are left out."""
+        data = {}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            if value is not None or field in _SCRAPED_FIELDS:
+                data[field] = value
+        return data
+
+    def copy(self):
+        offer = Offer.__new__(Offer)
+        offer.__setstate__(self.__getstate__())
+        return offer
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __setstate__(self, state):
+        if len(state) < len(self.__slots__):
+            # Fields added after a record was pickled come back as None
+            state = tuple(state) + (None,) * (len(self.__slots__) - len(state))
+        # One unpacking assignment loads a metadata file about twice as fast as a setattr loop.
+        # Interned strings need no re-interning: pickle writes each shared string once.
+        (self.title, self.description, self.expiry_date, self.brand_name, self.offer_link, self.category,
+         self.campaign_info, self.channels, self.source_url, self.last_seen,
+         self.price, self.mrp, self.discount_percent, self.rating, self.num_reviews,
+         self.categories, self.offer_links, self.duplicate_count) = state
+
+    def __repr__(self):
+        return f"Offer({self.title!r}, brand_name={self.brand_name!r}, price={self.price!r})"
@@ -0,0 +1,168 @@
+# profiling.py
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+from config import PROFILE_ALL_REQUESTS, PROFILE_OUTPUT_DIR, PROFILE_SAMPLE_INTERVAL_MS
+from metrics import set_recorder, get_recorder
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PROFILE_FLAG = "--profile"
+
+
+def split_profile_flag(text):
+    """Strips a trailing `--profile` from a command. Returns (text, profile_requested)."""
+    text = text.strip()
+    if text == PROFILE_FLAG or text.endswith(" " + PROFILE_FLAG):
+        return text[:-len(PROFILE_FLAG)].strip(), True
+    return text, False
+
+
+class ProfileSession:
+    """
+    Samples the stack of the thread that enters it every PROFILE_SAMPLE_INTERVAL_MS from a
+    background thread, and collects the time spent in each metrics span (embedding,
+    FAISS search, prompt assembly, LLM call, scraping...) on that thread, and on any
+    thread the profiled code hands work to through profiled_in_thread. On exit it
+    writes <label>.folded (one `frame;frame;frame count` line per stack, the input of
+    flamegraph.pl, speedscope and inferno) and <label>_stages.json to PROFILE_OUTPUT_DIR.
+    """
+    def __init__(self, label, interval_ms=PROFILE_SAMPLE_INTERVAL_MS, output_dir=PROFILE_OUTPUT_DIR):
+        self.label = label
+        self.interval_seconds = interval_ms / 1000
+        self.output_dir = output_dir
+        self.samples = Counter()
+        self.stages = {} # stage -> [calls, seconds]
+        self.wall_seconds = 0.0
+        self.folded_path = None
+        self.stages_path = None
+        self._thread_ids = set() # Threads whose stacks are sampled
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._previous_recorder = None
+
+    def record_stage(self, name, labels, seconds):
+        stage = f"{name}({','.join(str(value) for _, value in labels)})" if labels else name
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_thread(self, thread_id):
+        with self._lock:
+            self._thread_ids.add(thread_id)
+
+    def remove_thread(self, thread_id):
+        with self._lock:
+            self._thread_ids.discard(thread_id)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            with self._lock:
+                thread_ids = list(self._thread_ids)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join([self.label] + stack[::-1])] += 1
+
+    def __enter__(self):
+        self._thread_ids = {threading.get_ident()}
+        self._previous_recorder = set_recorder(self)
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.label}", daemon=True)
+        self._start = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_seconds = time.perf_counter() - self._start
+        self._stop.set()
+        self._sampler.join()
+        set_recorder(self._previous_recorder)
+        try:
+            self.save()
+        except OSError as e:
+            logging.error(f"Could not save profile '{self.label}': {e}")
+        return False
+
+    def stage_breakdown(self):
+        """Stages by total time. Stages nest (prompt assembly includes the embedding and FAISS search)."""
+        wall = self.wall_seconds or 1e-9
+        return [
+            {"stage": stage, "calls": calls, "total_ms": seconds * 1000, "percent_of_wall": 100 * seconds / wall}
+            for stage, (calls, seconds) in sorted(self.stages.items(), key=lambda item: item[1][1], reverse=True)
+        ]
+
+    def save(self):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        base = os.path.join(self.output_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{self.label}")
+        self.folded_path = base + ".folded"
+        self.stages_path = base + "_stages.json"
+        with open(self.folded_path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(self.stages_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "label": self.label,
+                "wall_ms": self.wall_seconds * 1000,
+                "samples": sum(self.samples.values()),
+                "sample_interval_ms": self.interval_seconds * 1000,
+                "stages": self.stage_breakdown(),
+            }, f, indent=2)
+        logging.info(f"Profile '{self.label}' saved to {self.folded_path} and {self.stages_path}")
+
+    def summary(self):
+        """A short per-stage breakdown for posting back to whoever asked for the profile."""
+        lines = [f"Profile of {self.label}: {self.wall_seconds * 1000:.0f} ms wall, {sum(self.samples.values())} samples."]
+        for row in self.stage_breakdown():
+            lines.append(f"  {row['stage']}: {row['total_ms']:.0f} ms in {row['calls']} call(s) ({row['percent_of_wall']:.0f}%)")
+        if self.folded_path:
+            lines.append(f"Flamegraph input: {self.folded_path}")
+        return "\n".join(lines)
+
+
+def profiled_in_thread(fn):
+    """
+    Wraps `fn` to run on another thread (e.g. a pool worker) as part of the calling thread's
+    profile: its spans are recorded and its stack is sampled too. Returns `fn` unchanged
+    when the calling thread is not being profiled.
+    """
+    recorder = get_recorder()
+    if not isinstance(recorder, ProfileSession):
+        return fn
+
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        previous = set_recorder(recorder)
+        recorder.add_thread(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.remove_thread(thread_id)
+            set_recorder(previous)
+    return run
+
+
+def profiled_call(label, profile_requested, fn, *args, **kwargs):
+    """
+    Calls fn(*args, **kwargs) under a ProfileSession when `profile_requested` or
+    PROFILE_ALL_REQUESTS is set. Returns (result, session), with session None if not profiled.
+    """
+    if not (profile_requested or PROFILE_ALL_REQUESTS):
+        return fn(*args, **kwargs), None
+    with ProfileSession(label) as session:
+        result = fn(*args, **kwargs)
+    return result, session
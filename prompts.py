@@ -0,0 +1,103 @@
+# prompts.py
+import threading
+
+# Shared by every RAG entry point and never changes, so it is the start of every prompt
+# and the provider's prompt cache can reuse it across requests and commands.
+SYSTEM_PROMPT = (
+    "You are Promo Sensei, a helpful assistant that provides information about promotional offers. "
+    "Answer only from the offers given to you, concisely and clearly. "
+    "If an offer is expired, mention it. Prioritize active offers. "
+    "Mention the offer title, description, brand, and expiry date if available. "
+    "**Crucially, format any links as concise Markdown links like [View Offer](URL) and do NOT expand the full URL text.**"
+)
+
+# Static per-command instructions. They come before the offers and the user's text, so the
+# cacheable prefix of a command is the system prompt plus its instructions.
+TASK_INSTRUCTIONS = {
+    "query": (
+        "Answer the user's query from the promotional offers below. "
+        "If the query is for a summary, provide a concise summary of the offers. "
+        "If the query is for a specific brand, list offers from that brand."
+    ),
+    "no_results": (
+        "No offers in the database matched the user's query. "
+        "Respond politely that no relevant offers were found for it."
+    ),
+    "summary": (
+        "The deals below are ranked best first by discount, price drop and how soon they expire. "
+        "Provide a concise summary of these top deals. "
+        "Highlight key discounts, brands, and categories."
+    ),
+    "brand": (
+        "Present the brand's promotional offers below clearly and concisely to the user, "
+        "focusing on key details like title, description, and expiry."
+    ),
+}
+
+NO_OFFERS_CONTEXT = "No relevant offers found."
+
+
+def render_offer_snippet(offer):
+    """The context lines for one offer, without its position in the list."""
+    # Already canonical (canonical_urls.py), so no tracking parameters reach the LLM
+    link = offer.offer_link
+    return (
+        f"  Title: {offer.title or 'N/A'}\n"
+        f"  Description: {offer.description or 'N/A'}\n"
+        f"  Brand: {offer.brand_name or 'N/A'}\n"
+        f"  Expiry Date: {offer.expiry_date.date().isoformat() if offer.expiry_date else 'N/A'}\n"
+        f"  Link: {f'[View Offer]({link})' if link else 'N/A'}\n\n"
+    )
+
+
+class OfferSnippets:
+    """
+    Rendered offer snippets for `db_manager`, built on first use and kept until the
+    manager's index generation changes, so an offer is rendered once per generation
+    instead of on every request that retrieves it.
+    """
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._generation = None
+        self._snippets = {} # id(offer) -> (offer, snippet); holding the offer keeps its id unique
+        self._lock = threading.Lock()
+
+    def get(self, offer):
+        generation = self.db_manager.generation
+        with self._lock:
+            if generation != self._generation:
+                self._snippets = {}
+                self._generation = generation
+            entry = self._snippets.get(id(offer))
+        if entry is not None and entry[0] is offer:
+            return entry[1]
+        snippet = render_offer_snippet(offer)
+        with self._lock:
+            if generation == self._generation:
+                self._snippets[id(offer)] = (offer, snippet)
+        return snippet
+
+    def format_offers(self, offers):
+        """Numbered context block for `offers`, joined from their cached snippets."""
+        if not offers:
+            return NO_OFFERS_CONTEXT
+        return "Here are the relevant promotional offers:\n\n" + "".join(
+            f"Offer {i + 1}:\n{self.get(offer)}" for i, offer in enumerate(offers)
+        )
+
+
+def build_messages(task, context=None, request=None):
+    """
+    Chat messages for a RAG command, ordered from most to least stable: the shared system
+    prompt, the command's instructions, the offer context, then the user's text.
+    """
+    parts = [TASK_INSTRUCTIONS[task]]
+    if context is not None:
+        parts.append(f"Contextual Offers:\n{context.rstrip()}")
+    if request:
+        parts.append(request)
+    parts.append("Your Answer:")
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "\n\n".join(parts)},
+    ]
@@ -1,174 +1,176 @@
 # rag_query.py
-from openai import OpenAI
-from ingest_to_vector_db import VectorDBManager
-from config import LLM_MODEL, OPENAI_API_KEY
+from ingest_to_vector_db import VectorDBManager, shards_named_in
+from clients import get_openai_client
+from config import LLM_MODEL, SESSION_REFILL_K
+from metrics import span, observe, count
+from prompts import OfferSnippets, build_messages
+from digest import TopDealsDigest
+from sessions import SessionStore, ThreadSession, parse_filters, only_narrows, apply_filters
 import logging
+import threading
 from datetime import datetime
-import re 
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class RAGQueryProcessor:
-    def __init__(self):
-        self.db_manager = VectorDBManager()
-        self.llm_client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, db_manager=None):
+        # Serving processes only read the published index; the refresh worker migrates and writes it
+        self.db_manager = db_manager if db_manager is not None else VectorDBManager(migrate=False)
         self.llm_model = LLM_MODEL
+        self.snippets = OfferSnippets(self.db_manager)
+        self.digest = TopDealsDigest(self.db_manager)
+        self.sessions = SessionStore()
+        self._usage_lock = threading.Lock()
+        self.prompt_tokens_total = 0
+        self.cached_prompt_tokens_total = 0
 
-    def _clean_flipkart_url(self, url):
-        """
-        Cleans up Flipkart URLs by removing common tracking parameters.
-        Preserves essential query parameters like 'sid' and 'collection-tab-name'.
-        """
-        if "flipkart.com" in url:
-            # Regex to remove specific tracking parameters: param, hpid, ctx
-            # It looks for these parameters and their values, followed by '&' or end of string
-            cleaned_url = re.sub(r'(&param=[^&]*|&hpid=[^&]*|&ctx=[^&]*)', '', url)
-            
-            # Clean up any trailing '&' or '?' that might be left after removals
-            if cleaned_url.endswith('&'):
-                cleaned_url = cleaned_url.rstrip('&')
-            if cleaned_url.endswith('?'):
-                cleaned_url = cleaned_url.rstrip('?')
-            
-            return cleaned_url
-        return url
+    @property
+    def llm_client(self):
+        return get_openai_client()
 
     def _format_offers_for_llm(self, offers):
-        if not offers:
-            return "No relevant offers found."
-
-        formatted_string = "Here are the relevant promotional offers:\n\n"
-        for i, offer in enumerate(offers):
-            title = offer.get('title', 'N/A')
-            description = offer.get('description', 'N/A')
-            brand = offer.get('brand_name', 'N/A')
-            expiry = offer.get('expiry_date', 'N/A')
-            link = offer.get('offer_link', 'N/A')
-
-            # Clean Flipkart URLs before formatting for LLM
-            if brand and 'flipkart' in brand.lower() and link and link != 'N/A':
-                link = self._clean_flipkart_url(link)
-
-            formatted_string += f"Offer {i+1}:\n"
-            formatted_string += f"  Title: {title}\n"
-            formatted_string += f"  Description: {description}\n"
-            formatted_string += f"  Brand: {brand}\n"
-            formatted_string += f"  Expiry Date: {expiry}\n"
-            
-            if link and link != 'N/A':
-                formatted_string += f"  Link: [View Offer]({link})\n\n"
-            else:
-                formatted_string += f"  Link: N/A\n\n"
-        return formatted_string
-
-    def query_llm(self, user_query):
-        # 1. Retrieve relevant offers from the vector database
-        retrieved_offers = self.db_manager.search_offers(user_query, k=20) # Retrieve top 5 relevant offers
-        logging.info(f"Retrieved {len(retrieved_offers)} offers for query: '{user_query}'")
-
-        # 2. Format the retrieved offers as context for the LLM
-        context = self._format_offers_for_llm(retrieved_offers)
-
-        if "No relevant offers found" in context:
-            prompt = (
-                f"The user asked: '{user_query}'. "
-                "I could not find any relevant offers in the database. "
-                "Please respond politely that no relevant offers were found for their query."
-            )
-        else:
-            prompt = (
-                "You are Promo Sensei, a helpful assistant that provides information about promotional offers. "
-                "Based on the following retrieved promotional offers, answer the user's query concisely and clearly. "
-                "If an offer is expired, mention it. Prioritize active offers. "
-                "Make sure to include the offer title, description, brand, and expiry date if available. "
-                "**Crucially, format any links as concise Markdown links like [View Offer](URL) and do NOT expand the full URL text.** "
-                "If the query is for a summary, provide a concise summary of the offers. "
-                "If the query is for a specific brand, list offers from that brand. "
-                "Contextual Offers:\n"
-                f"{context}\n\n"
-                f"User Query: {user_query}\n"
-                "Your Answer:"
-            )
+        return self.snippets.format_offers(offers)
 
-        try:
+    def _complete(self, messages, kind):
+        """Runs the chat completion for `messages`, recording its latency and prompt token usage."""
+        with span("llm_completion", kind=kind):
             response = self.llm_client.chat.completions.create(
                 model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant for promotional offers."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 max_tokens=500
             )
-            return response.choices[0].message.content.strip()
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._record_usage(usage, kind)
+        return response.choices[0].message.content.strip()
+
+    def _record_usage(self, usage, kind):
+        prompt_tokens = usage.prompt_tokens or 0
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+        observe("prompt_tokens", prompt_tokens, kind=kind)
+        observe("cached_prompt_tokens", cached_tokens, kind=kind)
+        if prompt_tokens:
+            observe("prompt_cache_ratio", cached_tokens / prompt_tokens, kind=kind)
+        with self._usage_lock:
+            self.prompt_tokens_total += prompt_tokens
+            self.cached_prompt_tokens_total += cached_tokens
+        logging.info(f"LLM {kind} request used {prompt_tokens} prompt tokens, {cached_tokens} from the prompt cache.")
+
+    def cached_token_ratio(self):
+        """Share of all prompt tokens sent by this processor that the API served from its prompt cache."""
+        with self._usage_lock:
+            return self.cached_prompt_tokens_total / self.prompt_tokens_total if self.prompt_tokens_total else 0.0
+
+    def _retrieve(self, query, k=20):
+        # A query that names a retailer ("deals on Amazon") only searches that retailer's shard
+        return self.db_manager.search_offers(query, k=k, shards=shards_named_in(query))
+
+    def _follow_up(self, session, user_query):
+        """
+        The offers answering a follow-up in a session's thread, or None if it asks for
+        something new. One that only narrows the last answer filters the offers kept in the
+        session, re-retrieving the thread's question only if the index changed since or none
+        of them pass. Returns (offers, the session to keep).
+        """
+        new_filters, rest = parse_filters(user_query, session.offers)
+        if not only_narrows(rest):
+            return None
+        filters = dict(session.filters, **new_filters)
+        offers = session.offers
+        if session.generation == self.db_manager.generation:
+            narrowed = apply_filters(offers, filters)
+            if narrowed:
+                count("session_follow_ups", kind="local")
+                logging.info(f"Narrowed the {len(offers)} offers kept for '{session.query}' to {len(narrowed)} without a search.")
+                return narrowed, ThreadSession(session.query, offers, filters, session.generation)
+        count("session_follow_ups", kind="retrieved")
+        generation = self.db_manager.generation
+        offers = self._retrieve(session.query, k=SESSION_REFILL_K)
+        narrowed = apply_filters(offers, filters)[:20]
+        logging.info(f"Re-retrieved '{session.query}' for a follow-up: {len(narrowed)} of {len(offers)} offers pass its filters.")
+        return narrowed, ThreadSession(session.query, offers, filters, generation)
+
+    def query_llm(self, user_query, session_key=None):
+        """
+        Answers `user_query` from the offers retrieved for it. With a `session_key` (the Slack
+        channel and thread), what was retrieved is kept in self.sessions, and a later question
+        in the same thread that only narrows it ("only Samsung") is answered from those offers.
+        """
+        # Retrieval has its own span, so prompt assembly does not count the embedding and search again
+        with span("retrieval", kind="query"):
+            # 1. Retrieve relevant offers from the vector database, or narrow the thread's last ones
+            session = self.sessions.get(session_key)
+            follow_up = self._follow_up(session, user_query) if session is not None else None
+            if follow_up is not None:
+                retrieved_offers, session = follow_up
+                request = f"Earlier question in this conversation: {session.query}\nUser Query: {user_query}"
+            else:
+                generation = self.db_manager.generation
+                retrieved_offers = self._retrieve(user_query)
+                logging.info(f"Retrieved {len(retrieved_offers)} offers for query: '{user_query}'")
+                session = ThreadSession(user_query, retrieved_offers, {}, generation)
+                request = f"User Query: {user_query}"
+            self.sessions.put(session_key, session)
+
+        with span("prompt_assembly", kind="query"):
+            # 2. Format the retrieved offers as context for the LLM
+            if not retrieved_offers:
+                messages = build_messages("no_results", request=request)
+            else:
+                context = self._format_offers_for_llm(retrieved_offers)
+                messages = build_messages("query", context, request)
+
+        try:
+            return self._complete(messages, "query")
         except Exception as e:
             logging.error(f"Error querying LLM: {e}")
             return "I apologize, but I encountered an error while processing your request. Please try again later."
 
     def summarize_top_deals(self, k=5):
+        """
+        Summary of the k best-ranked live deals (see digest.py). The LLM writes it once per
+        index generation; later calls are served from the digest's cache.
+        """
         logging.info("Summarizing top deals.")
-        all_offers = self.db_manager.metadata_store # Get all stored offers
-        
-        offers_to_summarize = all_offers[-k:] if len(all_offers) > k else all_offers
-
-        if not offers_to_summarize:
-            return "No deals are currently available to summarize."
-
-        context = self._format_offers_for_llm(offers_to_summarize)
-        prompt = (
-            "You are Promo Sensei, a helpful assistant. "
-            "Based on the following promotional offers, provide a concise summary of the top deals. "
-            "Highlight key discounts, brands, and categories. If an offer is expired, mention it. "
-            "Prioritize active offers. **Format any links as concise Markdown links like [View Offer](URL) and do NOT expand the full URL text.**\n\n"
-            f"Contextual Offers:\n{context}\n\n"
-            "Your Summary:"
-        )
         try:
-            response = self.llm_client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant for promotional offers."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
+            summary = self.digest.summary(k, self._generate_summary)
         except Exception as e:
             logging.error(f"Error summarizing deals with LLM: {e}")
             return "I apologize, but I encountered an error while summarizing deals. Please try again later."
+        if summary is None:
+            return "No deals are currently available to summarize."
+        return summary
+
+    def _generate_summary(self, offers):
+        with span("prompt_assembly", kind="summary"):
+            messages = build_messages("summary", self._format_offers_for_llm(offers))
+        return self._complete(messages, "summary")
+
+    def warm_top_deals_summary(self, k=5):
+        """Generates the cached top-deals summary in the background, e.g. after a reload."""
+        if self.db_manager.is_empty():
+            return
+        threading.Thread(target=self.summarize_top_deals, args=(k,), name="digest-warmup", daemon=True).start()
 
     def list_offers_by_brand(self, brand_name):
         logging.info(f"Listing offers for brand: {brand_name}")
         
-        if not self.db_manager.metadata_store:
-            return f"No offers available in the database to search for {brand_name}."
-
-        brand_offers = [
-            offer for offer in self.db_manager.metadata_store
-            if offer.get('brand_name', '').lower() == brand_name.lower()
-        ]
-
-        if not brand_offers:
-            return f"I couldn't find any offers for {brand_name} at the moment."
-
-        formatted_offers = self._format_offers_for_llm(brand_offers)
-        prompt = (
-            f"You are Promo Sensei, a helpful assistant. "
-            f"Here are the promotional offers for the brand '{brand_name}':\n\n"
-            f"{formatted_offers}\n\n"
-            f"Please present these offers clearly and concisely to the user, focusing on key details like title, description, and expiry. "
-            f"If any are expired, mention it. **Format any links as concise Markdown links like [View Offer](URL) and do NOT expand the full URL text.** "
-            "Your Answer:"
-        )
+        with span("prompt_assembly", kind="brand"):
+            live_offers = self.db_manager.live_offers()
+            if not live_offers:
+                return f"No offers available in the database to search for {brand_name}."
+
+            brand_offers = [
+                offer for offer in live_offers
+                if (offer.brand_name or '').lower() == brand_name.lower()
+            ]
+
+            if not brand_offers:
+                return f"I couldn't find any offers for {brand_name} at the moment."
+
+            messages = build_messages("brand", self._format_offers_for_llm(brand_offers), f"Brand: {brand_name}")
         try:
-            response = self.llm_client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant for promotional offers."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
+            return self._complete(messages, "brand")
         except Exception as e:
             logging.error(f"Error listing offers by brand with LLM: {e}")
             return "I apologize, but I encountered an error while retrieving offers for the specified brand. Please try again later."
@@ -184,7 +186,7 @@ if __name__ == "__main__":
 
     print("--- Ensuring data is ingested for RAG queries ---")
     db_manager_init = VectorDBManager()
-    if not db_manager_init.metadata_store:
+    if db_manager_init.is_empty():
         print("Database is empty, attempting to scrape and ingest data...")
         try:
             scraper = WebScraper(SCRAPE_URLS)
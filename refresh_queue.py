@@ -0,0 +1,249 @@
+# refresh_queue.py
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+from config import REFRESH_QUEUE_PATH, REFRESH_POLL_INTERVAL_SECONDS, REFRESH_JOB_TIMEOUT_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refresh_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    requesters TEXT NOT NULL DEFAULT '[]',
+    progress TEXT,
+    offers_ingested INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+)
+"""
+# Columns added after the first release; queue files created before get them on open
+_ADDED_COLUMNS = {
+    "profile": "INTEGER NOT NULL DEFAULT 0",
+    "profile_summary": "TEXT",
+    "urls": "TEXT", # JSON list of the sites a job refreshes; NULL refreshes every site
+}
+
+
+class RefreshQueue:
+    """
+    SQLite-backed queue of refresh jobs shared by the bot processes and the refresh worker.
+    A job that is still queued absorbs any further refresh requests, so a burst of
+    `/promosensei refresh` commands results in a single scrape. Only jobs refreshing
+    every site absorb requests; one for some sites (a requeued scheduled round) does not.
+    """
+    def __init__(self, path=REFRESH_QUEUE_PATH):
+        self.path = path
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        with closing(self._connect()) as conn:
+            conn.execute(_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(refresh_jobs)")}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE refresh_jobs ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, requester=None, profile=False):
+        """
+        Requests a refresh. Returns (job_id, coalesced) where coalesced is True if the
+        request was merged into a job that was already waiting to run. With `profile`
+        the worker profiles the job and attaches a timing breakdown to its result.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id, requesters FROM refresh_jobs WHERE status = ? AND urls IS NULL ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+            if row:
+                requesters = json.loads(row["requesters"])
+                if requester is not None and requester not in requesters:
+                    requesters.append(requester)
+                conn.execute(
+                    "UPDATE refresh_jobs SET requesters = ?, profile = MAX(profile, ?), updated_at = ? WHERE id = ?",
+                    (json.dumps(requesters), int(profile), now, row["id"]),
+                )
+                conn.execute("COMMIT")
+                logging.info(f"Refresh request coalesced into queued job {row['id']}.")
+                return row["id"], True
+
+            requesters = [requester] if requester is not None else []
+            cursor = conn.execute(
+                "INSERT INTO refresh_jobs (status, requesters, progress, profile, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (QUEUED, json.dumps(requesters), "Waiting for the refresh worker", int(profile), now, now),
+            )
+            conn.execute("COMMIT")
+            logging.info(f"Queued refresh job {cursor.lastrowid}.")
+            return cursor.lastrowid, False
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def begin(self, requester, progress="Starting", urls=None):
+        """
+        Records a job the worker starts on its own (e.g. a scheduled refresh) as already
+        running. `urls` are the sites it refreshes, kept so the job runs the same ones if
+        it is requeued; None means every site.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO refresh_jobs (status, requesters, progress, urls, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (RUNNING, json.dumps([requester]), progress, json.dumps(urls) if urls is not None else None, now, now),
+            )
+        return cursor.lastrowid
+
+    def claim_next(self):
+        """Marks the oldest queued job as running and returns it, or None if there is none."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM refresh_jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE refresh_jobs SET status = ?, progress = ?, updated_at = ? WHERE id = ?", (RUNNING, "Starting", now, row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def update_progress(self, job_id, progress):
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE refresh_jobs SET progress = ?, updated_at = ? WHERE id = ?", (progress, time.time(), job_id))
+
+    def finish(self, job_id, offers_ingested, profile_summary=None):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE refresh_jobs SET status = ?, progress = ?, offers_ingested = ?, profile_summary = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (DONE, "Finished", offers_ingested, profile_summary, now, now, job_id),
+            )
+
+    def fail(self, job_id, error):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE refresh_jobs SET status = ?, progress = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (FAILED, "Failed", str(error), now, now, job_id),
+            )
+
+    def requeue_stale(self, timeout_seconds=REFRESH_JOB_TIMEOUT_SECONDS):
+        """Puts running jobs back in the queue if their worker stopped reporting progress."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE refresh_jobs SET status = ?, progress = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, "Requeued after the worker stopped responding", time.time(), RUNNING, time.time() - timeout_seconds),
+            )
+            if cursor.rowcount:
+                logging.warning(f"Requeued {cursor.rowcount} stale refresh job(s).")
+            return cursor.rowcount
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM refresh_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["requesters"] = json.loads(job["requesters"])
+        job["urls"] = json.loads(job["urls"]) if job["urls"] is not None else None
+        return job
+
+    def latest_generation(self):
+        """Id of the most recent successful refresh; the index on disk was written by it."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT MAX(id) FROM refresh_jobs WHERE status = ?", (DONE,)).fetchone()
+        return row[0] or 0
+
+
+def describe_job(job):
+    if job["status"] == DONE:
+        message = f"Data refreshed! {job['offers_ingested'] or 0} offers ingested."
+        if job.get("profile_summary"):
+            message += "\n" + job["profile_summary"]
+        return message
+    if job["status"] == FAILED:
+        return f"An error occurred during refresh: {job['error']}"
+    return f"Refresh {job['status']}: {job['progress']}"
+
+
+class RefreshWatcher:
+    """
+    Polls the queue from a bot process. Progress on jobs this process asked for is passed
+    to `notify(requester, message)`, and the vector DB is hot-reloaded whenever a newer index
+    generation is published (by the worker or another process), after which `on_reload()`
+    is called if given.
+    """
+    def __init__(self, queue, db_manager, notify, interval_seconds=REFRESH_POLL_INTERVAL_SECONDS, on_reload=None):
+        self.queue = queue
+        self.db_manager = db_manager
+        self.notify = notify
+        self.on_reload = on_reload
+        self.interval_seconds = interval_seconds
+        self._watched = {} # job_id -> (requesters, last message sent)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, job_id, requester):
+        with self._lock:
+            requesters, last_message = self._watched.get(job_id, ([], None))
+            if requester not in requesters:
+                requesters.append(requester)
+            self._watched[job_id] = (requesters, last_message)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="refresh-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"Error polling refresh jobs: {e}")
+
+    def poll(self):
+        if self.db_manager.reload() and self.on_reload is not None:
+            self.on_reload()
+
+        with self._lock:
+            watched = list(self._watched.items())
+        for job_id, (requesters, last_message) in watched:
+            job = self.queue.get(job_id)
+            if job is None:
+                continue
+            message = describe_job(job)
+            if message != last_message:
+                for requester in requesters:
+                    self.notify(requester, message)
+            with self._lock:
+                if job["status"] in (DONE, FAILED):
+                    self._watched.pop(job_id, None)
+                else:
+                    self._watched[job_id] = (requesters, message)
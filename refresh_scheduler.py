@@ -0,0 +1,98 @@
+# refresh_scheduler.py
+import os
+import time
+import random
+import sqlite3
+import logging
+from contextlib import closing
+from urllib.parse import urlparse
+
+from config import (
+    REFRESH_QUEUE_PATH, SCRAPE_URLS, SITE_REFRESH_INTERVAL_MINUTES, DEFAULT_REFRESH_INTERVAL_MINUTES,
+    REFRESH_JITTER_FRACTION, SCRAPE_RETRY_MINUTES,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS site_refreshes (
+    url TEXT PRIMARY KEY,
+    last_success_at REAL,
+    last_attempt_at REAL,
+    next_due_at REAL NOT NULL,
+    offers_scraped INTEGER,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def refresh_interval_minutes(url, intervals=SITE_REFRESH_INTERVAL_MINUTES):
+    return intervals.get(urlparse(url).netloc, DEFAULT_REFRESH_INTERVAL_MINUTES)
+
+
+class SiteScheduler:
+    """
+    Tracks when each site in SCRAPE_URLS was last scraped successfully and which sites are
+    due again under their own cadence. State lives next to the refresh queue, so it
+    survives worker restarts and also counts refreshes that users asked for.
+    """
+    def __init__(self, urls=SCRAPE_URLS, path=REFRESH_QUEUE_PATH, intervals=SITE_REFRESH_INTERVAL_MINUTES,
+                 jitter_fraction=REFRESH_JITTER_FRACTION, retry_minutes=SCRAPE_RETRY_MINUTES):
+        self.urls = list(urls)
+        self.path = path
+        self.intervals = intervals
+        self.jitter_fraction = jitter_fraction
+        self.retry_minutes = retry_minutes
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        with closing(self._connect()) as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _jittered_seconds(self, minutes):
+        # Spread out sites that share a cadence so they do not all come due in the same round
+        return minutes * 60 * (1 + random.uniform(-self.jitter_fraction, self.jitter_fraction))
+
+    def site_states(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM site_refreshes").fetchall()
+        return {row["url"]: dict(row) for row in rows}
+
+    def due_sites(self, now=None, limit=None):
+        """Sites whose next scrape is due, those with the oldest data first. Never-scraped sites lead."""
+        now = time.time() if now is None else now
+        states = self.site_states()
+        due = [url for url in self.urls if url not in states or states[url]["next_due_at"] <= now]
+        due.sort(key=lambda url: (states.get(url) or {}).get("last_success_at") or 0)
+        return due[:limit] if limit else due
+
+    def record_success(self, url, offers_scraped, now=None):
+        now = time.time() if now is None else now
+        next_due_at = now + self._jittered_seconds(refresh_interval_minutes(url, self.intervals))
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO site_refreshes (url, last_success_at, last_attempt_at, next_due_at, offers_scraped, consecutive_failures) "
+                "VALUES (?, ?, ?, ?, ?, 0) ON CONFLICT(url) DO UPDATE SET last_success_at = excluded.last_success_at, "
+                "last_attempt_at = excluded.last_attempt_at, next_due_at = excluded.next_due_at, "
+                "offers_scraped = excluded.offers_scraped, consecutive_failures = 0",
+                (url, now, now, next_due_at, offers_scraped),
+            )
+
+    def record_failure(self, url, now=None):
+        """A scrape that errored or found nothing keeps the site's old offers and is retried sooner."""
+        now = time.time() if now is None else now
+        retry_minutes = min(self.retry_minutes, refresh_interval_minutes(url, self.intervals))
+        next_due_at = now + self._jittered_seconds(retry_minutes)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO site_refreshes (url, last_attempt_at, next_due_at, consecutive_failures) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(url) DO UPDATE SET last_attempt_at = excluded.last_attempt_at, "
+                "next_due_at = excluded.next_due_at, consecutive_failures = consecutive_failures + 1",
+                (url, now, next_due_at),
+            )
+        logging.warning(f"Scrape of {url} found no offers; retrying in about {retry_minutes} minutes.")
@@ -0,0 +1,128 @@
+# refresh_worker.py
+import os
+import time
+import asyncio
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    SCRAPE_URLS, REFRESH_POLL_INTERVAL_SECONDS, SCHEDULED_REFRESH, MAX_CONCURRENT_SCRAPES, REFRESH_WORKER_METRICS_PORT,
+    REFRESH_SCRAPE_LOG_DIR, SCRAPE_LOG_SUFFIX,
+)
+from metrics import is_enabled, dump_json, start_metrics_server
+from profiling import profiled_call, profiled_in_thread
+from offer_log import OfferLogWriter
+from refresh_queue import RefreshQueue
+from refresh_scheduler import SiteScheduler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class RefreshWorker:
+    """
+    Runs refreshes (scrape + ingest) outside the bot processes: jobs queued by users, and
+    scheduled rounds for sites whose cadence says they are due. Each finished job
+    publishes a new index generation that the bots pick up through RefreshWatcher.
+    """
+    def __init__(self, queue=None, urls=SCRAPE_URLS, scheduler=None):
+        from scraper import WebScraper
+        from ingest_to_vector_db import VectorDBManager
+
+        self.queue = queue or RefreshQueue()
+        self.urls = list(urls)
+        self.scheduler = scheduler or SiteScheduler(self.urls)
+        self.scraper = WebScraper(self.urls)
+        self.db_manager = VectorDBManager()
+
+    def refresh_sites(self, job_id, urls):
+        """
+        Scrapes `urls` and replaces each successfully scraped site's offers in the index.
+        A site that yields nothing keeps its previous offers. Offers go through a scrape log
+        in REFRESH_SCRAPE_LOG_DIR and are embedded and indexed while the scrape runs; a job
+        picked up again after a crash resumes ingesting its log where it stopped. Returns
+        the number ingested.
+        """
+        log_path = os.path.join(REFRESH_SCRAPE_LOG_DIR, f"job_{job_id}{SCRAPE_LOG_SUFFIX}")
+        self.queue.update_progress(job_id, f"Scraping {len(urls)} site(s), indexing offers as they come in")
+        self.db_manager.reload() # Pick up anything another worker or a sweep wrote meanwhile
+        scraped = threading.Event()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="refresh-ingest") as pool:
+            # A profiled refresh also covers the ingest thread, where most of its time goes
+            ingest = pool.submit(profiled_in_thread(self.db_manager.ingest_log), log_path, replace_sources=urls, follow=scraped.is_set)
+            try:
+                with OfferLogWriter(log_path) as log:
+                    results = asyncio.run(self.scraper.scrape_sites(urls, MAX_CONCURRENT_SCRAPES, log=log, keep_offers=False))
+            finally:
+                scraped.set()
+            self.queue.update_progress(job_id, f"Scraped {log.count} offers, indexing the rest")
+            offers_ingested = ingest.result()
+
+        for url in urls:
+            if results.get(url):
+                self.scheduler.record_success(url, results[url])
+            else:
+                self.scheduler.record_failure(url)
+        for path in (log_path, log_path + ".checkpoint"):
+            if os.path.exists(path):
+                os.remove(path)
+        return offers_ingested
+
+    def run_job(self, job):
+        """Runs a claimed job for the sites it was created for, or every site."""
+        job_id = job["id"]
+        urls = job.get("urls") or self.urls
+        logging.info(f"Running refresh job {job_id} for {len(urls)} site(s) (requested by {', '.join(map(str, job['requesters'])) or 'startup'}).")
+        try:
+            offers_ingested, profile = profiled_call("refresh", bool(job.get("profile")), self.refresh_sites, job_id, urls)
+            self.queue.finish(job_id, offers_ingested, profile.summary() if profile else None)
+            if offers_ingested:
+                logging.info(f"Refresh job {job_id} finished with {offers_ingested} offers.")
+            else:
+                logging.warning(f"Refresh job {job_id} scraped no offers.")
+        except Exception as e:
+            logging.error(f"Refresh job {job_id} failed: {e}")
+            self.queue.fail(job_id, e)
+        if is_enabled():
+            dump_json() # Scrape timings are most useful right after the job that produced them
+
+    def run_scheduled(self):
+        """Refreshes the sites that are due, at most MAX_CONCURRENT_SCRAPES per round. Returns False if none were."""
+        due = self.scheduler.due_sites(limit=MAX_CONCURRENT_SCRAPES)
+        if not due:
+            return False
+        job_id = self.queue.begin("scheduler", urls=due)
+        self.run_job(self.queue.get(job_id))
+        return True
+
+    def run_forever(self, poll_interval_seconds=REFRESH_POLL_INTERVAL_SECONDS, once=False, scheduled=SCHEDULED_REFRESH):
+        logging.info(f"Refresh worker started ({'scheduled and on request' if scheduled else 'on request only'}). Waiting for jobs...")
+        while True:
+            self.queue.requeue_stale()
+            job = self.queue.claim_next()
+            if job is not None:
+                self.run_job(job)
+                continue
+            # Queued requests always go first; scheduled rounds only run when the queue is idle
+            if scheduled and self.run_scheduled():
+                continue
+            if once:
+                return
+            time.sleep(poll_interval_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Promo Sensei refresh worker: runs queued scrape + ingest jobs.")
+    parser.add_argument("--once", action="store_true", help="run the queued jobs and exit instead of polling")
+    parser.add_argument("--enqueue", action="store_true", help="queue a refresh job before starting")
+    parser.add_argument("--no-schedule", action="store_true", help="only run queued jobs, never scheduled per-site refreshes")
+    args = parser.parse_args()
+
+    start_metrics_server(REFRESH_WORKER_METRICS_PORT)
+    worker = RefreshWorker()
+    if not args.once:
+        worker.db_manager.start_expiry_sweeper()
+    if args.enqueue:
+        worker.queue.enqueue("cli")
+    worker.run_forever(once=args.once, scheduled=SCHEDULED_REFRESH and not args.no_schedule)
@@ -1,11 +1,24 @@
 # scraper.py
 import asyncio
-from playwright.async_api import async_playwright
 import re
-from datetime import datetime, timedelta
+import time
+from collections import deque
 import logging
-import json
 import random
+from urllib.parse import urlparse
+
+from config import MAX_CONCURRENT_SCRAPES
+from metrics import span
+from offers import Offer
+from canonical_urls import canonical_url, product_key
+from html_parsers import (
+    parse_in_pool,
+    shutdown_parse_pool,
+    parse_nykaa_bestsellers,
+    parse_flipkart_search,
+    scan_generic_offers,
+    parse_expiry_date,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -15,20 +28,87 @@ NYKAA_MAX_PAGES = 2 # Example: scrape first 5 pages, set to 0 for unlimited (use
 FLIPKART_MAX_PAGES = 2 # Example: scrape first 5 pages, set to 0 for unlimited (use with caution)
 # Define configurable maximum page limit for Adidas pagination 
 ADIDAS_MAX_PAGES = 2 # Example: scrape first 5 pages, set to 0 for unlimited (use with caution)
+# Result pages loading ahead, each in its own sibling page, while the current one is parsed.
+# Also the most pages a site's pagination has open at once; navigations are still paced.
+NYKAA_PREFETCH_PAGES = 2
+FLIPKART_PREFETCH_PAGES = 2
 
 #For Amazon
-MAX_OFFERS_PER_SITE=5 #this is for amzon maximum offers to be scrapped
+MAX_OFFERS_PER_SITE=200 #this is for amzon maximum offers to be scrapped, set to 0 for unlimited
 SCRAPE_DELAY_MIN_SECONDS=1 
 SCRAPE_DELAY_MAX_SECONDS=3
+# Deal detail pages open at once; each is reused from deal to deal. Navigations to a domain
+# still start at most one per SCRAPE_DELAY_MIN_SECONDS/2 to SCRAPE_DELAY_MAX_SECONDS/2 seconds.
+AMAZON_DETAIL_PAGES=4
+
+# Links in the deal cards; the three overlap, so most deals are found several times
+AMAZON_DEAL_LINK_SELECTOR = "div[data-deal-id] a.a-link-normal, div.deal-card a.a-link-normal, div.octopus-pc-item a.a-link-normal"
+AMAZON_TITLE_SELECTOR = "#productTitle, #a-page h1 span#productTitle"
+# Every field of a deal page in one round trip; each selector takes its first match in document order
+AMAZON_DEAL_FIELDS_JS = """() => {
+    const text = selector => {
+        const element = document.querySelector(selector);
+        return element ? element.textContent.trim() : null;
+    };
+    return {
+        title: text("#productTitle, #a-page h1 span#productTitle"),
+        price: text(".priceToPay span.a-price-whole, #priceblock_ourprice, #apex_desktop span.a-price-whole, .a-offscreen"),
+        description: text("#productDescription, #feature-bullets"),
+        brand: text("#bylineInfo, #brand"),
+    };
+}"""
+# Not needed to read a deal page's text
+_SKIPPED_RESOURCES = ("image", "media", "font")
+
+async def _skip_heavy_resources(route):
+    if route.request.resource_type in _SKIPPED_RESOURCES:
+        await route.abort()
+    else:
+        await route.fallback()
+
+class _DomainPacer:
+    """Spaces out navigations to each domain by a random interval, however many pages take turns at it."""
+    def __init__(self, min_seconds, max_seconds):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self._next_slot = {}
+
+    async def wait(self, url):
+        domain = urlparse(url).netloc
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(domain, now))
+        self._next_slot[domain] = slot + random.uniform(self.min_seconds, self.max_seconds)
+        await asyncio.sleep(slot - now)
+
+class _LoggedOffers(list):
+    """One site's offers, each written to the scrape log as soon as it is found."""
+    def __init__(self, log, source_url):
+        super().__init__()
+        self.log = log
+        self.source_url = source_url
+
+    def append(self, offer):
+        offer.source_url = self.source_url
+        self.log.write(offer)
+        super().append(offer)
+
+    def extend(self, offers):
+        for offer in offers:
+            self.append(offer)
 
 class WebScraper:
     def __init__(self, urls):
         self.urls = urls
+        self._pacer = _DomainPacer(SCRAPE_DELAY_MIN_SECONDS / 2, SCRAPE_DELAY_MAX_SECONDS / 2)
 
-    async def _scrape_page(self, page, url):
-        offers_data = []
+    async def _navigate(self, page, url, **kwargs):
+        with span("page_navigation", site=urlparse(url).netloc):
+            return await page.goto(url, **kwargs)
+
+    async def _scrape_page(self, page, url, log=None):
+        offers_data = _LoggedOffers(log, url) if log is not None else []
         try:
-            await page.goto(url, wait_until="networkidle", timeout=60000)
+            await self._navigate(page, url, wait_until="networkidle", timeout=60000)
             logging.info(f"Navigated to {url}. Current URL: {page.url}")
 
             await page.wait_for_timeout(3000)
@@ -72,117 +152,33 @@ class WebScraper:
                         total_pages = min(total_pages, NYKAA_MAX_PAGES)
                         logging.info(f"Applying Nykaa max page limit. Will scrape up to {total_pages} pages.")
 
-                    for page_no in range(1, total_pages + 1):
-                        paginated_url = f"{base_bestsellers_url}page_no={page_no}"
-                        logging.info(f"Scraping Nykaa bestsellers page: {paginated_url}")
-
-                        await page.goto(paginated_url, wait_until="networkidle", timeout=60000)
-                        await page.wait_for_timeout(2000)
-
-                        html_content = await page.content()
-                        from bs4 import BeautifulSoup
-                        doc = BeautifulSoup(html_content, "html.parser")
-
-                        product_containers = doc.find_all('div', class_='css-1rd7vky')
-
-                        if not product_containers:
-                            logging.warning(f"No product containers found on Nykaa bestsellers page {page_no}.")
-                            nametags = doc.find_all('div', {'class': 'css-xrzmfa'})
-                            if nametags:
-                                logging.info(f"Found {len(nametags)} product name elements (fallback). Attempting to scrape details.")
-                                originalprice_elements = doc.find_all('span', {'class':'css-17x46n5'})
-                                offerprice_elements = doc.find_all('span', {'class':'css-111z9ua'})
-                                discount_elements = doc.find_all('span', {'class':'css-r2b2eh'})
-                                offer_elements = doc.find_all('p', {'class':'css-i6xqbh'})
-                                reviews_elements = doc.find_all('span', {'class':'css-1j33oxj'})
-
-                                max_len = max(len(nametags), len(originalprice_elements), len(offerprice_elements),
-                                              len(discount_elements), len(offer_elements), len(reviews_elements))
-
-                                def pad_list(lst, length):
-                                    return lst + [None] * (length - len(lst))
-
-                                padded_nametags = pad_list(nametags, max_len)
-                                padded_originalprice = pad_list(originalprice_elements, max_len)
-                                padded_offerprice = pad_list(offerprice_elements, max_len)
-                                padded_discount = pad_list(discount_elements, max_len)
-                                padded_offer = pad_list(offer_elements, max_len)
-                                padded_reviews = pad_list(reviews_elements, max_len)
-
-                                for i in range(max_len):
-                                    try:
-                                        name = padded_nametags[i].text.strip() if padded_nametags[i] else "N/A"
-                                        op_text = "N/A"
-                                        if padded_originalprice[i]:
-                                            if padded_originalprice[i].name == 'span' and 'css-17x46n5' in padded_originalprice[i].get('class', []):
-                                                op_text = padded_originalprice[i].text.strip()
-                                            else:
-                                                mrp_span = padded_originalprice[i].find('span', class_='css-17x46n5')
-                                                if mrp_span:
-                                                    op_text = mrp_span.text.strip()
-
-                                            if op_text == 'MRP:':
-                                                op_text = "N/A"
-
-                                        offerp_text = padded_offerprice[i].text.strip() if padded_offerprice[i] else "N/A"
-                                        dis_text = padded_discount[i].text.strip() if padded_discount[i] else "N/A"
-                                        o_text = padded_offer[i].text.strip() if padded_offer[i] else "N/A"
-                                        r_text = padded_reviews[i].text.strip() if padded_reviews[i] else "N/A"
-
-                                        offers_data.append({
-                                            "title": name,
-                                            "description": f"Original Price: {op_text}, Offer Price: {offerp_text}, Discount: {dis_text}, Extra Offer: {o_text}",
-                                            "expiry_date": None,
-                                            "brand_name": "Nykaa",
-                                            "offer_link": paginated_url,
-                                            "category": "Beauty & Cosmetics",
-                                            "campaign_info": o_text if o_text != "N/A" else None,
-                                            "channels": "Website"
-                                        })
-                                    except Exception as e:
-                                        logging.warning(f"Could not extract details for product {i} on Nykaa page {page_no} (fallback): {e}")
-                            else:
-                                logging.warning(f"No nametags found on Nykaa bestsellers page {page_no} (fallback failed).")
-                        else:
-                            for container in product_containers:
-                                try:
-                                    title = container.find('div', {'class': 'css-xrzmfa'}).text.strip() if container.find('div', {'class': 'css-xrzmfa'}) else "N/A"
-
-                                    original_price_element = container.find('span', class_='css-17x46n5')
-                                    original_price = original_price_element.text.strip() if original_price_element and original_price_element.text.strip() != 'MRP:' else "N/A"
-
-                                    offer_price_element = container.find('span', class_='css-111z9ua')
-                                    offer_price = offer_price_element.text.strip() if offer_price_element else "N/A"
-
-                                    discount_element = container.find('span', class_='css-r2b2eh')
-                                    discount = discount_element.text.strip() if discount_element else "N/A"
-
-                                    free_gift_element = container.find('p', class_='css-i6xqbh')
-                                    free_gift = free_gift_element.text.strip() if free_gift_element else "N/A"
-
-                                    review_element = container.find('span', class_='css-1j33oxj')
-                                    reviews = review_element.text.strip() if review_element else "N/A"
-
-                                    product_link_element = container.find('a', href=True)
-                                    product_link = "https://www.nykaa.com" + product_link_element['href'] if product_link_element and product_link_element['href'].startswith('/') else (product_link_element['href'] if product_link_element else paginated_url)
-
-                                    offers_data.append({
-                                        "title": title,
-                                        "description": f"Original Price: {original_price}, Offer Price: {offer_price}, Discount: {discount}, Free Gift/Offer: {free_gift}, Reviews: {reviews}",
-                                        "expiry_date": None,
-                                        "brand_name": "Nykaa",
-                                        "offer_link": product_link,
-                                        "category": "Beauty & Cosmetics",
-                                        "campaign_info": free_gift if free_gift != "N/A" else None,
-                                        "channels": "Website"
-                                    })
-                                except Exception as e:
-                                    logging.warning(f"Could not extract all details for a product from container on Nykaa page {page_no}: {e}")
+                    page_urls = [f"{base_bestsellers_url}page_no={page_no}" for page_no in range(1, total_pages + 1)]
+                    loaded = self._load_pages(page.context, page_urls, NYKAA_PREFETCH_PAGES)
+                    try:
+                        async for page_no, paginated_url, html_content in loaded:
+                            logging.info(f"Scraping Nykaa bestsellers page: {paginated_url}")
+                            rows = await parse_in_pool(parse_nykaa_bestsellers, html_content, paginated_url, page_no)
+                            if not rows:
+                                logging.info(f"No products on Nykaa bestsellers page {page_no}. Stopping pagination.")
+                                break
+                            for title, description, product_link, campaign_info in rows:
+                                offers_data.append(Offer(
+                                    title=title,
+                                    description=description,
+                                    expiry_date=None,
+                                    brand_name="Nykaa",
+                                    offer_link=product_link,
+                                    category="Beauty & Cosmetics",
+                                    campaign_info=campaign_info,
+                                    channels="Website"
+                                ))
+                    finally:
+                        await loaded.aclose()
 
                 except Exception as e:
                     logging.error(f"Error clicking banner or processing new page on Nykaa: {e}")
                     content = await page.content()
-                    offers_data.extend(self._generic_scrape(content, url, "Nykaa"))
+                    offers_data.extend(await self._generic_scrape_in_pool(content, url, "Nykaa"))
 
             # --- Flipkart Scraping Logic ---
             elif "flipkart.com/offers-store" in page.url:
@@ -191,7 +187,7 @@ class WebScraper:
                 original_flipkart_page = page 
                 browser_context = await original_flipkart_page.context.browser.new_context()
 
-                category_offers = []
+                # Offers go straight to offers_data, so each is in the scrape log before the next category loads
                 for link_element in view_all_links:
                     category_url = await link_element.get_attribute('href')
                     if category_url and not category_url.startswith('http'):
@@ -205,7 +201,7 @@ class WebScraper:
                     category_page = await browser_context.new_page()
                     try:
                         logging.info(f"Navigating to Flipkart category page: {category_url}")
-                        await category_page.goto(category_url, wait_until="networkidle", timeout=60000)
+                        await self._navigate(category_page, category_url, wait_until="networkidle", timeout=60000)
                         await category_page.wait_for_timeout(3000) # Give page time to load content
 
                         # The main product container is .mt4CeI, inside a .gwkl1B
@@ -214,7 +210,7 @@ class WebScraper:
                         if not product_listing_elements:
                             logging.warning(f"No specific product listing elements found on Flipkart category page: {category_url}. Trying generic approach.")
                             content = await category_page.content()
-                            category_offers.extend(self._generic_scrape(content, category_url, "Flipkart"))
+                            offers_data.extend(await self._generic_scrape_in_pool(content, category_url, "Flipkart"))
                         else:
                             logging.info(f"Found {len(product_listing_elements)} product elements on {category_url}")
                             for product_element in product_listing_elements:
@@ -244,16 +240,16 @@ class WebScraper:
                                     category_name_from_h2 = await category_name_element.text_content() if category_name_element else "Flipkart Category"
 
 
-                                    category_offers.append({
-                                        "title": title,
-                                        "description": f"{description} | Price: {price}", # Combine price into description
-                                        "expiry_date": None, # Flipkart product listings often don't have explicit expiry
-                                        "brand_name": "Flipkart",
-                                        "offer_link": product_link,
-                                        "category": category_name_from_h2, # Use the extracted category name
-                                        "campaign_info": f"Price: {price}", # Using price as campaign info if no discount
-                                        "channels": "Website"
-                                    })
+                                    offers_data.append(Offer(
+                                        title=title,
+                                        description=f"{description} | Price: {price}", # Combine price into description
+                                        expiry_date=None, # Flipkart product listings often don't have explicit expiry
+                                        brand_name="Flipkart",
+                                        offer_link=product_link,
+                                        category=category_name_from_h2, # Use the extracted category name
+                                        campaign_info=f"Price: {price}", # Using price as campaign info if no discount
+                                        channels="Website"
+                                    ))
                                 except Exception as e:
                                     logging.warning(f"Could not extract details for a product on Flipkart category page {category_url}: {e}")
                     except Exception as e:
@@ -262,7 +258,6 @@ class WebScraper:
                         await category_page.close() 
                 
                 await browser_context.close()
-                offers_data.extend(category_offers) 
 
             # --- NEW Flipkart Search Results Page Logic (for pagination and format) ---
             elif "flipkart.com/search" in page.url:
@@ -302,77 +297,30 @@ class WebScraper:
 
                 logging.info(f"Applying Flipkart max page limit. Will scrape up to {total_pages_to_scrape} pages.")
 
-                for page_no in range(1, total_pages_to_scrape + 1):
-                    paginated_url = f"{base_search_url}page={page_no}"
-                    logging.info(f"Scraping Flipkart search results page: {paginated_url}")
-                    await page.goto(paginated_url, wait_until="networkidle", timeout=60000)
-                    await page.wait_for_timeout(2000)
-                    html_content = await page.content()
-                    from bs4 import BeautifulSoup
-                    doc = BeautifulSoup(html_content, "html.parser")
-
-                    product_cards = doc.find_all('div', class_='slAVV4') 
-
-                    if not product_cards:
-                        logging.warning(f"No specific product cards ('slAVV4') found on Flipkart search results page {page_no}. Skipping this page for specific offer extraction.")
-                        continue 
-                    else:
-                        logging.info(f"Found {len(product_cards)} product cards on {paginated_url}")
-                        for card in product_cards:
-                            try:
-                                title_element = card.find('a', class_='wjcEIp')
-                                title = title_element.get('title', '').strip() if title_element else "N/A"
-                                if title == "N/A" and title_element:
-                                    title = title_element.text.strip()
-
-                                product_link_element = card.find('a', class_='VJA3rP')
-                                if not product_link_element: 
-                                    product_link_element = card.find('a', class_='wjcEIp')
-
-                                product_link = "https://www.flipkart.com" + product_link_element['href'] if product_link_element and product_link_element['href'].startswith('/') else (product_link_element['href'] if product_link_element else "N/A")
-
-                                offer_price_element = card.find('div', class_='Nx9bqj')
-                                offer_price = offer_price_element.text.strip() if offer_price_element else "N/A"
-
-                                original_price_element = card.find('div', class_='yRaY8j')
-                                original_price = original_price_element.text.strip() if original_price_element else "N/A"
-
-                                discount_element = card.find('div', class_='UkUFwK')
-                                discount = discount_element.text.strip() if discount_element else "N/A"
-
-                                description_parts = []
-                                pack_info_element = card.find('div', class_='NqpwHC')
-                                if pack_info_element and pack_info_element.text.strip() != "":
-                                    description_parts.append(pack_info_element.text.strip())
-                                
-                                description_parts.append(f"Original Price: {original_price}, Offer Price: {offer_price}, Discount: {discount}")
-
-                                hot_deal_element = card.find('div', class_='M4DNwV div.yiggsN.O5Fpg8')
-                                if hot_deal_element and hot_deal_element.text.strip() != "":
-                                    description_parts.append(hot_deal_element.text.strip())
-
-                                description = " | ".join(description_parts) if description_parts else "N/A"
-
-                                rating_element = card.find('div', class_='XQDdHH')
-                                rating = rating_element.text.strip() if rating_element else "N/A"
-
-                                num_reviews_element = card.find('span', class_='Wphh3N')
-                                num_reviews = num_reviews_element.text.strip() if num_reviews_element else "N/A"
-
-                                offers_data.append({
-                                    "title": title,
-                                    "description": description,
-                                    "expiry_date": None, # Expiry date is usually not on search result cards
-                                    "brand_name": "Flipkart", 
-                                    "offer_link": product_link,
-                                    "category": "Beauty & Cosmetics", 
-                                    "campaign_info": discount if discount != "N/A" else None,
-                                    "channels": "Website",
-                                    "rating": rating, 
-                                    "num_reviews": num_reviews 
-                                })
-                            except Exception as e:
-                                logging.warning(f"Could not extract details for a product card on Flipkart search results page {page_no}: {e}")
+                page_urls = [f"{base_search_url}page={page_no}" for page_no in range(1, total_pages_to_scrape + 1)]
+                loaded = self._load_pages(page.context, page_urls, FLIPKART_PREFETCH_PAGES)
+                try:
+                    async for page_no, paginated_url, html_content in loaded:
+                        logging.info(f"Scraping Flipkart search results page: {paginated_url}")
+                        rows = await parse_in_pool(parse_flipkart_search, html_content, page_no)
+                        if not rows:
+                            logging.info(f"No products on Flipkart search results page {page_no}. Stopping pagination.")
+                            break
+                        for title, description, product_link, campaign_info, rating, num_reviews in rows:
+                            offers_data.append(Offer(
+                                title=title,
+                                description=description,
+                                expiry_date=None, # Expiry date is usually not on search result cards
+                                brand_name="Flipkart", 
+                                offer_link=product_link,
+                                category="Beauty & Cosmetics", 
+                                campaign_info=campaign_info,
+                                channels="Website",
+                                rating=rating, 
+                                num_reviews=num_reviews 
+                            ))
+                finally:
+                    await loaded.aclose()
 
 
             # elif "adidas.co.in/offers" in page.url:
@@ -441,23 +389,23 @@ class WebScraper:
                         category = "Apparel & Footwear" 
                         channels = "Website"
 
-                        offers_data.append({
-                            "title": title,
-                            "description": description,
-                            "expiry_date": expiry_date,
-                            "brand_name": brand_name,
-                            "offer_link": offer_link,
-                            "category": category,
-                            "campaign_info": campaign_info,
-                            "channels": channels
-                        })
+                        offers_data.append(Offer(
+                            title=title,
+                            description=description,
+                            expiry_date=expiry_date,
+                            brand_name=brand_name,
+                            offer_link=offer_link,
+                            category=category,
+                            campaign_info=campaign_info,
+                            channels=channels
+                        ))
                     except Exception as e:
                         logging.warning(f"Could not extract all details for an Adidas product card: {e}")
 
                 if not offers_data: 
                     logging.warning(f"No specific product offers found on Adidas for {page.url}. Attempting generic scrape as fallback.")
                     content = await page.content()
-                    generic_offers = self._generic_scrape(content, url, "Adidas")
+                    generic_offers = await self._generic_scrape_in_pool(content, url, "Adidas")
                     offers_data.extend(generic_offers)
                 else:
                     logging.info(f"Successfully scraped {len(offers_data)} specific Adidas offers.")
@@ -481,168 +429,191 @@ class WebScraper:
                         campaign_info = None
                         channels = None
 
-                        offers_data.append({
-                            "title": title,
-                            "description": description,
-                            "expiry_date": expiry_date,
-                            "brand_name": brand_name,
-                            "offer_link": offer_link,
-                            "category": category,
-                            "campaign_info": campaign_info,
-                            "channels": channels
-                        })
+                        offers_data.append(Offer(
+                            title=title,
+                            description=description,
+                            expiry_date=expiry_date,
+                            brand_name=brand_name,
+                            offer_link=offer_link,
+                            category=category,
+                            campaign_info=campaign_info,
+                            channels=channels
+                        ))
                     except Exception as e:
                         logging.warning(f"Could not extract all details for an offer on Puma: {e}")
                 
                 if not offers_data:
                     content = await page.content()
-                    offers_data.extend(self._generic_scrape(content, url, "Puma"))
+                    offers_data.extend(await self._generic_scrape_in_pool(content, url, "Puma"))
 
 
             # --- Amazon Deals Page Scraping Logic (Visits individual product pages) ---
             elif "amazon.in/deals" in page.url:
                 logging.info(f"Attempting to collect individual deal links from Amazon deals page: {page.url}")
                 
-                deal_links = []
-                # Selectors for links within deal cards on the Amazon deals page
-                link_elements = await page.locator("div[data-deal-id] a.a-link-normal, div.deal-card a.a-link-normal, div.octopus-pc-item a.a-link-normal").all()
-                for link_el in link_elements:
-                    href = await link_el.get_attribute('href')
-                    if href:
-                        full_url = "https://www.amazon.in" + href if href.startswith('/') else href
-                        deal_links.append(full_url)
-                
-                logging.info(f"Found {len(deal_links)} potential deal links on Amazon deals page.")
+                # Every link in one round trip, reduced to one canonical /dp/<ASIN> link per product;
+                # other deal pages (e.g. multi-product /deal/<id> links) are kept once each by their canonical URL
+                hrefs = await page.eval_on_selector_all(AMAZON_DEAL_LINK_SELECTOR, "links => links.map(link => link.href)")
+                keys = [product_key(href) for href in hrefs]
+                products = list(dict.fromkeys(key for key in keys if key))
+                other_deals = list(dict.fromkeys(canonical_url(href) for href, key in zip(hrefs, keys) if href and not key))
+                deal_links = products + other_deals
+                logging.info(f"Found {len(hrefs)} deal links on Amazon deals page: {len(products)} distinct products and {len(other_deals)} other deal pages.")
 
-                browser_context = await page.context.browser.new_context()
-                offers_count = 0
-                for deal_link in deal_links:
-                    if offers_count >= MAX_OFFERS_PER_SITE and MAX_OFFERS_PER_SITE > 0:
-                        logging.info(f"Reached MAX_OFFERS_PER_SITE ({MAX_OFFERS_PER_SITE}) for Amazon. Stopping scraping.")
-                        break
-
-                    deal_page = await browser_context.new_page()
-                    try:
-                        logging.info(f"Scraping individual Amazon deal: {deal_link}")
-                        await deal_page.goto(deal_link, wait_until="domcontentloaded", timeout=60000)
-                        await asyncio.sleep(random.uniform(SCRAPE_DELAY_MIN_SECONDS / 2, SCRAPE_DELAY_MAX_SECONDS / 2)) # Shorter delay for individual items
-
-                        await deal_page.wait_for_selector("#productTitle, #a-page h1 span#productTitle", timeout=30000)
-
-                        title_element_handle = await deal_page.locator("#productTitle, #a-page h1 span#productTitle").first.element_handle()
-                        title = (await title_element_handle.text_content()).strip() if title_element_handle else "N/A"
-
-                        price_element_handle = await deal_page.locator(".priceToPay span.a-price-whole, #priceblock_ourprice, #apex_desktop span.a-price-whole, .a-offscreen").first.element_handle()
-                        price = (await price_element_handle.text_content()).strip() if price_element_handle else "N/A"
-
-                        description_element_handle = await deal_page.locator("#productDescription, #feature-bullets").first.element_handle()
-                        description = (await description_element_handle.text_content()).strip() if description_element_handle else "N/A"
-                        
-                        brand_element_handle = await deal_page.locator("#bylineInfo, #brand").first.element_handle()
-                        brand_name = (await brand_element_handle.text_content()).strip() if brand_element_handle else "Amazon"
-                
-                        if "Visit the" in brand_name and "Store" in brand_name:
-                            brand_name = brand_name.replace("Visit the", "").replace("Store", "").strip()
-
-
-                        offers_data.append({
-                            "title": title if title else "N/A",
-                            "description": f"{description} | Price: {price}" if description != "N/A" or price != "N/A" else "N/A",
-                            "expiry_date": None, # Amazon product pages usually don't have explicit deal expiry dates
-                            "brand_name": brand_name,
-                            "offer_link": deal_link,
-                            "category": "E-commerce", 
-                            "campaign_info": f"Deal Price: {price}" if price != "N/A" else None,
-                            "channels": "Website"
-                        })
-                        offers_count += 1
-                    except Exception as e:
-                        logging.warning(f"Could not extract details for Amazon deal page {deal_link}: {e}")
-                    finally:
-                        await deal_page.close() 
-                await browser_context.close()
+                await self._scrape_amazon_deals(page.context.browser, deal_links, offers_data)
 
 
         
             else:
                 logging.info(f"Attempting generic scrape for {page.url}")
                 content = await page.content()
-                offers_data.extend(self._generic_scrape(content, url, "Unknown"))
+                offers_data.extend(await self._generic_scrape_in_pool(content, url, "Unknown"))
 
         except Exception as e: 
             logging.error(f"Error scraping {url}: {e}")
         return offers_data 
+    async def _load_pages(self, browser_context, page_urls, prefetch):
+        """
+        Yields (page_no, url, html) for `page_urls` in order, numbered from 1. While the
+        caller handles one page, the next `prefetch` are loading in sibling pages of
+        `browser_context`. Navigations go through self._pacer. Call aclose() after
+        leaving the loop early, which cancels the loads still running.
+        """
+        loaders = asyncio.Queue()
+        for _ in range(min(max(1, prefetch), len(page_urls))):
+            loaders.put_nowait(await browser_context.new_page())
+
+        async def load(url):
+            loader = await loaders.get()
+            try:
+                await self._pacer.wait(url)
+                await self._navigate(loader, url, wait_until="networkidle", timeout=60000)
+                await loader.wait_for_timeout(2000)
+                return await loader.content()
+            finally:
+                loaders.put_nowait(loader)
+
+        pending = iter(enumerate(page_urls, 1))
+        loads = deque()
+
+        def load_next():
+            for page_no, url in pending:
+                loads.append((page_no, url, asyncio.ensure_future(load(url))))
+                return
+
+        try:
+            for _ in range(max(1, prefetch)):
+                load_next()
+            while loads:
+                page_no, url, task = loads.popleft()
+                html_content = await task
+                load_next()
+                yield page_no, url, html_content
+        finally:
+            for _, _, task in loads:
+                task.cancel()
+            await asyncio.gather(*(task for _, _, task in loads), return_exceptions=True)
+            while not loaders.empty():
+                await loaders.get_nowait().close()
+
+    async def _scrape_amazon_deals(self, browser, deal_links, offers_data, pages=AMAZON_DETAIL_PAGES):
+        """
+        Visits Amazon deal pages on `pages` browser pages, each reused from deal to deal,
+        and appends an offer per deal to `offers_data` until MAX_OFFERS_PER_SITE are found.
+        Navigations are paced per domain by self._pacer, so more pages only overlap the
+        page loads; they do not send requests faster.
+        """
+        browser_context = await browser.new_context()
+        await browser_context.route("**/*", _skip_heavy_resources)
+        pending = iter(deal_links) # Shared by the workers; each deal is taken once
+        found = [0]
+
+        def full():
+            return MAX_OFFERS_PER_SITE > 0 and found[0] >= MAX_OFFERS_PER_SITE
+
+        async def crawl():
+            deal_page = await browser_context.new_page()
+            try:
+                for deal_link in pending:
+                    if full():
+                        return
+                    if deal_page.is_closed():
+                        deal_page = await browser_context.new_page()
+                    try:
+                        logging.info(f"Scraping individual Amazon deal: {deal_link}")
+                        await self._pacer.wait(deal_link)
+                        await self._navigate(deal_page, deal_link, wait_until="domcontentloaded", timeout=60000)
+                        await deal_page.wait_for_selector(AMAZON_TITLE_SELECTOR, timeout=30000)
+                        fields = await deal_page.evaluate(AMAZON_DEAL_FIELDS_JS)
+                    except Exception as e:
+                        logging.warning(f"Could not extract details for Amazon deal page {deal_link}: {e}")
+                        continue
+                    if full():
+                        return
+
+                    title = fields["title"] or "N/A"
+                    price = fields["price"] or "N/A"
+                    description = fields["description"] or "N/A"
+                    brand_name = fields["brand"] or "Amazon"
+                    if "Visit the" in brand_name and "Store" in brand_name:
+                        brand_name = brand_name.replace("Visit the", "").replace("Store", "").strip()
+
+                    offers_data.append(Offer(
+                        title=title,
+                        description=f"{description} | Price: {price}" if description != "N/A" or price != "N/A" else "N/A",
+                        expiry_date=None, # Amazon product pages usually don't have explicit deal expiry dates
+                        brand_name=brand_name,
+                        offer_link=deal_link,
+                        category="E-commerce",
+                        campaign_info=f"Deal Price: {price}" if price != "N/A" else None,
+                        channels="Website"
+                    ))
+                    found[0] += 1
+            finally:
+                if not deal_page.is_closed():
+                    await deal_page.close()
+
+        try:
+            await asyncio.gather(*(crawl() for _ in range(min(pages, len(deal_links)))))
+        finally:
+            await browser_context.close()
+        if full():
+            logging.info(f"Reached MAX_OFFERS_PER_SITE ({MAX_OFFERS_PER_SITE}) for Amazon. Stopping scraping.")
+
     def _generic_scrape(self, content, url, brand_name="Unknown Brand"):
         """
         A very basic generic scrape that looks for common offer-like phrases.
         This is a fallback and will likely be less accurate than site-specific logic.
-        It tries to avoid picking up generic class names as titles/descriptions.
+        Runs inline; use _generic_scrape_in_pool from the event loop.
         """
+        return self._generic_rows_to_offers(scan_generic_offers(content), url, brand_name)
+
+    async def _generic_scrape_in_pool(self, content, url, brand_name="Unknown Brand"):
+        """Same as _generic_scrape, but the regex scan runs in the parse pool."""
+        rows = await parse_in_pool(scan_generic_offers, content)
+        return self._generic_rows_to_offers(rows, url, brand_name)
+
+    def _generic_rows_to_offers(self, rows, url, brand_name):
         generic_offers = []
-        potential_matches = re.finditer(r"(?:[0-9]{1,3}% off|flat \d+%|cashback|sale|discount|deal|promo)\b.*?(?:\.|\n|$)", content, re.IGNORECASE | re.DOTALL)
-        
-        for match in potential_matches:
-            text = match.group(0).strip()
-            if len(text) < 15 or re.match(r"^[a-z0-9_-]+$", text): # Basic filter for class names
-                continue
-
-            title = text.split("\n")[0].strip() if text else "Generic Offer"
-            description = text
-            expiry_date = self._parse_expiry_date(text) # Try to parse date from generic text
-            
-            if re.match(r"sale-price|sale-offers", title, re.IGNORECASE):
-                title = "Generic Sale/Offer"
-            if re.match(r"sale-price|sale-offers", description, re.IGNORECASE):
-                description = "Generic Sale/Offer details available on the page."
-
-            generic_offers.append({
-                "title": title,
-                "description": description,
-                "expiry_date": expiry_date,
-                "brand_name": brand_name,
-                "offer_link": url,
-                "category": "Generic",
-                "campaign_info": "Inferred from content",
-                "channels": "Website"
-            })
+        for title, description, expiry_date in rows:
+            generic_offers.append(Offer(
+                title=title,
+                description=description,
+                expiry_date=expiry_date,
+                brand_name=brand_name,
+                offer_link=url,
+                category="Generic",
+                campaign_info="Inferred from content",
+                channels="Website"
+            ))
         return generic_offers
 
-
     def _parse_expiry_date(self, date_string):
         """
         Attempts to parse various date formats. This will require robustness.
         Example: "Ends May 23, 2025", "Valid till 23/05/2025", "Expires 2025-05-23"
         """
-        if not date_string:
-            return None
-        formats = [
-            "%B %d, %Y",    # May 23, 2025
-            "%d/%m/%Y",     # 23/05/2025
-            "%Y-%m-%d",     # 2025-05-23
-            "%d %B %Y",     # 23 May 2025
-            "%b %d, %Y",    # May 23, 2025 (abbreviated month)
-            "%d %b %Y"      # 23 May 2025 (abbreviated month)
-        ]
-        for fmt in formats:
-            try:
-                match = re.search(r'(?:ends|expires|valid till|till)\s*(\w+\s+\d{1,2},\s+\d{4}|\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{1,2}-\d{1,2}|\d{1,2}\s+\w+\s+\d{4})', date_string, re.IGNORECASE)
-                if match:
-                    date_part = match.group(1).strip()
-                    return datetime.strptime(date_part, fmt).isoformat()
-            except ValueError:
-                continue
-
-        current_date = datetime.now()
-        if "today" in date_string.lower():
-            return (current_date + timedelta(days=0)).isoformat()
-        if "tomorrow" in date_string.lower():
-            return (current_date + timedelta(days=1)).isoformat()
-        if "next week" in date_string.lower():
-            return (current_date + timedelta(weeks=1)).isoformat()
-        if "next month" in date_string.lower():
-            return (current_date + timedelta(days=30)).isoformat() 
-
-        return None
+        return parse_expiry_date(date_string)
 
     def _extract_brand_from_url(self, url):
         """Extracts brand name from URL for generic scraping."""
@@ -651,30 +622,64 @@ class WebScraper:
             return match.group(1).capitalize()
         return "Unknown Brand"
 
+    async def scrape_sites(self, urls, max_concurrency=MAX_CONCURRENT_SCRAPES, log=None, keep_offers=True):
+        """
+        Scrapes `urls` in one browser with at most `max_concurrency` pages open at a time.
+        Returns {url: offers} for the sites that were scraped; each offer records the
+        `source_url` it came from so a later scrape of that site can replace it. With an
+        OfferLogWriter as `log`, every offer is also written to it as it is found; with
+        keep_offers=False the result is then {url: number of offers} and a site's offers
+        are let go as soon as it is done.
+        """
+        results = {}
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        from playwright.async_api import async_playwright # Browser stack is only loaded when scraping
+        try:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=False) 
+
+                async def scrape_site(url):
+                    async with semaphore:
+                        logging.info(f"Starting scrape for {url}")
+                        page = await browser.new_page()
+                        try:
+                            with span("scrape_site", site=urlparse(url).netloc):
+                                offers = await self._scrape_page(page, url, log)
+                        finally:
+                            await page.close()
+                    for offer in offers:
+                        offer.source_url = url
+                    results[url] = offers if keep_offers else len(offers)
+                    logging.info(f"Finished scraping {url}. Found {len(offers)} offers.")
+
+                outcomes = await asyncio.gather(*(scrape_site(url) for url in urls), return_exceptions=True)
+                for url, outcome in zip(urls, outcomes):
+                    if isinstance(outcome, Exception):
+                        logging.error(f"Error scraping {url}: {outcome}")
+                await browser.close()
+        finally:
+            shutdown_parse_pool()
+        return results
+
     async def scrape_all(self):
-        all_offers = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False) 
-            page = await browser.new_page()
-            for url in self.urls:
-                logging.info(f"Starting scrape for {url}")
-                offers = await self._scrape_page(page, url)
-                all_offers.extend(offers)
-                logging.info(f"Finished scraping {url}. Found {len(offers)} offers.")
-            await browser.close()
-        return all_offers
+        results = await self.scrape_sites(self.urls)
+        return [offer for url in self.urls for offer in results.get(url, [])]
 
 if __name__ == "__main__":
-    from config import SCRAPE_URLS
+    import sys
+    from config import SCRAPE_URLS, SCRAPE_LOG_PATH
+    from offer_log import OfferLogWriter
+    from profiling import profiled_call
     scraper = WebScraper(SCRAPE_URLS)
-    scraped_data = asyncio.run(scraper.scrape_all())
-
-    # Save scraped data to a JSON file
-    output_filename = "scraped_offers.json"
-    with open(output_filename, "w", encoding="utf-8") as f:
-        json.dump(scraped_data, f, ensure_ascii=False, indent=4)
-    print(f"\nScraped data saved to {output_filename}")
-
-    for offer in scraped_data:
-        print(offer)
-    print(f"\nTotal offers scraped: {len(scraped_data)}")
\ No newline at end of file
+    # Offers are appended to the scrape log as they are found; `python ingest_to_vector_db.py` picks them up
+    with OfferLogWriter(SCRAPE_LOG_PATH) as log:
+        # `python scraper.py --profile` saves a flamegraph and per-stage timings of the scrape
+        results, profile = profiled_call("scrape_all", "--profile" in sys.argv[1:], asyncio.run,
+                                         scraper.scrape_sites(SCRAPE_URLS, log=log, keep_offers=False))
+    print(f"\nScraped data appended to {SCRAPE_LOG_PATH}")
+
+    for url in SCRAPE_URLS:
+        print(f"{url}: {results.get(url, 'failed')} offers")
+    print(f"\nTotal offers scraped: {log.count}")
+    if profile:
+        print(profile.summary())
\ No newline at end of file
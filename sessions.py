@@ -0,0 +1,122 @@
+# sessions.py
+import re
+import time
+import threading
+from collections import OrderedDict
+
+from config import SESSION_TTL_SECONDS, SESSION_MAX_THREADS
+
+_AMOUNT = r"(?:₹|rs\.?|inr)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k\b)?"
+_MAX_PRICE = re.compile(rf"\b(?:under|below|less than|cheaper than|within|up ?to|at most|max(?:imum)?)\s*{_AMOUNT}", re.IGNORECASE)
+_MIN_PRICE = re.compile(rf"\b(?:over|above|more than|at least|min(?:imum)?)\s*{_AMOUNT}", re.IGNORECASE)
+_MIN_DISCOUNT = re.compile(r"(?:\b(?:at least|over|above|more than|min(?:imum)?)\s*)?(\d{1,2}(?:\.\d+)?)\s*%\s*(?:off|discount)?", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9]+")
+# Words that carry no search meaning in a follow-up; one made only of these and filters just narrows the last answer
+_FOLLOW_UP_WORDS = frozenset((
+    "a", "about", "also", "an", "and", "any", "are", "at", "brand", "by", "can", "cost", "costs",
+    "deal", "deals", "for", "from", "give", "i", "in", "is", "it", "items", "just", "keep", "list",
+    "me", "now", "of", "off", "offer", "offers", "one", "ones", "only", "or", "please", "price",
+    "priced", "products", "rs", "show", "still", "that", "the", "them", "there", "these", "they",
+    "those", "to", "want", "what", "which", "with", "you",
+))
+
+
+def _amount(match):
+    value = float(match.group(1).replace(",", ""))
+    return value * 1000 if match.group(2) else value
+
+
+def parse_filters(text, offers=()):
+    """
+    Structured filters in a follow-up message: max_price / min_price ("under ₹15,000",
+    "above 5k"), min_discount ("at least 30% off") and brand, if the message names the
+    brand of one of `offers`. Returns (filters, the text left once they are removed).
+    """
+    filters = {}
+    match = _MIN_DISCOUNT.search(text)
+    if match:
+        filters["min_discount"] = float(match.group(1))
+        text = text[:match.start()] + " " + text[match.end():]
+    for key, pattern in (("max_price", _MAX_PRICE), ("min_price", _MIN_PRICE)):
+        match = pattern.search(text)
+        if match:
+            filters[key] = _amount(match)
+            text = text[:match.start()] + " " + text[match.end():]
+    brands = {offer.brand_name for offer in offers if offer.brand_name}
+    for brand in sorted(brands, key=len, reverse=True):
+        match = re.search(rf"\b{re.escape(brand)}\b", text, re.IGNORECASE)
+        if match:
+            filters["brand"] = brand
+            text = text[:match.start()] + " " + text[match.end():]
+            break
+    return filters, text
+
+
+def only_narrows(rest):
+    """True if what is left of a follow-up after parse_filters asks for nothing new."""
+    return all(word in _FOLLOW_UP_WORDS for word in _WORD.findall(rest.lower()))
+
+
+def apply_filters(offers, filters):
+    """The offers that pass every filter, in their retrieved order. Offers without a price fail price filters."""
+    brand = (filters.get("brand") or "").lower()
+    return [
+        offer for offer in offers
+        if ("max_price" not in filters or (offer.price is not None and offer.price <= filters["max_price"]))
+        and ("min_price" not in filters or (offer.price is not None and offer.price >= filters["min_price"]))
+        and ("min_discount" not in filters or (offer.discount_percent or 0) >= filters["min_discount"])
+        and (not brand or (offer.brand_name or "").lower() == brand)
+    ]
+
+
+class ThreadSession:
+    """What one conversation thread last retrieved: its question, the offers found for it and the filters applied since."""
+    __slots__ = ("query", "offers", "filters", "generation")
+
+    def __init__(self, query, offers, filters, generation):
+        self.query = query
+        self.offers = offers
+        self.filters = filters
+        self.generation = generation # Index generation the offers were retrieved from
+
+
+class SessionStore:
+    """
+    ThreadSessions by key, e.g. (channel, thread_ts). A session expires `ttl_seconds` after
+    it was last stored, and beyond `max_sessions` the least recently stored one is dropped.
+    Sessions are replaced rather than changed, so readers never see one half-updated.
+    """
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS, max_sessions=SESSION_MAX_THREADS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict() # key -> (stored at, session), least recently stored first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._sessions[key]
+                return None
+            return entry[1]
+
+    def put(self, key, session):
+        if key is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[key] = (now, session)
+            self._sessions.move_to_end(key)
+            # Expired sessions are the least recently stored, so they are at the front
+            while self._sessions:
+                stored_at, _ = next(iter(self._sessions.values()))
+                if len(self._sessions) <= self.max_sessions and now - stored_at <= self.ttl_seconds:
+                    break
+                self._sessions.popitem(last=False)
@@ -0,0 +1,351 @@
+# slack_outbox.py
+import re
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+from config import SLACK_POSTS_PER_SECOND, SLACK_POST_BURST, SLACK_MESSAGE_MAX_CHARS, SLACK_POST_MAX_RETRIES, SLACK_POST_THREADS
+from metrics import span, count
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# A line that starts a new offer in an LLM answer: a numbered or bulleted item, a heading,
+# a bold title or "Offer N:". Indented lines (an offer's own sub-bullets) never do.
+_OFFER_START = re.compile(r"(?:\d+[.)]\s|[-*•]\s|#{1,6}\s|\*\*|Offer \d+)")
+# A slash command's response_url accepts at most five messages
+RESPONSE_URL_MAX_POSTS = 5
+TRUNCATED_NOTE = "\n\n_(Answer cut short: it is too long to post in full.)_"
+# Used when a 429 comes without a Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+
+
+def _sections(text):
+    """Splits `text` before every line that starts an offer or follows a blank line, keeping line breaks."""
+    sections, current, previous_blank = [], [], False
+    for line in text.splitlines(keepends=True):
+        blank = not line.strip()
+        if current and not blank and (previous_blank or _OFFER_START.match(line)):
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+        previous_blank = blank
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+def _cut(text, limit):
+    """Cuts text longer than `limit` at line breaks, else at spaces, else anywhere."""
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            pieces.append(text[:limit])
+            text = text[limit:]
+        else:
+            pieces.append(text[:cut])
+            text = text[cut + 1:]
+    pieces.append(text)
+    return pieces
+
+
+def split_message(text, limit=SLACK_MESSAGE_MAX_CHARS):
+    """
+    Splits a Markdown answer into messages of at most `limit` characters, packing whole
+    offers into each one; only an offer longer than a message is cut inside.
+    """
+    chunks, current = [], ""
+    for section in _sections(text):
+        if len(current) + len(section) <= limit:
+            current += section
+            continue
+        if current.strip():
+            chunks.append(current)
+        current = section
+        if len(current) > limit:
+            *full, current = _cut(current, limit)
+            chunks.extend(full)
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def _fit(chunks, budget):
+    """The first `budget` chunks (all of them for None), the last one marked as cut short if any are left out."""
+    if budget is None or len(chunks) <= budget:
+        return chunks
+    if budget <= 0:
+        return []
+    kept = chunks[:budget]
+    kept[-1] = kept[-1][:SLACK_MESSAGE_MAX_CHARS - len(TRUNCATED_NOTE)] + TRUNCATED_NOTE
+    return kept
+
+
+class _PostFailed(Exception):
+    def __init__(self, status, headers, detail):
+        super().__init__(f"HTTP {status}: {detail}")
+        self.status = status
+        self.headers = headers or {}
+
+
+class _Post:
+    __slots__ = ("reply", "text", "kind", "replace", "placeholder", "taken", "attempts")
+
+    def __init__(self, reply, text, kind, replace=False, placeholder=False):
+        self.reply = reply
+        self.text = text
+        self.kind = kind
+        self.replace = replace # Overwrite the reply's placeholder instead of posting anew
+        self.placeholder = placeholder
+        self.taken = False # Set once a worker is sending it; until then its text can change
+        self.attempts = 0
+
+
+class _Channel:
+    """Posts waiting for one channel, paced by a token bucket, and sent one at a time."""
+    def __init__(self, rate, burst):
+        self.posts = deque()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0 # Set from a 429's Retry-After
+        self.busy = False
+
+    def ready_at(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(now + wait, self.paused_until)
+
+    def is_idle(self):
+        return not self.busy and not self.posts and self.tokens >= self.burst
+
+
+class SlackReply:
+    """
+    The messages answering one request in one channel. A placeholder ("Searching...") is
+    replaced by the answer rather than followed by it: if it is still queued the answer
+    goes out in its place, otherwise the answer's first message updates it (chat.update,
+    or replace_original through a slash command's response_url).
+    """
+    def __init__(self, outbox, channel, respond=None, thread_ts=None):
+        self.outbox = outbox
+        self.channel = channel
+        self.respond = respond # Slash commands answer through their response_url
+        self.thread_ts = thread_ts # Posted as replies in this thread when set
+        self.ts = None # Timestamp of the posted placeholder, for chat.update
+        self.posts_left = RESPONSE_URL_MAX_POSTS if respond is not None else None
+        self._placeholder = None
+
+    def placeholder(self, text):
+        self._placeholder = self._enqueue(text, "placeholder", placeholder=True)
+
+    def send(self, text, kind="reply"):
+        """Posts `text` after the reply's earlier messages, split into as many messages as it needs."""
+        chunks = split_message(text) or [text]
+        for chunk in self._fit(chunks, kind, self.posts_left):
+            self._enqueue(chunk, kind)
+
+    def finish(self, text, kind="reply"):
+        """Posts the answer, replacing the placeholder if there is one."""
+        placeholder, self._placeholder = self._placeholder, None
+        if placeholder is None:
+            self.send(text, kind)
+            return
+        chunks = split_message(text) or [text]
+        # A placeholder rewritten before it was sent costs no extra response_url post
+        kept = _fit(chunks, None if self.posts_left is None else self.posts_left + 1)
+        if kept and self.outbox._rewrite(placeholder, kept[0], kind):
+            self._count_cut(chunks, kept, kind)
+            for chunk in kept[1:]:
+                self._enqueue(chunk, kind)
+            return
+        kept = self._fit(chunks, kind, self.posts_left)
+        if kept:
+            self._enqueue(kept[0], kind, replace=True)
+        for chunk in kept[1:]:
+            self._enqueue(chunk, kind)
+
+    def _fit(self, chunks, kind, budget):
+        kept = _fit(chunks, budget)
+        self._count_cut(chunks, kept, kind)
+        return kept
+
+    def _count_cut(self, chunks, kept, kind):
+        if len(kept) < len(chunks):
+            self.outbox._dropped(len(chunks) - len(kept), kind, "response_url_limit")
+
+    def _enqueue(self, text, kind, replace=False, placeholder=False):
+        if self.posts_left is not None:
+            self.posts_left -= 1
+        return self.outbox._enqueue(_Post(self, text, kind, replace, placeholder))
+
+
+class SlackOutbox:
+    """
+    Outbound queue for the bot's Slack messages, so handlers return without waiting on
+    Slack. Each channel has its own token bucket and sends its messages in order, one at
+    a time; SLACK_POST_THREADS channels are served at once. Rate-limited posts wait out
+    Retry-After and are sent again, transient failures are retried with jittered backoff,
+    and posts that still fail are dropped. `stats` and the metrics counters record both.
+    """
+    def __init__(self, client, posts_per_second=SLACK_POSTS_PER_SECOND, burst=SLACK_POST_BURST,
+                 max_retries=SLACK_POST_MAX_RETRIES, threads=SLACK_POST_THREADS):
+        self.client = client
+        self.posts_per_second = posts_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.threads = threads
+        self.stats = {"posted": 0, "updated": 0, "coalesced": 0, "retried": 0, "dropped": 0}
+        self._channels = {}
+        self._pending = 0 # Posts queued or being sent
+        self._condition = threading.Condition()
+        self._workers = []
+
+    def reply(self, channel, respond=None, thread_ts=None):
+        return SlackReply(self, channel, respond, thread_ts)
+
+    def post(self, channel, text, kind="notice"):
+        self.reply(channel).send(text, kind)
+
+    def start(self):
+        with self._condition:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            for i in range(len(self._workers), self.threads):
+                worker = threading.Thread(target=self._run, name=f"slack-outbox-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def wait_until_idle(self, timeout=None):
+        """Blocks until every queued post is sent or dropped. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _enqueue(self, post):
+        with self._condition:
+            channel = self._channels.get(post.reply.channel)
+            if channel is None:
+                channel = self._channels[post.reply.channel] = _Channel(self.posts_per_second, self.burst)
+            channel.posts.append(post)
+            self._pending += 1
+            self._condition.notify_all()
+        if len(self._workers) < self.threads:
+            self.start()
+        return post
+
+    def _rewrite(self, post, text, kind):
+        """Gives a post that no worker has taken yet new text. False if it is already being sent."""
+        with self._condition:
+            if post.taken:
+                return False
+            post.text = text
+            post.kind = kind
+            self.stats["coalesced"] += 1
+        count("slack_posts_coalesced", kind=kind)
+        return True
+
+    def _dropped(self, number, kind, reason):
+        with self._condition:
+            self.stats["dropped"] += number
+        count("slack_posts_dropped", number, kind=kind, reason=reason)
+
+    def _next_post(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                best, best_at = None, None
+                for name, channel in list(self._channels.items()):
+                    if channel.busy:
+                        continue
+                    if not channel.posts:
+                        channel.ready_at(now) # Refills the bucket; a full one is forgotten
+                        if channel.is_idle():
+                            del self._channels[name]
+                        continue
+                    at = channel.ready_at(now)
+                    if best is None or at < best_at:
+                        best, best_at = channel, at
+                if best is not None and best_at <= now:
+                    best.tokens -= 1
+                    best.busy = True
+                    post = best.posts.popleft()
+                    post.taken = True
+                    return best, post
+                self._condition.wait(None if best is None else best_at - now)
+
+    def _run(self):
+        while True:
+            channel, post = self._next_post()
+            retry_in = self._deliver(post)
+            with self._condition:
+                channel.busy = False
+                if retry_in is None:
+                    self._pending -= 1
+                else:
+                    post.taken = False
+                    channel.posts.appendleft(post)
+                    channel.paused_until = max(channel.paused_until, time.monotonic() + retry_in)
+                self._condition.notify_all()
+
+    def _send(self, post):
+        reply = post.reply
+        with span("slack_post", kind=post.kind):
+            if reply.respond is not None:
+                response = reply.respond(text=post.text, replace_original=True if post.replace else None)
+                if response.status_code != 200:
+                    raise _PostFailed(response.status_code, response.headers, response.body)
+            elif post.replace and reply.ts:
+                self.client.chat_update(channel=reply.channel, ts=reply.ts, text=post.text)
+            else:
+                response = self.client.chat_postMessage(channel=reply.channel, text=post.text, thread_ts=reply.thread_ts)
+                if post.placeholder:
+                    reply.ts = response["ts"]
+
+    def _deliver(self, post):
+        """Sends one post. Returns None when it is done with, or the seconds to wait before sending it again."""
+        from slack_sdk.errors import SlackApiError
+        try:
+            self._send(post)
+            with self._condition:
+                self.stats["updated" if post.replace else "posted"] += 1
+            return None
+        except SlackApiError as e:
+            error, status, headers = e, e.response.status_code, e.response.headers
+        except _PostFailed as e:
+            error, status, headers = e, e.status, e.headers
+        except OSError as e: # Connection errors and timeouts, after slack_sdk's own retry
+            error, status, headers = e, None, {}
+        except Exception as e:
+            error, status, headers = e, 0, {}
+
+        retryable = status is None or status == 429 or status >= 500
+        if not retryable or post.attempts >= self.max_retries:
+            logging.error(f"Dropping Slack {post.kind} message to {post.reply.channel} after {post.attempts + 1} attempt(s): {error}")
+            self._dropped(1, post.kind, "rate_limited" if status == 429 else "error")
+            return None
+        if status == 429:
+            try:
+                wait = float(headers.get("Retry-After") or headers.get("retry-after"))
+            except (TypeError, ValueError):
+                wait = DEFAULT_RETRY_AFTER_SECONDS
+        else:
+            wait = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** post.attempts))
+        post.attempts += 1
+        with self._condition:
+            self.stats["retried"] += 1
+        count("slack_post_retries", kind=post.kind, reason="rate_limited" if status == 429 else "error")
+        logging.warning(f"Slack {post.kind} message to {post.reply.channel} failed ({error}); retry {post.attempts}/{self.max_retries} in {wait:.1f} s.")
+        return wait
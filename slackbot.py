@@ -1,5 +1,6 @@
 # slackbot.py
 import os
+import time
 import asyncio
 import logging
 from dotenv import load_dotenv
@@ -7,47 +8,87 @@ from dotenv import load_dotenv
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 
-from config import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, SCRAPE_URLS
+from config import SLACK_BOT_TOKEN, SLACK_APP_TOKEN, QUERY_ONLY
 from rag_query import RAGQueryProcessor
-from scraper import WebScraper
-from ingest_to_vector_db import VectorDBManager
+from refresh_queue import RefreshQueue, RefreshWatcher, QUEUED, DONE, FAILED, describe_job
+from metrics import start_metrics_server
+from slack_outbox import SlackOutbox
+from profiling import split_profile_flag, profiled_call
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 load_dotenv()
 
-print(f"DEBUG: SLACK_BOT_TOKEN loaded: '{os.getenv('SLACK_BOT_TOKEN')}'")
-print(f"DEBUG: SLACK_APP_TOKEN loaded: '{os.getenv('SLACK_APP_TOKEN')}'")
-
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
 
 app = App(token=SLACK_BOT_TOKEN)
 
 rag_processor = RAGQueryProcessor()
-scraper = WebScraper(SCRAPE_URLS)
-db_manager = VectorDBManager()
+# Share the processor's manager so refreshes and expiry sweeps are visible to queries.
+# The bot only reads the published index; the refresh worker writes and compacts it.
+db_manager = rag_processor.db_manager
+
+# Scraping and ingestion run in refresh_worker.py; the bot only queues jobs, relays
+# their progress to the requesting channel and reloads the index when one finishes.
+refresh_queue = RefreshQueue()
+
+# Every message goes through the outbox: handlers return as soon as their replies are
+# queued, and each channel's posts are paced, split to Slack's size limit and retried.
+outbox = SlackOutbox(app.client)
+
+def notify_channel(channel_id, message):
+    outbox.post(channel_id, message, "refresh")
+
+# Rebuild the cached top-deals summary as soon as a new index is loaded, not on the next `summary`
+refresh_watcher = RefreshWatcher(refresh_queue, db_manager, notify_channel, on_reload=rag_processor.warm_top_deals_summary)
+
+def wait_for_refresh(job_id, report):
+    """Blocks until a refresh job finishes, passing each new status message to `report`."""
+    last_message = None
+    waited = 0
+    while True:
+        job = refresh_queue.get(job_id)
+        message = describe_job(job)
+        if message != last_message:
+            report(message)
+            last_message = message
+        if job["status"] in (DONE, FAILED):
+            db_manager.reload()
+            return job
+        if job["status"] == QUEUED and waited and waited % 60 == 0:
+            report("No refresh worker has picked up the job yet. Start one with `python refresh_worker.py`.")
+        time.sleep(1)
+        waited += 1
 
 @app.event("app_mention")
-def handle_app_mention(body, say, logger):
-    full_text = body["event"]["text"]
+def handle_app_mention(body, logger):
+    event = body["event"]
+    full_text = event["text"]
     parts = full_text.split(' ', 1)
-    user_query = parts[1].strip() if len(parts) > 1 else ""
+    user_query, profile_requested = split_profile_flag(parts[1] if len(parts) > 1 else "")
 
     logger.info(f"Received app mention: {user_query}")
+    # A question and its follow-ups in the question's thread share one retrieval session,
+    # so every answer goes to that thread: the mention's own, or the one it was made in
+    thread_ts = event.get("thread_ts") or event["ts"]
+    session_key = (event["channel"], thread_ts)
+    reply = outbox.reply(event["channel"], thread_ts=thread_ts)
     if user_query:
-        say(f"Hello there! I'm Promo Sensei. Let me process your request: '{user_query}'...")
+        reply.placeholder(f"Hello there! I'm Promo Sensei. Let me process your request: '{user_query}'...")
 
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            response_text = loop.run_until_complete(asyncio.to_thread(rag_processor.query_llm, user_query))
-            say(response_text)
+            response_text, profile = loop.run_until_complete(asyncio.to_thread(profiled_call, "mention", profile_requested, rag_processor.query_llm, user_query, session_key))
+            reply.finish(response_text, "mention")
+            if profile:
+                reply.send(profile.summary(), "profile")
         except Exception as e:
             logger.error(f"Error processing mention: {e}")
-            say("Oops! Something went wrong while processing your request.")
+            reply.finish("Oops! Something went wrong while processing your request.", "error")
     else:
-        say("Hello! I'm Promo Sensei. How can I help you today?")
+        reply.send("Hello! I'm Promo Sensei. How can I help you today?", "mention")
 
 
 @app.event("message")
@@ -59,67 +100,73 @@ def log_all_messages(event, logger):
 def handle_promosensei_command(ack, respond, command, logger):
     ack()
 
-    text = command["text"].strip()
-    logger.info(f"Received slash command: {text}")
+    text, profile_requested = split_profile_flag(command["text"])
+    logger.info(f"Received slash command: {text}{' (profiled)' if profile_requested else ''}")
+    reply = outbox.reply(command["channel_id"], respond)
 
     try:
         if text.startswith("search"):
             query = text.replace("search", "", 1).strip()
             if query:
-                respond(f"Searching for deals related to '{query}'...")
+                reply.placeholder(f"Searching for deals related to '{query}'...")
                 # Run sync LLM query
-                response_text = rag_processor.query_llm(query)
-                respond(response_text)
+                response_text, profile = profiled_call("search", profile_requested, rag_processor.query_llm, query)
+                reply.finish(response_text, "search")
+                if profile:
+                    reply.send(profile.summary(), "profile")
             else:
-                respond("Please provide a search query. Usage: `/promosensei search [your query]`")
+                reply.send("Please provide a search query. Usage: `/promosensei search [your query]`")
 
         elif text == "summary":
-            respond("Generating a summary of top deals...")
-            response_text = rag_processor.summarize_top_deals()
-            respond(response_text)
+            reply.placeholder("Generating a summary of top deals...")
+            response_text, profile = profiled_call("summary", profile_requested, rag_processor.summarize_top_deals)
+            reply.finish(response_text, "summary")
+            if profile:
+                reply.send(profile.summary(), "profile")
 
         elif text.startswith("brand"):
             brand_name = text.replace("brand", "", 1).strip()
             if brand_name:
-                respond(f"Listing offers for brand: '{brand_name}'...")
-                response_text = rag_processor.list_offers_by_brand(brand_name)
-                respond(response_text)
+                reply.placeholder(f"Listing offers for brand: '{brand_name}'...")
+                response_text, profile = profiled_call("brand", profile_requested, rag_processor.list_offers_by_brand, brand_name)
+                reply.finish(response_text, "brand")
+                if profile:
+                    reply.send(profile.summary(), "profile")
             else:
-                respond("Please provide a brand name. Usage: `/promosensei brand [brand_name]`")
+                reply.send("Please provide a brand name. Usage: `/promosensei brand [brand_name]`")
 
         elif text == "refresh":
-            respond("Starting refresh... Please wait a few minutes.")
             try:
-                # Scrape synchronously
-                scraped_data = asyncio.run(scraper.scrape_all())
-                if scraped_data:
-                    db_manager.ingest_data(scraped_data)
-                    respond(f"Data refreshed! {len(scraped_data)} offers ingested.")
+                job_id, coalesced = refresh_queue.enqueue(command["channel_id"], profile=profile_requested)
+                refresh_watcher.watch(job_id, command["channel_id"])
+                if coalesced:
+                    reply.send("A refresh is already queued; I'll post here when it finishes.")
                 else:
-                    respond("Refresh completed, but no offers were scraped.")
+                    reply.send("Refresh queued. I'll post progress here as the refresh worker runs it.")
             except Exception as e:
-                logger.error(f"Error during refresh: {e}")
-                respond("An error occurred during refresh.")
+                logger.error(f"Error queueing refresh: {e}")
+                reply.send("An error occurred while queueing the refresh.")
         else:
-            respond(
+            reply.send(
                 "Unknown command. Try one of these:\n"
                 "`/promosensei search [query]`\n"
                 "`/promosensei summary`\n"
                 "`/promosensei brand [brand_name]`\n"
-                "`/promosensei refresh`"
+                "`/promosensei refresh`\n"
+                "Add `--profile` to any command to get a timing breakdown."
             )
 
     except Exception as e:
         logger.error(f"Error in command handler: {e}")
-        respond("Something went wrong while processing your command.")
+        reply.finish("Something went wrong while processing your command.", "error")
 
 def run_cli_chatbot():
     print("--- Promo Sensei CLI Chatbot ---")
     print("Type your queries or commands. Type 'exit' to quit.")
-    print("Commands: search [query], summary, brand [brand_name], refresh")
+    print("Commands: search [query], summary, brand [brand_name], refresh (add --profile for a timing breakdown)")
 
     while True:
-        user_input = input("\nYou: ").strip()
+        user_input, profile_requested = split_profile_flag(input("\nYou: "))
         if user_input.lower() == "exit":
             print("Goodbye!")
             break
@@ -128,31 +175,35 @@ def run_cli_chatbot():
             query = user_input.replace("search", "", 1).strip()
             if query:
                 print(f"Promo Sensei: Searching for deals related to '{query}'...")
-                response_text = rag_processor.query_llm(query)
+                response_text, profile = profiled_call("search", profile_requested, rag_processor.query_llm, query)
                 print(f"Promo Sensei: {response_text}")
+                if profile:
+                    print(profile.summary())
             else:
                 print("Promo Sensei: Please provide a search query. Usage: `search [your query]`")
         elif user_input == "summary":
             print("Promo Sensei: Generating a summary of top deals...")
-            response_text = rag_processor.summarize_top_deals()
+            response_text, profile = profiled_call("summary", profile_requested, rag_processor.summarize_top_deals)
             print(f"Promo Sensei: {response_text}")
+            if profile:
+                print(profile.summary())
         elif user_input.startswith("brand"):
             brand_name = user_input.replace("brand", "", 1).strip()
             if brand_name:
                 print(f"Promo Sensei: Listing offers for brand: '{brand_name}'...")
-                response_text = rag_processor.list_offers_by_brand(brand_name)
+                response_text, profile = profiled_call("brand", profile_requested, rag_processor.list_offers_by_brand, brand_name)
                 print(f"Promo Sensei: {response_text}")
+                if profile:
+                    print(profile.summary())
             else:
                 print("Promo Sensei: Please provide a brand name. Usage: `brand [brand_name]`")
         elif user_input == "refresh":
-            print("Promo Sensei: Initiating data refresh (scraping and ingestion). This may take a few minutes...")
+            print("Promo Sensei: Queueing a data refresh (scraping and ingestion). This may take a few minutes...")
             try:
-                scraped_data = asyncio.run(scraper.scrape_all())
-                if scraped_data:
-                    db_manager.ingest_data(scraped_data)
-                    print(f"Promo Sensei: Data refreshed successfully! Ingested {len(scraped_data)} offers.")
-                else:
-                    print("Promo Sensei: Data refresh completed, but no new offers were scraped.")
+                job_id, _ = refresh_queue.enqueue("cli", profile=profile_requested)
+                wait_for_refresh(job_id, lambda message: print(f"Promo Sensei: {message}"))
+            except KeyboardInterrupt:
+                print("Promo Sensei: Stopped waiting; the refresh stays queued for the worker.")
             except Exception as e:
                 print(f"Promo Sensei: An error occurred during data refresh: {e}")
         else:
@@ -166,23 +217,16 @@ def run_cli_chatbot():
 
 
 if __name__ == "__main__":
+    refresh_watcher.start()
+    outbox.start()
+    rag_processor.warm_top_deals_summary()
+    start_metrics_server()
     if SLACK_BOT_TOKEN and SLACK_APP_TOKEN:
         logging.info("Starting Promo Sensei Slackbot...")
         logging.info("Ensuring initial data is ingested for Slackbot...")
-        if not db_manager.metadata_store: # Check if DB is empty
-            try:
-                logging.info("Database is empty, attempting initial scrape and ingest...")
-                loop = asyncio.get_event_loop()
-                scraped_data = loop.run_until_complete(scraper.scrape_all())
-
-                if scraped_data:
-                    db_manager.ingest_data(scraped_data)
-                    logging.info(f"Ingested {len(scraped_data)} offers during startup.")
-                else:
-                    logging.warning("No offers scraped during initial startup. Bot might have limited functionality.")
-            except Exception as e:
-                logging.error(f"Error during initial data ingestion for Slackbot: {e}")
-                logging.warning("Continuing without initial data. Please use /promosensei refresh to populate.")
+        if db_manager.is_empty() and not QUERY_ONLY: # Check if DB is empty
+            job_id, _ = refresh_queue.enqueue()
+            logging.info(f"Database is empty, queued initial refresh job {job_id}. The index is loaded once the refresh worker finishes it.")
 
         try:
             handler = SocketModeHandler(app, SLACK_APP_TOKEN)
@@ -193,17 +237,8 @@ if __name__ == "__main__":
     else:
         logging.warning("SLACK_BOT_TOKEN or SLACK_APP_TOKEN not found or are empty. Running CLI chatbot instead.")
         logging.info("Ensuring initial data is ingested for CLI chatbot...")
-        if not db_manager.metadata_store: 
-            try:
-                logging.info("Database is empty, attempting initial scrape and ingest...")
-                scraped_data = asyncio.run(scraper.scrape_all())
-                if scraped_data:
-                    db_manager.ingest_data(scraped_data)
-                    logging.info(f"Ingested {len(scraped_data)} offers during startup.")
-                else:
-                    logging.warning("No offers scraped during initial startup. Chatbot might have limited functionality.")
-            except Exception as e:
-                logging.error(f"Error during initial data ingestion for CLI chatbot: {e}")
-                logging.warning("Continuing without initial data. Use 'refresh' command to populate.")
+        if db_manager.is_empty() and not QUERY_ONLY: 
+            job_id, _ = refresh_queue.enqueue()
+            logging.info(f"Database is empty, queued initial refresh job {job_id}. Run `python refresh_worker.py` to process it.")
 
         run_cli_chatbot()
@@ -0,0 +1,199 @@
+# snapshots.py
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+from datetime import datetime
+
+from config import SNAPSHOT_GC_GRACE_SECONDS, SNAPSHOT_LOCK_STALE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Bytes read per call when checksumming a snapshot file
+HASH_CHUNK_BYTES = 1 << 20
+# Endings of the files one shard generation is made of, see VectorShard.save
+SNAPSHOT_FILE_SUFFIXES = (".bin", "_metadata.pkl", "_vectors.f32")
+
+
+class SnapshotError(Exception):
+    """A snapshot file is missing or does not match the checksum its manifest recorded."""
+
+
+class SnapshotConflict(SnapshotError):
+    """Another writer published a shard since the entry a new version of it was based on."""
+
+
+def manifest_path(db_path):
+    return db_path + "_manifest.json"
+
+
+def new_token():
+    """Names the files of one shard generation. Never reused, so a published file is never written again."""
+    return f"{int(time.time()):x}{uuid.uuid4().hex[:8]}"
+
+
+def seal(path):
+    """Flushes a written snapshot file to disk and returns its sha256."""
+    digest = hashlib.sha256()
+    with open(path, "r+b") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+        os.fsync(f.fileno())
+    return digest.hexdigest()
+
+
+def verify(path, expected, data=None):
+    """Raises SnapshotError unless the file (or `data`, its bytes already read) hashes to `expected`."""
+    if data is not None:
+        actual = hashlib.sha256(data).hexdigest()
+    else:
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            raise SnapshotError(f"{path} is missing.")
+        actual = digest.hexdigest()
+    if actual != expected:
+        raise SnapshotError(f"{path} does not match its checksum in the manifest.")
+
+
+def read_manifest(db_path):
+    """The published manifest, or an empty one (generation 0) if nothing was published yet."""
+    try:
+        with open(manifest_path(db_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"generation": 0, "shards": {}, "retired": {}}
+
+
+def manifest_stamp(db_path):
+    """Identity of the manifest file, to tell cheaply whether a new generation was published."""
+    try:
+        stat = os.stat(manifest_path(db_path))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class _PublishLock:
+    """
+    Serializes manifest updates across processes with an O_EXCL lock file. A lock file older
+    than SNAPSHOT_LOCK_STALE_SECONDS was left by a writer that crashed and is taken over.
+    The file records its holder, so a writer whose lock was taken over leaves the new one alone.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.owner = None
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > SNAPSHOT_LOCK_STALE_SECONDS:
+                        logging.warning(f"Removing stale snapshot lock {self.path}.")
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue # Released meanwhile
+                time.sleep(0.05)
+                continue
+            self.owner = f"{os.getpid()} {new_token()}"
+            with os.fdopen(fd, "w") as f:
+                f.write(self.owner)
+            return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                held_by_us = f.read() == self.owner
+        except FileNotFoundError:
+            held_by_us = False
+        if held_by_us:
+            os.remove(self.path)
+        else:
+            logging.warning(f"Snapshot lock {self.path} was taken over as stale while this writer held it. Leaving it to its new holder.")
+        return False
+
+
+def publish(db_path, entries, based_on=None):
+    """
+    Publishes a new generation in which the shards in `entries` (name -> entry returned by
+    VectorShard.save) replace theirs and every other shard is kept. The manifest is replaced
+    with one rename, so readers see either the old generation or the new one, complete.
+    `based_on` maps a shard to the entry its new files were derived from (None if it had
+    none); if another writer published that shard since, nothing is published and
+    SnapshotConflict is raised, so that writer's change is never rolled back. Files no
+    longer referenced are retired and deleted SNAPSHOT_GC_GRACE_SECONDS later.
+    Returns the new manifest.
+    """
+    path = manifest_path(db_path)
+    with _PublishLock(path + ".lock"):
+        manifest = read_manifest(db_path)
+        shards = dict(manifest["shards"])
+        retired = dict(manifest.get("retired", {}))
+        now = time.time()
+        if based_on is not None:
+            conflicts = [name for name in entries if (shards.get(name) or {}).get("token") != (based_on.get(name) or {}).get("token")]
+            if conflicts:
+                raise SnapshotConflict(f"The {', '.join(conflicts)} shard(s) were published by another writer since this one loaded them.")
+        for name, entry in entries.items():
+            previous = shards.get(name)
+            if previous is not None:
+                for file in previous["files"].values():
+                    retired.setdefault(file, now)
+            shards[name] = entry
+        live = {file for entry in shards.values() for file in entry["files"].values()}
+        manifest = {
+            "generation": manifest["generation"] + 1,
+            "published_at": datetime.now().isoformat(),
+            "shards": shards,
+            "retired": {file: at for file, at in retired.items() if file not in live},
+        }
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        logging.info(f"Published index generation {manifest['generation']} ({', '.join(sorted(entries))} changed).")
+        _collect_garbage(db_path, manifest)
+    return manifest
+
+
+def _collect_garbage(db_path, manifest, grace_seconds=SNAPSHOT_GC_GRACE_SECONDS):
+    """
+    Deletes retired files `grace_seconds` after they were retired, which gives replicas time
+    to move to a newer generation, and files no manifest ever referenced (left by a writer
+    that crashed before publishing) once they are as old. A replica that still has a deleted
+    file open or mapped keeps reading it on POSIX; on Windows the delete fails and is retried
+    after the next publish. Updates manifest["retired"] in place; it is saved next publish.
+    """
+    db_dir = os.path.dirname(db_path) or "."
+    prefix = os.path.basename(db_path) + "_"
+    live = {file for entry in manifest["shards"].values() for file in entry["files"].values()}
+    retired = manifest["retired"]
+    suffixes = SNAPSHOT_FILE_SUFFIXES + tuple(suffix + ".tmp" for suffix in SNAPSHOT_FILE_SUFFIXES)
+    now = time.time()
+    removed = 0
+    for file in os.listdir(db_dir):
+        if not file.startswith(prefix) or not file.endswith(suffixes) or file in live:
+            continue
+        path = os.path.join(db_dir, file)
+        try:
+            since = retired.get(file) or os.path.getmtime(path)
+            if now - since < grace_seconds:
+                continue
+            os.remove(path)
+            retired.pop(file, None)
+            removed += 1
+        except OSError as e:
+            logging.debug(f"Could not delete old snapshot file {path}: {e}")
+    for file in [file for file in retired if not os.path.exists(os.path.join(db_dir, file))]:
+        retired.pop(file)
+    if removed:
+        logging.info(f"Deleted {removed} snapshot file(s) of old index generations.")
@@ -0,0 +1,26 @@
+# tests/conftest.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+
+class FakeEmbedder:
+    """Stands in for EmbeddingClient: a fixed random vector per text, no API calls."""
+    def __init__(self, dimensions=8, fail_after=None, latency_seconds=0.0):
+        self.dimensions = dimensions
+        self.fail_after = fail_after # Raise on the call after this many, to simulate a crash
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def embed(self, texts, max_retries=None):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("Embedding service went away")
+        time.sleep(self.latency_seconds)
+        vectors = [np.random.default_rng(abs(hash(text)) % 2**32).standard_normal(self.dimensions).astype('float32') for text in texts]
+        return vectors, [None] * len(texts)
@@ -0,0 +1,33 @@
+# tests/test_dedupe.py
+import dedupe
+from dedupe import collapse_near_duplicates
+from offers import Offer
+
+AMAZON = "https://www.amazon.in/deals"
+FLIPKART = "https://www.flipkart.com/offers-store"
+
+
+def test_near_duplicates_merge_when_the_bucket_starts_with_another_offer(monkeypatch):
+    # All three share band 0; B and C also match on 3 of 4 rows in every other band, A on none
+    band_rest = [(b, r) for b in range(1, dedupe.LSH_BANDS) for r in range(4)]
+    signatures = {
+        "A": (0,) * 4 + tuple(1000 + i for i in range(len(band_rest))),
+        "B": (0,) * 4 + tuple(2000 + i if r == 0 else i for i, (_, r) in enumerate(band_rest)),
+        "C": (0,) * 4 + tuple(3000 + i if r == 0 else i for i, (_, r) in enumerate(band_rest)),
+    }
+    monkeypatch.setattr(dedupe, "minhash_signature", lambda words: signatures[words[0].upper()])
+    offers = [Offer(name, source_url=AMAZON) for name in "abc"]
+
+    unique, _ = collapse_near_duplicates(offers, threshold=0.5)
+
+    assert [offer.title for offer in unique] == ["a", "b"]
+    assert unique[1].duplicate_count == 2
+
+
+def test_offers_from_different_retailers_are_not_merged():
+    title = "Samsung Galaxy M34 5G flat 20% off with bank offer"
+    offers = [Offer(title, source_url=AMAZON), Offer(title, source_url=FLIPKART)]
+
+    unique, _ = collapse_near_duplicates(offers)
+
+    assert [offer.source_url for offer in unique] == [AMAZON, FLIPKART]
@@ -0,0 +1,27 @@
+# tests/test_embedding_profile.py
+import os
+import time
+from types import SimpleNamespace
+
+from embedding_client import EmbeddingClient
+from profiling import profiled_call
+
+
+class FakeEmbeddings:
+    def create(self, input, model, **kwargs):
+        time.sleep(0.05)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[0.0] * 8) for _ in input])
+
+
+def test_profiled_embed_covers_the_pool_threads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # Profiles go to data/ under it
+    client = EmbeddingClient(batch_size=2, max_concurrency=2)
+    client._client = SimpleNamespace(embeddings=FakeEmbeddings())
+    client._encoding = False # Count tokens from text length instead of loading tiktoken
+
+    (vectors, errors), profile = profiled_call("embed", True, client.embed, [f"offer {i}" for i in range(8)])
+
+    assert not errors and all(vector is not None for vector in vectors)
+    assert "embedding(batch): " in profile.summary()
+    with open(os.path.join(tmp_path, profile.folded_path), encoding="utf-8") as f:
+        assert any("_embed_batch (embedding_client.py)" in line for line in f)
@@ -0,0 +1,24 @@
+# tests/test_expiry.py
+import time
+from datetime import datetime, timedelta
+
+from html_parsers import parse_expiry_date
+from ingest_to_vector_db import offer_expires_at
+from offers import Offer
+
+
+def end_of_today():
+    return (datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(days=1)).timestamp()
+
+
+def test_sale_ending_today_is_served_until_midnight():
+    offer = Offer("Flat 40% off on sneakers", expiry_date=parse_expiry_date("Sale ends today"))
+
+    assert offer_expires_at(offer) > time.time()
+    assert offer_expires_at(offer) == end_of_today()
+
+
+def test_expiry_with_a_time_of_day_lasts_until_the_end_of_that_day():
+    offer = Offer("Flat 40% off on sneakers", expiry_date=datetime.now())
+
+    assert offer_expires_at(offer) == end_of_today()
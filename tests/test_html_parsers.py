@@ -0,0 +1,15 @@
+# tests/test_html_parsers.py
+from datetime import date, datetime, timedelta
+
+from html_parsers import parse_expiry_date
+
+
+def test_explicit_expiry_date_wins_over_a_relative_word():
+    assert parse_expiry_date("Shop today! Sale ends May 23, 2025") == "2025-05-23T00:00:00"
+
+
+def test_relative_expiry_needs_a_prefix_and_gives_a_date():
+    today = datetime.combine(date.today(), datetime.min.time())
+    assert parse_expiry_date("Sale ends today") == today.isoformat()
+    assert parse_expiry_date("Valid till tomorrow") == (today + timedelta(days=1)).isoformat()
+    assert parse_expiry_date("Shop today for 40% off") is None
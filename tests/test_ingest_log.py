@@ -0,0 +1,53 @@
+# tests/test_ingest_log.py
+import pytest
+
+from conftest import FakeEmbedder
+from ingest_to_vector_db import VectorDBManager
+from offer_log import OfferLogWriter
+from offers import Offer
+
+SOURCE = "https://www.nykaa.com/sp/offers-native/offers"
+WORDS = ["serum", "lipstick", "sunscreen", "shampoo", "kajal", "perfume", "toner", "cleanser", "mascara", "primer"]
+
+
+def logged_offers(count):
+    # Titles far apart enough that near-duplicate collapsing keeps every one
+    return [
+        Offer(f"{WORDS[i % 10]} {WORDS[(i // 10) % 10]} edition {i} {i * 7919} flat {i % 50}% off", offer_link=f"https://www.nykaa.com/p/{i}", source_url=SOURCE)
+        for i in range(count)
+    ]
+
+
+def manager(db_path, embedder):
+    db_manager = VectorDBManager(db_path=str(db_path), mmap_index=False)
+    db_manager.embedder = embedder
+    return db_manager
+
+
+def test_resumed_ingest_keeps_offers_its_run_already_replaced(tmp_path):
+    log_path = str(tmp_path / "scrape.jsonl")
+    with OfferLogWriter(log_path) as log:
+        for offer in logged_offers(30):
+            log.write(offer)
+
+    crashing = manager(tmp_path / "faiss_index", FakeEmbedder(fail_after=1))
+    with pytest.raises(RuntimeError):
+        crashing.ingest_log(log_path, replace_sources=[SOURCE], batch_size=10)
+    assert crashing.ntotal == 10
+
+    resumed = manager(tmp_path / "faiss_index", FakeEmbedder())
+    assert resumed.ingest_log(log_path, replace_sources=[SOURCE], batch_size=10) == 20
+    assert resumed.ntotal == 30
+    assert len({offer.offer_link for offer in resumed.metadata_store}) == 30
+
+
+def test_next_scrape_run_replaces_the_site_again(tmp_path):
+    log_path = str(tmp_path / "scrape.jsonl")
+    for _ in range(2):
+        with OfferLogWriter(log_path) as log:
+            for offer in logged_offers(15):
+                log.write(offer)
+
+    db_manager = manager(tmp_path / "faiss_index", FakeEmbedder())
+    assert db_manager.ingest_log(log_path, replace_sources=[SOURCE], batch_size=10) == 30
+    assert db_manager.ntotal == 15
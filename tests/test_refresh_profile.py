@@ -0,0 +1,39 @@
+# tests/test_refresh_profile.py
+import os
+
+from conftest import FakeEmbedder
+from test_ingest_log import logged_offers, SOURCE
+from ingest_to_vector_db import VectorDBManager
+from refresh_queue import RefreshQueue
+from refresh_scheduler import SiteScheduler
+from refresh_worker import RefreshWorker
+
+
+class FakeScraper:
+    """Writes a fixed set of offers to the job's scrape log, as WebScraper.scrape_sites would."""
+    async def scrape_sites(self, urls, max_concurrent, log=None, keep_offers=True):
+        for offer in logged_offers(30):
+            log.write(offer)
+        return {url: 30 for url in urls}
+
+
+def test_profiled_refresh_reports_the_ingest_thread(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # Scrape logs and profiles go to data/ under it
+    queue_path = str(tmp_path / "refresh_jobs.sqlite3")
+    worker = RefreshWorker.__new__(RefreshWorker)
+    worker.queue = RefreshQueue(queue_path)
+    worker.urls = [SOURCE]
+    worker.scheduler = SiteScheduler(worker.urls, path=queue_path)
+    worker.scraper = FakeScraper()
+    worker.db_manager = VectorDBManager(db_path=str(tmp_path / "faiss_index"), mmap_index=False)
+    worker.db_manager.embedder = FakeEmbedder(latency_seconds=0.05)
+
+    job_id, _ = worker.queue.enqueue("test", profile=True)
+    worker.run_job(worker.queue.claim_next())
+
+    job = worker.queue.get(job_id)
+    assert job["offers_ingested"] == 30
+    assert "ingest_batch" in job["profile_summary"]
+    folded = [line for line in job["profile_summary"].splitlines() if line.startswith("Flamegraph input: ")][0].split(": ", 1)[1]
+    with open(os.path.join(tmp_path, folded), encoding="utf-8") as f:
+        assert any("ingest_log (ingest_to_vector_db.py)" in line for line in f)
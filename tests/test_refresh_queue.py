@@ -0,0 +1,32 @@
+# tests/test_refresh_queue.py
+from refresh_queue import RefreshQueue, QUEUED
+from refresh_worker import RefreshWorker
+
+AMAZON = "https://www.amazon.in/deals"
+FLIPKART = "https://www.flipkart.com/offers-store"
+
+
+def test_requeued_scheduled_job_refreshes_only_its_own_sites(tmp_path):
+    queue = RefreshQueue(str(tmp_path / "refresh_jobs.sqlite3"))
+    job_id = queue.begin("scheduler", urls=[AMAZON])
+    assert queue.requeue_stale(timeout_seconds=-1) == 1
+
+    # A user's full refresh does not ride along on the requeued scheduled round
+    requested_id, coalesced = queue.enqueue("U1")
+    assert not coalesced
+
+    worker = RefreshWorker.__new__(RefreshWorker)
+    worker.queue = queue
+    worker.urls = [AMAZON, FLIPKART]
+    refreshed = {}
+
+    def refresh_sites(job_id, urls):
+        refreshed[job_id] = urls
+        return 0
+
+    worker.refresh_sites = refresh_sites
+    worker.run_job(queue.claim_next())
+    worker.run_job(queue.claim_next())
+
+    assert refreshed == {job_id: [AMAZON], requested_id: [AMAZON, FLIPKART]}
+    assert queue.get(requested_id)["status"] != QUEUED
@@ -0,0 +1,61 @@
+# tests/test_slackbot_threads.py
+import sys
+import logging
+
+import slack_bolt
+
+from slack_outbox import SlackOutbox
+
+
+class FakeApp:
+    """Stands in for slack_bolt.App, which checks its token against Slack when created."""
+    def __init__(self, **kwargs):
+        self.client = None
+
+    def event(self, *args):
+        return lambda handler: handler
+
+    def command(self, *args):
+        return lambda handler: handler
+
+
+class FakeClient:
+    """Keeps the latest text of each posted message and the thread it was posted in."""
+    def __init__(self):
+        self.messages = {} # ts -> [thread_ts, text]
+
+    def chat_postMessage(self, channel, text, thread_ts=None):
+        ts = f"200.{len(self.messages) + 1}"
+        self.messages[ts] = [thread_ts, text]
+        return {"ts": ts}
+
+    def chat_update(self, channel, ts, text):
+        self.messages[ts][1] = text
+
+
+class FakeProcessor:
+    def __init__(self):
+        self.calls = []
+
+    def query_llm(self, user_query, session_key=None):
+        self.calls.append((user_query, session_key))
+        return f"Deals for {user_query}"
+
+
+def test_mention_and_its_follow_up_are_answered_in_one_thread(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(slack_bolt, "App", FakeApp)
+    monkeypatch.delitem(sys.modules, "slackbot", raising=False)
+    import slackbot
+
+    client, processor = FakeClient(), FakeProcessor()
+    monkeypatch.setattr(slackbot, "outbox", SlackOutbox(client, threads=1))
+    monkeypatch.setattr(slackbot, "rag_processor", processor)
+    logger = logging.getLogger("test")
+
+    slackbot.handle_app_mention({"event": {"channel": "C1", "ts": "100.1", "text": "<@U1> best phones"}}, logger)
+    slackbot.handle_app_mention({"event": {"channel": "C1", "ts": "100.5", "thread_ts": "100.1", "text": "<@U1> only Samsung"}}, logger)
+    assert slackbot.outbox.wait_until_idle(timeout=5)
+
+    assert processor.calls == [("best phones", ("C1", "100.1")), ("only Samsung", ("C1", "100.1"))]
+    assert sorted(client.messages.values()) == [["100.1", "Deals for best phones"], ["100.1", "Deals for only Samsung"]]
@@ -0,0 +1,77 @@
+# tests/test_snapshots.py
+import os
+from datetime import datetime
+
+import pytest
+
+from conftest import FakeEmbedder
+from ingest_to_vector_db import VectorDBManager
+from snapshots import SnapshotConflict, _PublishLock, manifest_path
+from test_ingest_log import logged_offers, manager
+
+
+def test_stale_writer_cannot_roll_back_a_published_shard(tmp_path):
+    db_path = tmp_path / "faiss_index"
+    fresh = manager(db_path, FakeEmbedder())
+    stale = manager(db_path, FakeEmbedder())
+    offers = logged_offers(15)
+
+    fresh.ingest_data(offers[:10])
+    with pytest.raises(SnapshotConflict):
+        stale.ingest_data(offers[10:])
+
+    # The stale writer dropped its change and now serves the published shard
+    assert stale.ntotal == 10
+    assert manager(db_path, FakeEmbedder()).ntotal == 10
+
+
+def test_sweep_redoes_its_compaction_on_a_newer_publish(tmp_path):
+    db_path = tmp_path / "faiss_index"
+    offers = logged_offers(13)
+    for offer in offers[:5]:
+        offer.expiry_date = datetime(2020, 1, 1)
+    refresher = manager(db_path, FakeEmbedder())
+    refresher.ingest_data(offers[:10])
+    sweeper = manager(db_path, FakeEmbedder())
+    assert sweeper.ntotal == 10
+
+    refresher.ingest_data(offers[10:])
+    assert sweeper.compact_expired() == 5
+
+    # The sweep kept the offers the refresh published after it loaded the shard
+    assert sweeper.ntotal == 8
+    assert manager(db_path, FakeEmbedder()).ntotal == 8
+
+
+def test_bots_leave_unversioned_shards_to_the_refresh_worker(tmp_path):
+    db_path = tmp_path / "faiss_index"
+    writer = manager(db_path, FakeEmbedder())
+    writer.ingest_data(logged_offers(10))
+    nykaa = writer.shards["nykaa"]
+    # Lay the shard out as it was saved before snapshots
+    for kind, file in nykaa.entry["files"].items():
+        suffix = {"index": ".bin", "metadata": "_metadata.pkl", "vectors": "_vectors.f32"}[kind]
+        os.replace(tmp_path / file, nykaa.path + suffix)
+    os.remove(manifest_path(str(db_path)))
+
+    bot = VectorDBManager(db_path=str(db_path), mmap_index=False, migrate=False)
+    assert bot.ntotal == 0
+    assert not os.path.exists(manifest_path(str(db_path)))
+
+    assert manager(db_path, FakeEmbedder()).ntotal == 10
+    assert bot.reload()
+    assert bot.ntotal == 10
+
+
+def test_lock_taken_over_as_stale_is_left_to_its_new_holder(tmp_path):
+    path = str(tmp_path / "manifest.json.lock")
+    with _PublishLock(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("4242 newholder") # Another writer took the lock over meanwhile
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "4242 newholder"
+
+    os.remove(path)
+    with _PublishLock(path):
+        pass
+    assert not os.path.exists(path)
@@ -0,0 +1,30 @@
+# tests/test_vector_shard.py
+import numpy as np
+
+from ingest_to_vector_db import VectorShard, GENERIC_SHARD
+from offers import Offer
+
+
+def recall_at_5(shard, vectors, queries):
+    exact = np.argsort(((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2), axis=1)[:, :5]
+    _, I, _ = shard.search(queries, 5)
+    return np.mean([len(set(found) & set(truth)) / 5 for found, truth in zip(I, exact)])
+
+
+def test_int8_shard_grown_from_a_small_first_batch_keeps_its_recall(tmp_path):
+    rng = np.random.default_rng(7)
+    # Dimensions with very different spreads, which a 3-vector sample gets badly wrong
+    vectors = (rng.standard_normal((2000, 32)) * rng.uniform(0.01, 5, 32)).astype('float32')
+    shard = VectorShard(GENERIC_SHARD, str(tmp_path / "faiss_index_generic"), vector_storage="int8", mmap_index=False)
+    for start, end in [(0, 3)] + [(lo, lo + 100) for lo in range(3, 2000, 100)]:
+        batch = vectors[start:min(end, 2000)]
+        shard.add(batch, [Offer(f"Offer {i}") for i in range(len(batch))], np.full(len(batch), np.inf))
+
+    assert shard.trained_rows > 1000
+    queries = vectors[rng.choice(2000, 50, replace=False)] + rng.standard_normal((50, 32)).astype('float32') * 0.05
+    assert recall_at_5(shard, vectors, queries) >= 0.95
+
+    entry = shard.save()
+    reloaded = VectorShard(GENERIC_SHARD, shard.path, mmap_index=False)
+    reloaded.load(entry)
+    assert reloaded.trained_rows == shard.trained_rows